@@ -1,9 +1,19 @@
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.db.models import ExpressionWrapper, F, FloatField
+from django.db.models.functions import NullIf
+from django.template.response import TemplateResponse
+from django.urls import path
+from django.utils.html import format_html
+from quiz import sampling, search, similarity
+from quiz.date_hierarchy import IndexedDateQuerySet
+from quiz.pagination import EstimatedCountPaginator
 from quiz.models import (
     Course,
     Question,
     Answer,
     GameSession,
+    GameQuestion,
     GameParticipant,
     TeamGameAnswer,
 )
@@ -26,12 +36,49 @@ class GameParticipantInline(admin.TabularInline):
 
     model = GameParticipant
     extra = 0  # Number of extra participant fields to display
-    readonly_fields = (
-        "user",
-        "score",
-    )
+    readonly_fields = ("user",)
     can_delete = False
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("user")
+
+
+class GameQuestionInline(admin.TabularInline):
+    """
+    Inline admin interface for the question sequence of a GameSession.
+    READ-ONLY, the sequence is fixed when the game session is created.
+    """
+
+    model = GameQuestion
+    extra = 0
+    fields = ("position", "question")
+    readonly_fields = ("position", "question")
+    ordering = ("position",)
+    can_delete = False
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("question")
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """
+    Base class for the admin of tables that grow with every game or question.
+    Unfiltered change lists estimate the number of rows instead of counting
+    them (see quiz/pagination.py), and the "N total" link, which would need
+    another COUNT(*) of the whole table, is not shown for filtered lists.
+    The date hierarchy is looked up in the index (see quiz/date_hierarchy.py).
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        return IndexedDateQuerySet(self.model, queryset.query, queryset.db)
+
 
 @admin.register(Course)
 class CourseAdmin(admin.ModelAdmin):
@@ -44,7 +91,7 @@ class CourseAdmin(admin.ModelAdmin):
 
 
 @admin.register(Question)
-class QuestionAdmin(admin.ModelAdmin):
+class QuestionAdmin(LargeTableAdmin):
     """
     Admin interface for Question model.
     """
@@ -52,13 +99,24 @@ class QuestionAdmin(admin.ModelAdmin):
     model = Question
     inlines = [AnswerInline]
 
-    list_display = ("truncated_text", "course", "status", "creator", "created_at")
-    list_filter = ("status", "course", "creator")
-    search_fields = (
-        "text",
-        "explanation",
-        "course__name",
+    list_display = (
+        "truncated_text",
+        "course",
+        "status",
+        "creator_link",
+        "created_at",
+        "times_served",
+        "correct_rate",
+        "last_used_at",
     )
+    # The statistics are read from QuestionStats (see quiz/question_stats.py)
+    list_select_related = ("course", "creator", "stats")
+    # Filter by creator with the links in the list (a sidebar filter would list every user)
+    list_filter = ("status", "course")
+    # Searched in the full-text index, see get_search_results()
+    search_fields = ("text", "explanation")
+    date_hierarchy = "created_at"
+    autocomplete_fields = ("course", "creator")
 
     actions = ["approve_questions"]
 
@@ -73,11 +131,101 @@ class QuestionAdmin(admin.ModelAdmin):
 
     truncated_text.short_description = "Text"
 
+    def creator_link(self, obj):
+        """
+        Links to the questions of the same creator.
+        """
+        if obj.creator is None:
+            return "-"
+        return format_html(
+            '<a href="?creator__id__exact={}">{}</a>',
+            obj.creator_id,
+            obj.creator.username,
+        )
+
+    creator_link.short_description = "Creator"
+    creator_link.admin_order_field = "creator"
+
+    def times_served(self, obj):
+        stats = getattr(obj, "stats", None)
+        return stats.times_served if stats else 0
+
+    times_served.short_description = "Served"
+    times_served.admin_order_field = "stats__times_served"
+
+    def correct_rate(self, obj):
+        """
+        The share of correct team answers and the number of answers.
+        """
+        stats = getattr(obj, "stats", None)
+        if stats is None or stats.correct_rate is None:
+            return "-"
+        return f"{stats.correct_rate:.0%} of {stats.times_answered}"
+
+    correct_rate.short_description = "Correct"
+    correct_rate.admin_order_field = ExpressionWrapper(
+        F("stats__times_correct") * 1.0 / NullIf(F("stats__times_answered"), 0),
+        output_field=FloatField(),
+    )
+
+    def last_used_at(self, obj):
+        stats = getattr(obj, "stats", None)
+        return stats.last_used_at if stats else None
+
+    last_used_at.short_description = "Last used"
+    last_used_at.admin_order_field = "stats__last_used_at"
+
+    def get_urls(self):
+        return [
+            path(
+                "duplicates/",
+                self.admin_site.admin_view(self.duplicates_view),
+                name="quiz_question_duplicates",
+            ),
+            *super().get_urls(),
+        ]
+
+    def duplicates_view(self, request):
+        """
+        Lists the clusters of near-duplicate questions (see quiz/similarity.py)
+        that contain at least one pending question, optionally of one course.
+        """
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+
+        pending = Question.objects.filter(status="PENDING")
+        course_filter = request.GET.get("course", "")
+        if course_filter.isdigit():
+            pending = pending.filter(course_id=course_filter)
+
+        context = {
+            **self.admin_site.each_context(request),
+            "title": "Near-duplicate questions",
+            "opts": self.model._meta,
+            "clusters": similarity.duplicate_clusters(pending),
+            "courses": Course.objects.all(),
+            "course_filter": course_filter,
+        }
+        return TemplateResponse(request, "admin/quiz/question/duplicates.html", context)
+
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Searches the text and explanation in the full-text index (quiz/search.py)
+        instead of LIKE '%term%' over every question.
+        """
+        return search.filter_questions(queryset, search_term), False
+
     def approve_questions(self, request, queryset):
         """
         Custom admin action to approve selected questions.
         """
         queryset.update(status="APPROVED")
+
+        # update() bypasses the signals, so refresh the question index manually
+        for course_id in queryset.values_list("course_id", flat=True).distinct():
+            if course_id is not None:
+                sampling.invalidate(course_id)
+
         self.message_user(
             request,
             f"{queryset.count()} question(s) successfully approved.",
@@ -87,7 +235,7 @@ class QuestionAdmin(admin.ModelAdmin):
 
 
 @admin.register(GameSession)
-class GameSessionAdmin(admin.ModelAdmin):
+class GameSessionAdmin(LargeTableAdmin):
     """
     Admin interface for active GameSession.
     """
@@ -97,26 +245,40 @@ class GameSessionAdmin(admin.ModelAdmin):
         "course",
         "status",
         "game_mode",
+        "team_score",
         "created_at",
     )
+    list_select_related = ("course",)
     list_filter = ("status", "course", "game_mode")
-    readonly_fields = ("join_code", "created_at", "current_question")
-    inlines = [GameParticipantInline]
+    search_fields = ("join_code",)
+    date_hierarchy = "created_at"
+    readonly_fields = (
+        "join_code",
+        "created_at",
+        "current_question",
+        "current_position",
+        "question_count",
+        "team_score",
+        "correct_count",
+        "archived_at",
+    )
+    inlines = [GameQuestionInline, GameParticipantInline]
 
 
 @admin.register(GameParticipant)
-class GameParticipantAdmin(admin.ModelAdmin):
+class GameParticipantAdmin(LargeTableAdmin):
     """
     Admin interface for GameParticipant model.
     """
 
     list_display = ("user", "session", "score")
-    list_filter = ("session",)
+    list_select_related = ("user", "session")
     search_fields = ("user__username", "session__join_code")
+    raw_id_fields = ("user", "session")
 
 
 @admin.register(TeamGameAnswer)
-class TeamGameAnswerAdmin(admin.ModelAdmin):
+class TeamGameAnswerAdmin(LargeTableAdmin):
     """
     Admin interface for TeamGameAnswer model.
     READ-ONLY, as it's a log of game activity.
@@ -129,8 +291,12 @@ class TeamGameAnswerAdmin(admin.ModelAdmin):
         "is_correct",
         "answered_by",
     )
-    list_filter = ("session", "is_correct")
+    list_select_related = ("session", "question", "selected_answer", "answered_by")
+    # Filter by game with the search (a sidebar filter would list every game)
+    list_filter = ("is_correct",)
     search_fields = ("session__join_code", "question__text")
+    date_hierarchy = "created_at"
+    raw_id_fields = ("session", "question", "selected_answer", "answered_by")
 
     def has_add_permission(self, request):
         return False  # Prevent adding new entries via admin
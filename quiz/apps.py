@@ -4,3 +4,12 @@ from django.apps import AppConfig
 class QuizConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "quiz"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import signals  # noqa: F401
+        from .middleware import install_recorder
+
+        # Queries are counted per request (see QueryBudgetMiddleware)
+        connection_created.connect(install_recorder)
@@ -0,0 +1,182 @@
+"""
+Async versions of the game state pollers and of submit_answer. They are served
+instead of the sync views in views.py if QUIZ_ASYNC_VIEWS is set (see urls.py).
+
+They read the cached game state with async cache calls and the database with
+the async ORM, so under ASGI a poll doesn't hold a thread while it waits.
+The rest of a request still runs in threads: the sync middleware, the session
+and user lookups and every ORM call (the async ORM wraps the sync one).
+Under WSGI every async view runs in an event loop of its own.
+
+python manage.py benchmark_pollers compares them with the sync views. With
+1000 pollers and 1 ms per query, a burst of polls of an unchanged state took
+14.1 s with the async views under ASGI (sync views: 18.2 s), but 9.4 s under
+WSGI with 16 threads (sync views: 7.7 s). As the sync views under WSGI are the
+fastest combination, they are the default.
+"""
+
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.decorators import login_required
+from django.http import Http404
+from django.shortcuts import render
+from django.utils.cache import get_conditional_response
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import require_POST
+
+from . import events, fragments, gameplay
+from .models import Answer, GameParticipant, GameSession, Question
+
+
+async def session_state_etag(request, join_code):
+    """
+    ETag of a game session's current state.
+    """
+    return gameplay.state_etag(await gameplay.aget_snapshot(request, join_code))
+
+
+async def participant_state_etag(request, join_code):
+    """
+    ETag of a game session's current state, if the user is a participant.
+    """
+    snapshot = await gameplay.aget_snapshot(request, join_code)
+    return gameplay.participant_state_etag(snapshot, await request.auser())
+
+
+def condition(etag_func):
+    """
+    Like django.views.decorators.http.condition, but awaits the ETag function.
+    Django's decorator supports async views, but calls the ETag function
+    synchronously.
+    """
+
+    def decorator(view_func):
+        @wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            etag = await etag_func(request, *args, **kwargs)
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = await view_func(request, *args, **kwargs)
+            if etag and request.method in ("GET", "HEAD"):
+                response.headers.setdefault("ETag", etag)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def adaptive_polling(view_func):
+    """
+    Adds the seconds until the next poll to the responses of an async poller
+    view, see views.adaptive_polling.
+    """
+
+    @wraps(view_func)
+    async def wrapper(request, join_code, *args, **kwargs):
+        response = await view_func(request, join_code, *args, **kwargs)
+        snapshot = await gameplay.aget_snapshot(request, join_code)
+        return gameplay.add_poll_interval(response, snapshot)
+
+    return wrapper
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@adaptive_polling
+@condition(etag_func=session_state_etag)
+async def poll_lobby_participants(request, join_code):
+    """
+    Async version of views.poll_lobby_participants.
+    """
+    snapshot = gameplay.check_snapshot(await gameplay.aget_snapshot(request, join_code))
+    after = gameplay.lobby_after(request)
+
+    participants = [
+        participant
+        async for participant in GameParticipant.objects.filter(
+            session_id=snapshot["session_id"], pk__gt=after
+        )
+        .select_related("user")
+        .order_by("id")
+    ]
+
+    return render(
+        request,
+        "quiz/partials/_lobby_participants_delta.html",
+        gameplay.lobby_delta_context(
+            snapshot, participants, after, settings.QUIZ_SSE_ENABLED
+        ),
+    )
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@adaptive_polling
+@condition(etag_func=session_state_etag)
+async def poll_game_start(request, join_code):
+    """
+    Async version of views.poll_game_start.
+    """
+    snapshot = gameplay.check_snapshot(await gameplay.aget_snapshot(request, join_code))
+    return gameplay.game_start_response(snapshot, join_code)
+
+
+@login_required
+@cache_control(private=True, no_cache=True)
+@adaptive_polling
+@condition(etag_func=participant_state_etag)
+async def game_state_poller(request, join_code):
+    """
+    Async version of views.game_state_poller. The context of the fragment is
+    only built (in a thread) if the fragment is not cached yet.
+    """
+    snapshot = gameplay.check_snapshot(
+        await gameplay.aget_snapshot(request, join_code), user=await request.auser()
+    )
+
+    if snapshot["status"] == "FINISHED":
+        return gameplay.hx_redirect("game_results", join_code)
+
+    template_name, get_context = gameplay.question_fragment(snapshot)
+    return await fragments.arender_fragment(
+        request, template_name, snapshot, get_context
+    )
+
+
+@login_required
+@require_POST
+async def submit_answer(request, join_code, answer_pk):
+    """
+    Async version of views.submit_answer. Claiming the answer needs a
+    transaction, which the async ORM doesn't support, so it runs in a thread.
+    """
+    try:
+        game_session = await GameSession.objects.aget(
+            join_code=join_code.upper(), status="ACTIVE"
+        )
+        current_question = await Question.objects.prefetch_related("answers").aget(
+            pk=game_session.current_question_id
+        )
+        selected_answer = await Answer.objects.aget(
+            pk=answer_pk, question=current_question
+        )
+    except (GameSession.DoesNotExist, Question.DoesNotExist, Answer.DoesNotExist):
+        raise Http404("No game session or answer found.")
+
+    user = await request.auser()
+    team_answer, claimed = await sync_to_async(gameplay.claim_answer)(
+        game_session, current_question, selected_answer, user
+    )
+    if claimed:
+        await sync_to_async(gameplay.state_changed)(
+            game_session, events.EVENT_ANSWER, question=current_question.id
+        )
+
+    return render(
+        request,
+        "quiz/partials/_question_result.html",
+        gameplay.answer_result_context(game_session, current_question, team_answer),
+    )
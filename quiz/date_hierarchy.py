@@ -0,0 +1,85 @@
+"""
+Date hierarchy of the admin for large tables.
+
+The date hierarchy of a change list looks up the first and last date and the
+years, months or days that contain rows. Django computes the latter with
+SELECT DISTINCT over the truncated date of every row, and SQLite truncates
+with a Python function, so this reads (and converts) the whole table or month.
+SQLite also only answers MIN() or MAX() from an index when the query contains
+nothing else, but the date hierarchy asks for both in a single query.
+
+IndexedDateQuerySet answers both from the index of the date field instead:
+MIN() and MAX() are separate queries, and the periods between the first and
+the last date are probed with one EXISTS query each (at most 31 for the days
+of a month).
+"""
+
+from datetime import datetime
+
+from django.db.models import Max, Min, QuerySet
+from django.utils import timezone
+
+
+def _period_start(value, kind):
+    if kind == "year":
+        return datetime(value.year, 1, 1)
+    if kind == "month":
+        return datetime(value.year, value.month, 1)
+    return datetime(value.year, value.month, value.day)
+
+
+def _next_period(start, kind):
+    if kind == "year":
+        return start.replace(year=start.year + 1)
+    if kind == "month":
+        if start.month == 12:
+            return start.replace(year=start.year + 1, month=1)
+        return start.replace(month=start.month + 1)
+    return datetime.fromordinal(start.toordinal() + 1)
+
+
+class IndexedDateQuerySet(QuerySet):
+    """
+    QuerySet whose date lookups of the admin date hierarchy use the index of
+    the date field instead of reading every row.
+    """
+
+    def aggregate(self, *args, **kwargs):
+        if not args and len(kwargs) > 1:
+            if all(isinstance(value, (Min, Max)) for value in kwargs.values()):
+                result = {}
+                for alias, value in kwargs.items():
+                    result.update(super().aggregate(**{alias: value}))
+                return result
+        return super().aggregate(*args, **kwargs)
+
+    def datetimes(self, field_name, kind, order="ASC", tzinfo=None):
+        if kind not in ("year", "month", "day"):
+            return super().datetimes(field_name, kind, order, tzinfo)
+
+        first = self.aggregate(first=Min(field_name))["first"]
+        last = self.aggregate(last=Max(field_name))["last"]
+        if first is None:
+            return []
+
+        tzinfo = tzinfo or timezone.get_current_timezone()
+        if timezone.is_aware(first):
+            first = timezone.localtime(first, tzinfo)
+            last = timezone.localtime(last, tzinfo)
+
+        periods = []
+        start = _period_start(first, kind)
+        while start <= last.replace(tzinfo=None):
+            end = _next_period(start, kind)
+            bounds = (start, end)
+            if timezone.is_aware(first):
+                bounds = tuple(timezone.make_aware(value, tzinfo) for value in bounds)
+            if self.filter(
+                **{f"{field_name}__gte": bounds[0], f"{field_name}__lt": bounds[1]}
+            ).exists():
+                periods.append(bounds[0])
+            start = end
+
+        if order == "DESC":
+            periods.reverse()
+        return periods
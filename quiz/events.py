@@ -0,0 +1,121 @@
+"""
+Server-sent events (SSE) for live game updates.
+
+Views that change the state of a game session publish an event for the
+session's join code. The SSE endpoint subscribes to these events and streams
+them to the connected browsers, which then refresh the affected part of the
+page right away instead of waiting for the next poll.
+
+The broker lives in memory, so events only reach clients that are connected
+to the same (ASGI) process. The HTMX polling stays active as a fallback.
+"""
+
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.db import transaction
+
+# Event names sent to the browser (used as "sse:<name>" triggers in templates)
+EVENT_JOIN = "join"
+EVENT_QUESTION = "question"
+EVENT_ANSWER = "answer"
+EVENT_NEXT = "next"
+EVENT_FINISH = "finish"
+
+# Send a comment line every few seconds so proxies keep the connection open
+KEEPALIVE_SECONDS = 15
+
+# Tell the browser how long to wait before reconnecting (in milliseconds)
+RETRY_MILLISECONDS = 5000
+
+_subscribers = defaultdict(set)
+_lock = threading.Lock()
+
+
+class Subscription:
+    """
+    A single SSE client waiting for events of one game session.
+    Must be created inside the event loop that consumes the events.
+    """
+
+    def __init__(self, join_code):
+        self.join_code = join_code
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue()
+
+    def deliver(self, event, data):
+        """
+        Hands an event to the subscriber. Safe to call from any thread.
+        """
+        try:
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, (event, data))
+        except RuntimeError:
+            # The event loop of this subscriber is already closed
+            pass
+
+
+def subscribe(join_code):
+    subscription = Subscription(join_code)
+    with _lock:
+        _subscribers[join_code].add(subscription)
+    return subscription
+
+
+def unsubscribe(subscription):
+    with _lock:
+        subscribers = _subscribers.get(subscription.join_code)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del _subscribers[subscription.join_code]
+
+
+def publish(join_code, event, **data):
+    """
+    Sends an event to all clients subscribed to the given game session.
+    The event is sent once the current transaction has been committed,
+    so clients never refresh before the new state is visible.
+    """
+
+    def send():
+        with _lock:
+            subscribers = list(_subscribers.get(join_code, ()))
+        payload = json.dumps(data)
+        for subscription in subscribers:
+            subscription.deliver(event, payload)
+
+    transaction.on_commit(send)
+
+
+def format_event(event, data):
+    """
+    Formats an event according to the text/event-stream specification.
+    """
+    return f"event: {event}\ndata: {data}\n\n"
+
+
+async def stream(join_code):
+    """
+    Async generator yielding the events of a game session as SSE messages.
+    Stops after the game has finished.
+    """
+    subscription = subscribe(join_code)
+    try:
+        yield f"retry: {RETRY_MILLISECONDS}\n\n"
+        while True:
+            try:
+                event, data = await asyncio.wait_for(
+                    subscription.queue.get(), KEEPALIVE_SECONDS
+                )
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+
+            yield format_event(event, data)
+
+            if event == EVENT_FINISH:
+                break
+    finally:
+        unsubscribe(subscription)
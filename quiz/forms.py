@@ -118,6 +118,30 @@ class AnswerForm(forms.ModelForm):
         return text
 
 
+def validate_answers(answers):
+    """
+    Validates the answers of a question, given as (text, is_correct) pairs:
+    1. At least one answer is provided
+    2. Exactly one answer is marked as correct
+    Used by the answer formset and the question import (quiz/question_io.py).
+    """
+    filled_answers = [is_correct for text, is_correct in answers if text]
+
+    if not filled_answers:
+        error_msg = "Bitte geben Sie mindestens eine Antwort ein."
+        raise forms.ValidationError(error_msg)
+
+    correct_answer_count = sum(1 for is_correct in filled_answers if is_correct)
+
+    if correct_answer_count == 0:
+        error_msg = "Bitte markieren Sie genau eine Antwort als korrekt."
+        raise forms.ValidationError(error_msg)
+
+    if correct_answer_count > 1:
+        error_msg = "Es darf nur eine Antwort als korrekt markiert werden."
+        raise forms.ValidationError(error_msg)
+
+
 class BaseAnswerInlineFormSet(BaseInlineFormSet):
     """
     Custom formset to ensure at least one correct answer is provided.
@@ -125,9 +149,7 @@ class BaseAnswerInlineFormSet(BaseInlineFormSet):
 
     def clean(self):
         """
-        Validates that:
-        1. At least one answer is provided
-        2. Exactly one answer is marked as correct
+        Validates the answers with validate_answers().
         """
         super().clean()
 
@@ -135,33 +157,13 @@ class BaseAnswerInlineFormSet(BaseInlineFormSet):
         if any(self.errors):
             return
 
-        correct_answer_count = 0
-        has_at_least_one_answer = False
-        filled_forms_count = 0
-
-        for i, form in enumerate(self.forms):
-
-            if not form.cleaned_data or form.cleaned_data.get("DELETE"):
-                continue
-
-            if form.cleaned_data.get("text"):
-                filled_forms_count += 1
-                has_at_least_one_answer = True
-
-                if form.cleaned_data.get("is_correct"):
-                    correct_answer_count += 1
-
-        if not has_at_least_one_answer:
-            error_msg = "Bitte geben Sie mindestens eine Antwort ein."
-            raise forms.ValidationError(error_msg)
-
-        if correct_answer_count == 0:
-            error_msg = "Bitte markieren Sie genau eine Antwort als korrekt."
-            raise forms.ValidationError(error_msg)
-
-        if correct_answer_count > 1:
-            error_msg = "Es darf nur eine Antwort als korrekt markiert werden."
-            raise forms.ValidationError(error_msg)
+        validate_answers(
+            [
+                (form.cleaned_data.get("text"), form.cleaned_data.get("is_correct"))
+                for form in self.forms
+                if form.cleaned_data and not form.cleaned_data.get("DELETE")
+            ]
+        )
 
 
 # Create the inline formset for Answers related to a Question
@@ -0,0 +1,66 @@
+"""
+Cache of rendered HTML fragments of running games.
+
+All players of a game session see the same question or result partial for a
+given state, so the partial is rendered once per state version and then served
+to every poller. The cache key contains the state version, so a fragment is
+never served again once the state has changed; old fragments simply expire.
+
+Fragments are rendered without the request. The CSRF token is rendered as a
+placeholder and replaced with the token of the requesting user when serving.
+"""
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.template.loader import render_to_string
+
+# Fragments are only needed while their state is current
+FRAGMENT_TIMEOUT = 60 * 30
+
+CSRF_PLACEHOLDER = "__CSRF_TOKEN_PLACEHOLDER__"
+
+
+def _key(snapshot, template_name):
+    return (
+        f"fragment:{snapshot['session_id']}:{snapshot['version']}:"
+        f"{snapshot['question_id']}:{template_name}"
+    )
+
+
+def render_fragment(request, template_name, snapshot, get_context):
+    """
+    Returns a response with the rendered template for the given game state.
+    get_context is only called if the fragment is not cached yet.
+    """
+    cache = caches[settings.QUIZ_GAME_STATE_CACHE]
+    key = _key(snapshot, template_name)
+
+    html = cache.get(key)
+    if html is None:
+        context = get_context()
+        context["csrf_token"] = CSRF_PLACEHOLDER
+        html = render_to_string(template_name, context)
+        cache.set(key, html, FRAGMENT_TIMEOUT)
+
+    return HttpResponse(html.replace(CSRF_PLACEHOLDER, get_token(request)))
+
+
+async def arender_fragment(request, template_name, snapshot, get_context):
+    """
+    Async version of render_fragment() for the async views (see async_views.py).
+    get_context is a sync function and runs in a thread.
+    """
+    cache = caches[settings.QUIZ_GAME_STATE_CACHE]
+    key = _key(snapshot, template_name)
+
+    html = await cache.aget(key)
+    if html is None:
+        context = await sync_to_async(get_context)()
+        context["csrf_token"] = CSRF_PLACEHOLDER
+        html = render_to_string(template_name, context)
+        await cache.aset(key, html, FRAGMENT_TIMEOUT)
+
+    return HttpResponse(html.replace(CSRF_PLACEHOLDER, get_token(request)))
@@ -0,0 +1,218 @@
+"""
+Cache of the live state of game sessions, keyed by join code.
+
+Every player polls the game state every few seconds, so the pollers are served
+from a compact snapshot of the state instead of the database. The snapshot is
+rebuilt from the database whenever a view changes the state of a game
+(write-through) and on a cache miss.
+
+The cache alias is configured with QUIZ_GAME_STATE_CACHE. The default is an
+in-process locmem cache, which is only correct with a single worker process.
+With several processes the alias must point to a shared backend
+(e.g. Redis or Memcached), see CACHES in quizsystem/settings.py. Otherwise the
+other processes serve their old snapshot until it expires (LIVE_TIMEOUT).
+"""
+
+import math
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from .models import GameSession, TeamGameAnswer
+
+# Live games are rebuilt from the database a minute after their last change at
+# the latest, so a snapshot that is stale for any reason doesn't stay for long
+LIVE_TIMEOUT = 60
+
+# Finished games only stay cached long enough to redirect the last pollers
+FINISHED_TIMEOUT = 60 * 5
+
+# Poll intervals in seconds: the pollers start with the minimum after a change
+# of the state and double the interval while nothing changes, up to the
+# maximum of the game status (see poll_interval)
+POLL_MIN_INTERVAL = 1
+POLL_MAX_INTERVALS = {"LOBBY": 10, "ACTIVE": 4}
+
+# Writers of a newer snapshot wait this long for a concurrent writer
+LOCK_TIMEOUT = 5
+LOCK_WAIT = 0.5
+LOCK_RETRY_DELAY = 0.01
+
+
+def _cache():
+    return caches[settings.QUIZ_GAME_STATE_CACHE]
+
+
+def _key(join_code):
+    return f"game-state:{join_code.upper()}"
+
+
+def build_snapshot(join_code):
+    """
+    Reads the current state of a game session from the database.
+    Returns None if there is no game session with this join code.
+    """
+    game_session = GameSession.objects.current(join_code)
+    if game_session is None:
+        return None
+
+    snapshot = {
+        "session_id": game_session.pk,
+        "join_code": game_session.join_code,
+        "version": game_session.state_version,
+        # Stored with the state, so a rebuild after a cache miss keeps it
+        "changed_at": game_session.state_changed_at.timestamp(),
+        "status": game_session.status,
+        "participants": list(
+            game_session.participants.order_by("id").values_list("user_id", flat=True)
+        ),
+        "question_id": game_session.current_question_id,
+        "question_number": None,
+        "total_questions": None,
+        "answered": False,
+        "answer": None,
+    }
+
+    if game_session.current_question_id is None:
+        return snapshot
+
+    snapshot["total_questions"] = game_session.question_count
+    if game_session.current_position is not None:
+        snapshot["question_number"] = game_session.current_position + 1
+
+    team_answer = (
+        TeamGameAnswer.objects.filter(
+            session=game_session, question_id=game_session.current_question_id
+        )
+        .select_related("answered_by")
+        .first()
+    )
+    if team_answer is not None:
+        snapshot["answered"] = True
+        snapshot["answer"] = {
+            "selected_answer_id": team_answer.selected_answer_id,
+            "is_correct": team_answer.is_correct,
+            "answered_by": (
+                team_answer.answered_by.username if team_answer.answered_by else None
+            ),
+        }
+
+    return snapshot
+
+
+def _timeout(snapshot):
+    """
+    Finished games expire soon after.
+    """
+    return FINISHED_TIMEOUT if snapshot["status"] == "FINISHED" else LIVE_TIMEOUT
+
+
+@contextmanager
+def _lock(key):
+    """
+    Holds a lock on a cache key across processes (cache.add is atomic in all
+    cache backends). Yields whether the lock was acquired within LOCK_WAIT.
+    """
+    cache = _cache()
+    lock_key = f"{key}:lock"
+    deadline = time.monotonic() + LOCK_WAIT
+    while not cache.add(lock_key, True, LOCK_TIMEOUT):
+        if time.monotonic() > deadline:
+            yield False
+            return
+        time.sleep(LOCK_RETRY_DELAY)
+    try:
+        yield True
+    finally:
+        cache.delete(lock_key)
+
+
+def store_snapshot(snapshot):
+    """
+    Writes a snapshot to the cache, unless the cached one is newer.
+
+    Rebuilds after changes run concurrently (e.g. a join and the start of the
+    game), so reading the cached version and writing the snapshot happens
+    under a lock. Without the lock, the older snapshot could be written last.
+    """
+    cache = _cache()
+    key = _key(snapshot["join_code"])
+
+    with _lock(key) as locked:
+        if not locked:
+            # The cached version is unknown: the next read rebuilds it
+            cache.delete(key)
+            return
+
+        cached = cache.get(key)
+        if cached is not None and cached["version"] > snapshot["version"]:
+            return
+        cache.set(key, snapshot, _timeout(snapshot))
+
+
+def get_snapshot(join_code):
+    """
+    Returns the cached state of a game session, loading it on a cache miss.
+    Returns None if there is no game session with this join code.
+    """
+    key = _key(join_code)
+    snapshot = _cache().get(key)
+    if snapshot is None:
+        snapshot = build_snapshot(join_code)
+        # Only fills the gap: a snapshot written meanwhile by a rebuild after
+        # a change is at least as new
+        if snapshot is not None:
+            _cache().add(key, snapshot, _timeout(snapshot))
+    return snapshot
+
+
+async def aget_snapshot(join_code):
+    """
+    Async version of get_snapshot() for the async views (see async_views.py).
+    Only a cache miss needs a thread.
+    """
+    snapshot = await _cache().aget(_key(join_code))
+    if snapshot is None:
+        snapshot = await sync_to_async(get_snapshot)(join_code)
+    return snapshot
+
+
+def poll_interval(snapshot):
+    """
+    Returns the seconds until the next poll of a game state, or 0 if the
+    game is finished and the pollers should stop.
+    """
+    if snapshot["status"] == "FINISHED":
+        return 0
+    maximum = POLL_MAX_INTERVALS.get(snapshot["status"], POLL_MIN_INTERVAL)
+    idle = max(time.time() - snapshot.get("changed_at", time.time()), 0)
+    # 1 s during the first second after a change, 2 s until 3 s, 4 s until 7 s...
+    interval = POLL_MIN_INTERVAL * 2 ** int(math.log2(idle / POLL_MIN_INTERVAL + 1))
+    return min(interval, maximum)
+
+
+def refresh(join_code):
+    """
+    Rebuilds the cached state once the current transaction has been committed.
+    Must be called by every view that changes the state of a game session.
+    """
+
+    def rebuild():
+        snapshot = build_snapshot(join_code)
+        if snapshot is None:
+            _cache().delete(_key(join_code))
+        else:
+            store_snapshot(snapshot)
+
+    transaction.on_commit(rebuild)
+
+
+def discard(join_codes):
+    """
+    Removes the cached state of deleted game sessions.
+    """
+    _cache().delete_many([_key(join_code) for join_code in join_codes])
@@ -0,0 +1,229 @@
+"""
+The parts of the game views that the sync views (views.py) and the async views
+(async_views.py, see QUIZ_ASYNC_VIEWS) share: reading the cached game state once
+per request, the ETags and poll intervals of the pollers, their responses and
+template contexts, and claiming the team answer.
+
+The two sets of views only differ in how they call these functions: directly,
+or awaited (aget_snapshot, and sync_to_async for the database work).
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+
+from . import events, game_state, question_stats
+from .models import Question, TeamGameAnswer
+
+POINTS_PER_CORRECT_ANSWER = 10
+
+# Every poller response (including 304) tells the client when to poll next,
+# see game_state.poll_interval. The pollers in the templates schedule their
+# next request themselves (quiz/base.html).
+POLL_INTERVAL_HEADER = "X-Poll-Interval"
+
+
+def state_changed(game_session, event, **data):
+    """
+    Refreshes the cached game state and notifies connected clients.
+    Called by every view that changes the state of a game session.
+    """
+    game_state.refresh(game_session.join_code)
+    events.publish(game_session.join_code, event, **data)
+
+
+# CACHED GAME STATE
+# The ETag function and the poller use the same state, read once per request,
+# so the snapshot (with all participants) is only unpickled once.
+def get_snapshot(request, join_code):
+    """
+    Returns the cached state of a game session, read once per request.
+    """
+    if not hasattr(request, "_game_snapshot"):
+        request._game_snapshot = game_state.get_snapshot(join_code)
+    return request._game_snapshot
+
+
+async def aget_snapshot(request, join_code):
+    if not hasattr(request, "_game_snapshot"):
+        request._game_snapshot = await game_state.aget_snapshot(join_code)
+    return request._game_snapshot
+
+
+def check_snapshot(snapshot, user=None):
+    """
+    Returns the snapshot, or raises Http404 if there is no game session.
+    If a user is given, the user must be a participant of the game session.
+    """
+    if snapshot is None or (user and user.pk not in snapshot["participants"]):
+        raise Http404("No game session found.")
+    return snapshot
+
+
+# CONDITIONAL POLLING
+# The pollers send back the ETag of the last response (If-None-Match).
+# As long as the state version of the game session is unchanged, they get
+# a bodyless 304 response straight from the cached game state.
+def state_etag(snapshot):
+    """
+    Builds the ETag from the session and state version of a snapshot.
+    """
+    if snapshot is None:
+        return None
+    return f'"{snapshot["session_id"]}-{snapshot["version"]}"'
+
+
+def participant_state_etag(snapshot, user):
+    """
+    ETag of a snapshot, if the user is a participant of the game session.
+    """
+    if snapshot is None or user.pk not in snapshot["participants"]:
+        return None
+    return state_etag(snapshot)
+
+
+def add_poll_interval(response, snapshot):
+    """
+    Adds the seconds until the next poll (0: stop polling) to a poller response.
+    """
+    if snapshot is not None:
+        response[POLL_INTERVAL_HEADER] = str(game_state.poll_interval(snapshot))
+    return response
+
+
+# POLLER RESPONSES
+def hx_redirect(view_name, join_code):
+    response = HttpResponse()
+    response["HX-Redirect"] = reverse(view_name, args=[join_code])
+    return response
+
+
+def lobby_after(request):
+    """
+    The id of the last participant the lobby of the client shows.
+    """
+    try:
+        return int(request.GET.get("after", 0))
+    except ValueError:
+        return 0
+
+
+def lobby_delta_context(snapshot, participants, after, sse_enabled):
+    """
+    Context of the participants that joined after the given one
+    (quiz/partials/_lobby_participants_delta.html).
+    """
+    return {
+        "game_session": snapshot,
+        "participants": participants,
+        "host_user_id": snapshot["participants"][0],
+        "last_participant_id": participants[-1].pk if participants else after,
+        "etag": state_etag(snapshot),
+        "poll_interval": game_state.poll_interval(snapshot),
+        "sse_enabled": sse_enabled,
+    }
+
+
+def game_start_response(snapshot, join_code):
+    """
+    Redirects the lobby pollers to the game once it has started.
+    """
+    if snapshot["status"] == "ACTIVE":
+        return hx_redirect("game_view", join_code)
+    return HttpResponse()
+
+
+def question_fragment(snapshot):
+    """
+    Returns the template name and the (sync) context function of the current
+    question of a running game, or of its result once the team answered.
+    The partials are the same for all players, so they are rendered once per
+    state and then served from the fragment cache (see fragments.py).
+    """
+
+    def get_question():
+        return get_object_or_404(
+            Question.objects.prefetch_related("answers"), pk=snapshot["question_id"]
+        )
+
+    if snapshot["answered"]:
+        team_answer = snapshot["answer"]
+        return "quiz/partials/_question_result.html", lambda: {
+            "game_session": snapshot,
+            "question": get_question(),
+            "team_answer": team_answer,
+            "answered_by_user": team_answer["answered_by"] or "jemand",
+        }
+
+    question_number = snapshot["question_number"]
+    total_questions = snapshot["total_questions"]
+    if question_number and total_questions:
+        # Calculate percentage for progress bar
+        progress_percentage = ((question_number - 1) * 100) / total_questions
+    else:
+        question_number = "?"
+        total_questions = "?"
+        progress_percentage = 0  # Fallback
+
+    return "quiz/partials/_game_question.html", lambda: {
+        "game_session": snapshot,
+        "question": get_question(),
+        "question_number": question_number,
+        "total_questions": total_questions,
+        "progress_percentage": progress_percentage,
+    }
+
+
+# ANSWERS
+def claim_answer(game_session, question, selected_answer, user):
+    """
+    Claims the team answer for the question: the first submitted answer wins.
+    Returns (team_answer, claimed).
+
+    The winner inserts the answer, updates the score and the state version in
+    one short transaction. The unique constraint on (session, question) decides
+    between simultaneous submitters, so the losers don't retry: their insert
+    fails and they read the winner's answer instead.
+    """
+    try:
+        with transaction.atomic():
+            team_answer = TeamGameAnswer.objects.create(
+                session=game_session,
+                question=question,
+                selected_answer=selected_answer,
+                answered_by=user,
+                is_correct=selected_answer.is_correct,
+            )
+            question_stats.record_answer(question.id, team_answer.is_correct)
+            if team_answer.is_correct:
+                # One write for the whole team instead of one per participant
+                game_session.update_state(
+                    team_score=F("team_score") + POINTS_PER_CORRECT_ANSWER,
+                    correct_count=F("correct_count") + 1,
+                )
+            else:
+                game_session.update_state()
+    except IntegrityError:
+        team_answer = TeamGameAnswer.objects.select_related("answered_by").get(
+            session=game_session, question=question
+        )
+        return team_answer, False
+
+    return team_answer, True
+
+
+def answer_result_context(game_session, question, team_answer):
+    """
+    Context of the result of a question for the player that submitted an
+    answer (quiz/partials/_question_result.html).
+    """
+    return {
+        "game_session": game_session,
+        "question": question,
+        "team_answer": team_answer,
+        "answered_by_user": (
+            team_answer.answered_by.username if team_answer.answered_by else "jemand"
+        ),
+    }
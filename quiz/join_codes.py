@@ -0,0 +1,74 @@
+"""
+Allocation of join codes for game sessions.
+
+Join codes are 6 characters of 0-9A-Z (36^6 = 2,176,782,336 codes). Instead of
+random codes, which collide more and more often the more sessions exist, every
+new session takes the next number of a counter in the database and maps it to
+a code with a bijective affine permutation:
+
+    code number = (MULTIPLIER * n + OFFSET) mod CODE_SPACE
+
+MULTIPLIER is coprime to CODE_SPACE, so different numbers always give different
+codes, while consecutive sessions still get codes that look random. A code is
+only used again after the counter wrapped around the whole code space, by which
+time its former session is long finished (or archived). Join codes are only
+unique among live sessions (constraint "unique_live_join_code"); should the
+code of a still-live session come up again, it is skipped.
+"""
+
+from django.db import connection
+
+from .models import GameSession, JoinCodeSequence
+
+ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+CODE_LENGTH = 6
+CODE_SPACE = len(ALPHABET) ** CODE_LENGTH
+
+# CODE_SPACE is 2^12 * 3^12, the multiplier must not be divisible by 2 or 3
+MULTIPLIER = 1_580_030_173
+OFFSET = 329_170_553
+
+LIVE_STATUSES = ("LOBBY", "ACTIVE")
+
+
+def code_for(number):
+    """
+    Returns the join code of a sequence number (0 <= number < CODE_SPACE).
+    """
+    value = (MULTIPLIER * number + OFFSET) % CODE_SPACE
+    chars = []
+    for _ in range(CODE_LENGTH):
+        value, index = divmod(value, len(ALPHABET))
+        chars.append(ALPHABET[index])
+    return "".join(reversed(chars))
+
+
+def _next_number():
+    """
+    Takes the next number of the counter, creating the counter on first use.
+    A single UPDATE ... RETURNING statement, so no transaction is needed.
+    """
+    table = connection.ops.quote_name(JoinCodeSequence._meta.db_table)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET next_number = next_number + 1 WHERE id = 1 "
+            "RETURNING next_number"
+        )
+        row = cursor.fetchone()
+
+    if row is None:
+        JoinCodeSequence.objects.get_or_create(pk=1)
+        return _next_number()
+    return (row[0] - 1) % CODE_SPACE
+
+
+def allocate():
+    """
+    Returns a join code that no live game session uses.
+    """
+    while True:
+        code = code_for(_next_number())
+        if not GameSession.objects.filter(
+            join_code=code, status__in=LIVE_STATUSES
+        ).exists():
+            return code
@@ -0,0 +1,201 @@
+"""
+Leaderboards over all finished games: one per course and an all-time
+leaderboard over all courses.
+
+Summing up the scores of every game a user played would scan all sessions on
+every page view. Instead, every user has a LeaderboardEntry per course and
+one for all courses (course NULL) that next_question updates when a game
+finishes, in the transaction that finishes it. In coop mode all participants
+get the team score, so the entries of a game are updated with a few queries,
+independent of the number of participants.
+
+The top TOP_SIZE entries of each leaderboard are kept in the default cache for
+TOP_TIMEOUT seconds. They are refreshed after every finished game and dropped
+when entries are deleted (e.g. with their user, see quiz/signals.py). The rank
+of a user is the number of users with more points plus one (users with the same
+points share a rank). The rank of a user in the top list needs no query, all
+other ranks are counted, see get_rank().
+
+rebuild() recomputes all entries from the finished games
+(python manage.py rebuild_leaderboard).
+"""
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F, Sum
+
+from .models import GameParticipant, LeaderboardEntry
+
+TOP_SIZE = 10
+
+# Entries change without a finished game (e.g. renamed users), so the top
+# lists are reloaded now and then
+TOP_TIMEOUT = 60 * 5
+
+BATCH_SIZE = 2000
+
+
+def _key(course_id):
+    return f"leaderboard:{course_id or 'all'}"
+
+
+def _entries(course_id):
+    """
+    The entries of the leaderboard of a course, or of the all-time
+    leaderboard if course_id is None.
+    """
+    if course_id is None:
+        return LeaderboardEntry.objects.filter(course__isnull=True)
+    return LeaderboardEntry.objects.filter(course_id=course_id)
+
+
+def record_game(game_session):
+    """
+    Adds the result of a finished game to the leaderboards of its
+    participants. Must be called in the transaction that finishes the game.
+    """
+    user_ids = list(game_session.participants.values_list("user_id", flat=True))
+    scopes = (
+        [None] if game_session.course_id is None else [game_session.course_id, None]
+    )
+
+    # Missing entries are created empty, so that all entries are updated alike
+    LeaderboardEntry.objects.bulk_create(
+        [
+            LeaderboardEntry(user_id=user_id, course_id=course_id)
+            for course_id in scopes
+            for user_id in user_ids
+        ],
+        ignore_conflicts=True,
+    )
+    for course_id in scopes:
+        _entries(course_id).filter(user_id__in=user_ids).update(
+            total_score=F("total_score") + game_session.team_score,
+            games_played=F("games_played") + 1,
+            correct_count=F("correct_count") + game_session.correct_count,
+        )
+        transaction.on_commit(lambda course_id=course_id: refresh(course_id))
+
+
+def _load_top(course_id):
+    """
+    Reads the top entries of a leaderboard from the start of its index.
+    """
+    top = []
+    for entry in (
+        _entries(course_id)
+        .select_related("user")
+        .order_by("-total_score", "user_id")[:TOP_SIZE]
+    ):
+        rank = len(top) + 1
+        if top and top[-1]["total_score"] == entry.total_score:
+            rank = top[-1]["rank"]
+        top.append(
+            {
+                "rank": rank,
+                "user_id": entry.user_id,
+                "username": entry.user.username,
+                "total_score": entry.total_score,
+                "games_played": entry.games_played,
+            }
+        )
+    return top
+
+
+def refresh(course_id):
+    """
+    Reloads the cached top list of a leaderboard.
+    """
+    cache.set(_key(course_id), _load_top(course_id), TOP_TIMEOUT)
+
+
+def invalidate(course_id):
+    """
+    Drops the cached top list of a leaderboard, e.g. after an entry was deleted.
+    """
+    cache.delete(_key(course_id))
+
+
+def get_top(course_id=None):
+    """
+    Returns the top TOP_SIZE entries of a leaderboard as dicts with the rank,
+    user and points, loading them on a cache miss.
+    """
+    top = cache.get(_key(course_id))
+    if top is None:
+        top = _load_top(course_id)
+        cache.set(_key(course_id), top, TOP_TIMEOUT)
+    return top
+
+
+def get_rank(user, course_id=None, top=None):
+    """
+    Returns the entry of a user as a dict like the ones of get_top(), or None
+    if the user has not finished a game yet.
+
+    Outside of the top list, the rank costs O(rank): the users ahead are
+    counted on the covering index (course, total_score DESC, user), which
+    reads one index entry per user ahead but no table rows. For a user far
+    down a large leaderboard this is the most expensive query of the page.
+    """
+    if top is None:
+        top = get_top(course_id)
+    for entry in top:
+        if entry["user_id"] == user.pk:
+            return entry
+
+    entry = _entries(course_id).filter(user=user).first()
+    if entry is None:
+        return None
+    ahead = _entries(course_id).filter(total_score__gt=entry.total_score).count()
+    return {
+        "rank": ahead + 1,
+        "user_id": user.pk,
+        "username": user.username,
+        "total_score": entry.total_score,
+        "games_played": entry.games_played,
+    }
+
+
+def rebuild():
+    """
+    Recomputes all leaderboard entries from the finished games.
+    Returns the number of entries.
+    """
+    finished = GameParticipant.objects.filter(session__status="FINISHED").order_by()
+    totals = {
+        "total_score": Sum("session__team_score"),
+        "games_played": Count("pk"),
+        "correct_count": Sum("session__correct_count"),
+    }
+
+    entries = []
+    for row in (
+        finished.filter(session__course__isnull=False)
+        .values("user_id", "session__course_id")
+        .annotate(**totals)
+    ):
+        entries.append(
+            LeaderboardEntry(
+                user_id=row["user_id"],
+                course_id=row["session__course_id"],
+                **{name: row[name] for name in totals},
+            )
+        )
+    for row in finished.values("user_id").annotate(**totals):
+        entries.append(
+            LeaderboardEntry(
+                user_id=row["user_id"], **{name: row[name] for name in totals}
+            )
+        )
+
+    course_ids = set(
+        LeaderboardEntry.objects.values_list("course_id", flat=True).distinct()
+    )
+    with transaction.atomic():
+        LeaderboardEntry.objects.all().delete()
+        LeaderboardEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE)
+
+    course_ids |= {entry.course_id for entry in entries}
+    cache.delete_many([_key(course_id) for course_id in course_ids | {None}])
+    return len(entries)
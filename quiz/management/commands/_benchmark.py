@@ -0,0 +1,51 @@
+"""
+Helpers shared by the benchmark management commands.
+(The leading underscore keeps Django from treating this module as a command.)
+"""
+
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def benchmark_database():
+    """
+    Runs the enclosed code against a throwaway test database, just like the
+    test runner does, so benchmarks never touch the real data.
+    """
+    old_name = connection.settings_dict["NAME"]
+    connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def measure(func, repeat):
+    """
+    Calls func `repeat` times and returns the durations in milliseconds.
+    """
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def percentile(values, percent):
+    """
+    Returns the given percentile (0-100) of a list of values.
+    """
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[percent - 1]
+
+
+def format_ms(value):
+    return f"{value:10.2f} ms"
@@ -0,0 +1,194 @@
+"""
+Measures the render time and query count of the admin change lists of the
+large tables (questions, game sessions, team answers) with many rows, and
+compares them with the former admin configuration (exact counts, no
+select_related, sidebar filters on creator and session).
+
+Usage: python manage.py benchmark_admin [--questions 1000000] [--sessions 100000]
+"""
+
+import time
+
+from django.contrib import admin
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from quiz import join_codes
+from quiz.models import (
+    Answer,
+    Course,
+    GameParticipant,
+    GameSession,
+    Question,
+    TeamGameAnswer,
+)
+from quiz.views import QUESTIONS_PER_GAME
+
+from ._benchmark import benchmark_database, format_ms, percentile
+
+BATCH_SIZE = 5000
+USERS = 1000
+
+# Admin options before the rework, restored on the registered admins for comparison
+FORMER_OPTIONS = {
+    Question: {"list_filter": ("status", "course", "creator")},
+    GameSession: {},
+    TeamGameAnswer: {"list_filter": ("session", "is_correct")},
+}
+
+
+class Command(BaseCommand):
+    help = "Benchmarks the admin change lists of large tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--questions",
+            type=int,
+            default=200_000,
+            help="Number of questions (with one answer each).",
+        )
+        parser.add_argument(
+            "--sessions",
+            type=int,
+            default=20_000,
+            help=f"Number of finished games ({QUESTIONS_PER_GAME} answers each).",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=10,
+            help="How often each change list is rendered.",
+        )
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            self.stdout.write("Creating test data...")
+            self._create_data(options["questions"], options["sessions"])
+
+            superuser = User.objects.create_superuser("benchmark-admin")
+            client = Client(SERVER_NAME="localhost")
+            client.force_login(superuser)
+
+            for model in FORMER_OPTIONS:
+                url = reverse(f"admin:quiz_{model._meta.model_name}_changelist")
+                # The first page and a page in the middle of the table
+                middle = (
+                    model.objects.count()
+                    // admin.site._registry[model].list_per_page
+                    // 2
+                )
+                for url_suffix in ("", f"?p={max(middle, 1)}"):
+                    self._report(client, model, url + url_suffix, options["repeat"])
+
+    def _create_data(self, question_count, session_count):
+        users = User.objects.bulk_create(
+            User(username=f"benchmark-{i}") for i in range(USERS)
+        )
+        course = Course.objects.create(name="BENCHMARK")
+
+        for start in range(0, question_count, BATCH_SIZE):
+            questions = Question.objects.bulk_create(
+                Question(
+                    course=course,
+                    creator=users[i % USERS],
+                    text=f"Question {i}",
+                    status="APPROVED",
+                )
+                for i in range(start, min(start + BATCH_SIZE, question_count))
+            )
+            Answer.objects.bulk_create(
+                Answer(question=question, text="Answer", is_correct=True)
+                for question in questions
+            )
+        self.stdout.write(f"  {question_count} questions")
+
+        first_question = Question.objects.order_by("pk").values_list("pk", flat=True)[0]
+        first_answer = Answer.objects.order_by("pk").values_list("pk", flat=True)[0]
+        sessions_per_batch = BATCH_SIZE // QUESTIONS_PER_GAME
+
+        def first_offset(number):
+            # Every game asks QUESTIONS_PER_GAME consecutive questions
+            return (number * QUESTIONS_PER_GAME) % (
+                question_count - QUESTIONS_PER_GAME + 1
+            )
+
+        for start in range(0, session_count, sessions_per_batch):
+            numbers = range(start, min(start + sessions_per_batch, session_count))
+            sessions = GameSession.objects.bulk_create(
+                GameSession(
+                    course=course,
+                    join_code=join_codes.code_for(number),
+                    status="FINISHED",
+                    question_count=QUESTIONS_PER_GAME,
+                )
+                for number in numbers
+            )
+            GameParticipant.objects.bulk_create(
+                GameParticipant(session=session, user=users[number % USERS])
+                for number, session in zip(numbers, sessions)
+            )
+            TeamGameAnswer.objects.bulk_create(
+                TeamGameAnswer(
+                    session=session,
+                    question_id=first_question + offset,
+                    selected_answer_id=first_answer + offset,
+                    answered_by=users[number % USERS],
+                    is_correct=True,
+                )
+                for number, session in zip(numbers, sessions)
+                for offset in range(
+                    first_offset(number), first_offset(number) + QUESTIONS_PER_GAME
+                )
+            )
+        self.stdout.write(
+            f"  {session_count} games, "
+            f"{session_count * QUESTIONS_PER_GAME} team answers"
+        )
+
+    def _render(self, client, url, repeat):
+        durations = []
+        queries = 0
+        for _ in range(repeat):
+            with CaptureQueriesContext(connection) as context:
+                start = time.perf_counter()
+                response = client.get(url)
+                durations.append((time.perf_counter() - start) * 1000)
+            assert response.status_code == 200, response.status_code
+            queries = len(context.captured_queries)
+        return durations, queries
+
+    def _report(self, client, model, url, repeat):
+        model_admin = admin.site._registry[model]
+        current, current_queries = self._render(client, url, repeat)
+
+        former = {
+            "paginator": Paginator,
+            "show_full_result_count": True,
+            "list_select_related": False,
+            "date_hierarchy": None,
+            **FORMER_OPTIONS[model],
+        }
+        saved = {name: getattr(model_admin, name) for name in former}
+        try:
+            for name, value in former.items():
+                setattr(model_admin, name, value)
+            before, before_queries = self._render(client, url, repeat)
+        finally:
+            for name, value in saved.items():
+                setattr(model_admin, name, value)
+
+        self.stdout.write(f"{url}")
+        for label, durations, queries in (
+            ("former ", before, before_queries),
+            ("current", current, current_queries),
+        ):
+            self.stdout.write(
+                f"  {label}  p50 {format_ms(percentile(durations, 50))}"
+                f"   p95 {format_ms(percentile(durations, 95))}"
+                f"   {queries:4d} queries"
+            )
@@ -0,0 +1,74 @@
+"""
+Creates many game sessions with the join code allocator (quiz/join_codes.py)
+and compares it with the former random codes (6 hex digits of a UUID).
+
+Usage: python manage.py benchmark_join_codes [--sessions 100000]
+"""
+
+import time
+import uuid
+
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, transaction
+
+from quiz.models import Course, GameSession
+
+from ._benchmark import benchmark_database, format_ms, percentile
+
+
+class Command(BaseCommand):
+    help = "Benchmarks the join code allocation for many new game sessions."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sessions",
+            type=int,
+            default=100_000,
+            help="Number of game sessions to create.",
+        )
+
+    def handle(self, *args, **options):
+        count = options["sessions"]
+
+        # Former approach: every repeated code was an IntegrityError without retry
+        seen = set()
+        collisions = 0
+        for _ in range(count):
+            code = uuid.uuid4().hex[:6].upper()
+            if code in seen:
+                collisions += 1
+            seen.add(code)
+        self.stdout.write(
+            f"Random hex codes: {collisions} of {count} sessions would have failed "
+            "with a duplicate join code."
+        )
+
+        with benchmark_database():
+            course = Course.objects.create(name="BENCHMARK")
+            durations = []
+            errors = 0
+
+            self.stdout.write(f"Creating {count} game sessions...")
+            start = time.perf_counter()
+            for _ in range(count):
+                begin = time.perf_counter()
+                try:
+                    with transaction.atomic():
+                        GameSession.objects.create(course=course)
+                except IntegrityError:
+                    errors += 1
+                durations.append((time.perf_counter() - begin) * 1000)
+            elapsed = time.perf_counter() - start
+
+            distinct = GameSession.objects.values("join_code").distinct().count()
+
+        self.stdout.write(
+            f"Allocator: {count} sessions in {elapsed:.1f} s "
+            f"({count / elapsed:.0f} sessions/s), {errors} errors, "
+            f"{distinct} distinct join codes"
+        )
+        self.stdout.write(
+            f"  create   p50 {format_ms(percentile(durations, 50))}"
+            f"   p95 {format_ms(percentile(durations, 95))}"
+            f"   p99 {format_ms(percentile(durations, 99))}"
+        )
@@ -0,0 +1,328 @@
+"""
+Compares serving the game state poller to many concurrent players through
+WSGI (a pool of worker threads, like gunicorn --threads) and through ASGI
+(one event loop, like uvicorn quizsystem.asgi:application), with the sync
+views (quiz/views.py) and with the async views (quiz/async_views.py, see
+QUIZ_ASYNC_VIEWS).
+
+All pollers are players of one large game and poll at the same moment, like
+after the state of the game changed. In the "unchanged" rounds the players
+already have the current state (304 Not Modified from the cached game state),
+in the "changed" rounds they get the question fragment. --db-latency delays
+every query, like a database server on another machine.
+
+The Django handlers are called directly in this process, without HTTP, so
+the numbers show the cost of the request handling itself, not of holding
+idle client connections.
+
+Usage: python manage.py benchmark_pollers [--pollers 1000] [--threads 16]
+"""
+
+import asyncio
+import io
+import logging
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.urls import include, path, reverse
+
+from quiz import async_views, game_state, views
+from quiz.gameplay import state_etag
+from quiz.models import Answer, Course, GameParticipant, GameSession, Question
+from quiz.urls import game_state_urls
+from quiz.views import QUESTIONS_PER_GAME
+
+from ._benchmark import benchmark_database, format_ms, percentile
+
+
+class ThreadMonitor:
+    """
+    Samples the number of threads of the process while a round runs.
+    """
+
+    def __init__(self):
+        self.peak = threading.active_count()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+
+    def _sample(self):
+        while not self._stop.wait(0.005):
+            self.peak = max(self.peak, threading.active_count())
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def game_urlconf(game_views):
+    """
+    The URLs of the project with the sync or the async game state views,
+    independent of QUIZ_ASYNC_VIEWS.
+    """
+    urlconf = types.ModuleType(f"benchmark_urls_{game_views.__name__}")
+    urlconf.urlpatterns = [
+        *game_state_urls(game_views),
+        path("", include(settings.ROOT_URLCONF)),
+    ]
+    return urlconf
+
+
+class BenchmarkWSGIHandler(WSGIHandler):
+    def __init__(self, urlconf):
+        super().__init__()
+        self.urlconf = urlconf
+
+    def get_response(self, request):
+        request.urlconf = self.urlconf
+        return super().get_response(request)
+
+
+class BenchmarkASGIHandler(ASGIHandler):
+    def __init__(self, urlconf):
+        super().__init__()
+        self.urlconf = urlconf
+
+    async def get_response_async(self, request):
+        request.urlconf = self.urlconf
+        return await super().get_response_async(request)
+
+
+class Command(BaseCommand):
+    help = "Benchmarks the game state pollers under WSGI and ASGI."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--pollers",
+            type=int,
+            default=1000,
+            help="Number of concurrent pollers.",
+        )
+        parser.add_argument(
+            "--threads",
+            type=int,
+            default=16,
+            help="Worker threads of the WSGI server.",
+        )
+        parser.add_argument(
+            "--rounds",
+            type=int,
+            default=5,
+            help="Rounds measured per kind.",
+        )
+        parser.add_argument(
+            "--db-latency",
+            type=float,
+            default=1.0,
+            help="Milliseconds added to every query.",
+        )
+
+    def handle(self, *args, **options):
+        latency = options["db_latency"] / 1000
+
+        def delay(execute, sql, params, many, context):
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        def add_latency(connection, **kwargs):
+            if delay not in connection.execute_wrappers:
+                connection.execute_wrappers.append(delay)
+
+        # One log record per request (every poll of a burst is over the time
+        # budget) would dominate the measurement
+        logging.getLogger("quiz.queries").setLevel(logging.ERROR)
+
+        with benchmark_database():
+            self.stdout.write("Creating the game...")
+            join_code, cookies = self._create_game(options["pollers"])
+            url = reverse("game_state_poller", args=[join_code])
+            etag = state_etag(game_state.get_snapshot(join_code))
+
+            if latency:
+                add_latency(connection)
+                connection_created.connect(add_latency)
+            urlconfs = {
+                "sync": game_urlconf(views),
+                "async": game_urlconf(async_views),
+            }
+            try:
+                self.stdout.write(
+                    f"{options['pollers']} pollers, "
+                    f"{options['db_latency']} ms per query"
+                )
+                for kind, if_none_match in (("unchanged", etag), ("changed", '"0"')):
+                    requests = [(url, cookie, if_none_match) for cookie in cookies]
+                    for server, run in (
+                        (f"WSGI, {options['threads']} threads", self._run_wsgi),
+                        ("ASGI", self._run_asgi),
+                    ):
+                        for variant, urlconf in urlconfs.items():
+                            self._report(
+                                f"{kind} state, {server}, {variant} views",
+                                partial(run, urlconf=urlconf),
+                                requests,
+                                options,
+                            )
+            finally:
+                connection_created.disconnect(add_latency)
+
+    def _create_game(self, poller_count):
+        course = Course.objects.create(name="BENCHMARK")
+        for i in range(QUESTIONS_PER_GAME):
+            question = Question.objects.create(
+                course=course, text=f"Question {i}", status="APPROVED"
+            )
+            Answer.objects.bulk_create(
+                Answer(question=question, text=f"Answer {n}", is_correct=n == 0)
+                for n in range(4)
+            )
+
+        host = User.objects.create_user("benchmark-host")
+        client = Client(SERVER_NAME="localhost")
+        client.force_login(host)
+        client.post(reverse("create_game"), {"course": course.pk})
+        game_session = GameSession.objects.latest("id")
+
+        players = User.objects.bulk_create(
+            User(username=f"benchmark-{i}") for i in range(poller_count)
+        )
+        GameParticipant.objects.bulk_create(
+            GameParticipant(session=game_session, user=player) for player in players
+        )
+        game_session.update_state()
+        game_state.refresh(game_session.join_code)
+        client.post(reverse("start_game", args=[game_session.join_code]))
+
+        # Sessions like after a login, without hashing passwords
+        cookies = []
+        for player in players:
+            session = SessionStore()
+            session[SESSION_KEY] = str(player.pk)
+            session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+            session[HASH_SESSION_KEY] = player.get_session_auth_hash()
+            session.save()
+            cookies.append(f"{settings.SESSION_COOKIE_NAME}={session.session_key}")
+        return game_session.join_code, cookies
+
+    def _run_wsgi(self, requests, options, urlconf):
+        handler = BenchmarkWSGIHandler(urlconf)
+
+        def poll(url, cookie, if_none_match):
+            statuses = []
+            environ = {
+                "REQUEST_METHOD": "GET",
+                "PATH_INFO": url,
+                "QUERY_STRING": "",
+                "SERVER_NAME": "localhost",
+                "SERVER_PORT": "80",
+                "SERVER_PROTOCOL": "HTTP/1.1",
+                "HTTP_HOST": "localhost",
+                "HTTP_COOKIE": cookie,
+                "HTTP_IF_NONE_MATCH": if_none_match,
+                "HTTP_HX_REQUEST": "true",
+                "wsgi.input": io.BytesIO(),
+                "wsgi.errors": io.StringIO(),
+                "wsgi.url_scheme": "http",
+                "wsgi.multithread": True,
+                "wsgi.multiprocess": False,
+                "wsgi.run_once": False,
+                "wsgi.version": (1, 0),
+            }
+            response = handler(
+                environ, lambda status, headers: statuses.append(int(status[:3]))
+            )
+            b"".join(response)
+            response.close()
+            return statuses[0], time.perf_counter()
+
+        with ThreadPoolExecutor(options["threads"]) as executor:
+            start = time.perf_counter()
+            results = list(executor.map(lambda args: poll(*args), requests))
+        return start, results
+
+    def _run_asgi(self, requests, options, urlconf):
+        handler = BenchmarkASGIHandler(urlconf)
+
+        async def poll(url, cookie, if_none_match):
+            statuses = []
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": url,
+                "raw_path": url.encode(),
+                "query_string": b"",
+                "root_path": "",
+                "headers": [
+                    (b"host", b"localhost"),
+                    (b"cookie", cookie.encode()),
+                    (b"if-none-match", if_none_match.encode()),
+                    (b"hx-request", b"true"),
+                ],
+                "client": ("127.0.0.1", 50000),
+                "server": ("localhost", 80),
+            }
+            received = False
+            disconnected = asyncio.Event()
+
+            async def receive():
+                nonlocal received
+                if not received:
+                    received = True
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                # The client stays connected until the response is sent
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    statuses.append(message["status"])
+
+            await handler(scope, receive, send)
+            disconnected.set()
+            return statuses[0], time.perf_counter()
+
+        async def run():
+            start = time.perf_counter()
+            return start, await asyncio.gather(*(poll(*args) for args in requests))
+
+        return asyncio.run(run())
+
+    def _report(self, label, run, requests, options):
+        durations = []
+        latencies = []
+        statuses = set()
+        peak_threads = 0
+        for _ in range(options["rounds"]):
+            with ThreadMonitor() as monitor:
+                start, results = run(requests, options)
+            peak_threads = max(peak_threads, monitor.peak)
+            end = max(finished for _, finished in results)
+            durations.append((end - start) * 1000)
+            latencies += [(finished - start) * 1000 for _, finished in results]
+            statuses |= {status for status, _ in results}
+
+        self.stdout.write(
+            f"  {label:<47} round {format_ms(percentile(durations, 50))}"
+            f"   latency p50 {format_ms(percentile(latencies, 50))}"
+            f"   p95 {format_ms(percentile(latencies, 95))}"
+            f"   {peak_threads:4d} threads   status {sorted(statuses)}"
+        )
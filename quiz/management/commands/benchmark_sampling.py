@@ -0,0 +1,81 @@
+"""
+Compares the random question selection of create_game_session
+(quiz/sampling.py) with the former ORDER BY RANDOM() approach.
+
+Usage: python manage.py benchmark_sampling [--sizes 1000 100000 1000000]
+"""
+
+from django.core.management.base import BaseCommand
+
+from quiz import sampling
+from quiz.models import Course, Question
+from quiz.views import QUESTIONS_PER_GAME
+
+from ._benchmark import benchmark_database, format_ms, measure, percentile
+
+
+class Command(BaseCommand):
+    help = "Benchmarks the random question selection for new game sessions."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=[1_000, 100_000, 1_000_000],
+            help="Numbers of approved questions in the benchmark course.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help="How often each selection is measured.",
+        )
+
+    def handle(self, *args, **options):
+        with benchmark_database():
+            course = Course.objects.create(name="BENCHMARK")
+            created = 0
+
+            for size in sorted(options["sizes"]):
+                self.stdout.write(f"Creating questions up to {size}...")
+                created = self._create_questions(course, created, size)
+                sampling.invalidate(course.pk)
+                self._report(course, size, options["repeat"])
+
+    def _create_questions(self, course, created, size, batch_size=5000):
+        while created < size:
+            batch = min(batch_size, size - created)
+            Question.objects.bulk_create(
+                Question(
+                    course=course, text=f"Question {created + i}", status="APPROVED"
+                )
+                for i in range(batch)
+            )
+            created += batch
+        return created
+
+    def _report(self, course, size, repeat):
+        def order_by_random():
+            questions = Question.objects.filter(course=course, status="APPROVED")
+            if questions.count() >= QUESTIONS_PER_GAME:
+                list(questions.order_by("?")[:QUESTIONS_PER_GAME])
+
+        def index_cold():
+            sampling.invalidate(course.pk)
+            sampling.sample_questions(course, QUESTIONS_PER_GAME)
+
+        def index_warm():
+            sampling.sample_questions(course, QUESTIONS_PER_GAME)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{size} approved questions"))
+        for label, func in [
+            ("ORDER BY RANDOM()", order_by_random),
+            ("id index (reload)", index_cold),
+            ("id index (cached)", index_warm),
+        ]:
+            durations = measure(func, repeat)
+            self.stdout.write(
+                f"  {label:<20} p50 {format_ms(percentile(durations, 50))}"
+                f"   p95 {format_ms(percentile(durations, 95))}"
+            )
@@ -0,0 +1,127 @@
+"""
+Compares the full-text search of questions (quiz/search.py) with the former
+LIKE '%term%' search over the text and explanation.
+
+The questions consist of words of a synthetic vocabulary whose frequencies
+follow Zipf's law, like the words of natural language, so the searches cover
+very common, medium and rare words.
+
+Usage: python manage.py benchmark_search [--sizes 1000 100000 1000000]
+"""
+
+import itertools
+import random
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+
+from quiz import search
+from quiz.models import Question
+
+from ._benchmark import benchmark_database, format_ms, measure, percentile
+
+VOCABULARY_SIZE = 20_000
+WORDS_PER_QUESTION = 12
+RESULTS = 50
+
+# Vocabulary ranks of the searched words (0 is the most common word)
+SEARCHES = [
+    ("common word", [0]),
+    ("medium word", [100]),
+    ("rare word", [5_000]),
+    ("two words", [100, 1_000]),
+]
+
+
+class Command(BaseCommand):
+    help = "Benchmarks the full-text search of questions."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            nargs="+",
+            type=int,
+            default=[1_000, 100_000, 1_000_000],
+            help="Numbers of questions.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=20,
+            help="How often each search is measured.",
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        vocabulary = [self._word(rng) for _ in range(VOCABULARY_SIZE)]
+        cum_weights = list(
+            itertools.accumulate(1 / rank for rank in range(1, VOCABULARY_SIZE + 1))
+        )
+
+        with benchmark_database():
+            if not search.is_available():
+                self.stderr.write("No FTS5 index, only the fallback is measured.")
+
+            users = User.objects.bulk_create(
+                User(username=f"benchmark-{i}") for i in range(100)
+            )
+            created = 0
+            for size in sorted(options["sizes"]):
+                self.stdout.write(f"Creating questions up to {size}...")
+                while created < size:
+                    batch = min(5000, size - created)
+                    Question.objects.bulk_create(
+                        Question(
+                            creator=users[(created + i) % len(users)],
+                            text=" ".join(
+                                rng.choices(
+                                    vocabulary,
+                                    cum_weights=cum_weights,
+                                    k=WORDS_PER_QUESTION,
+                                )
+                            ),
+                        )
+                        for i in range(batch)
+                    )
+                    created += batch
+                self._report(size, vocabulary, users[0], options["repeat"])
+
+    def _word(self, rng):
+        return "".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(4, 9)))
+
+    def _report(self, size, vocabulary, user, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"{size} questions"))
+        for label, ranks in SEARCHES:
+            term = " ".join(vocabulary[rank] for rank in ranks)
+            all_questions = Question.objects.all()
+            own_questions = Question.objects.filter(creator=user)
+
+            def like():
+                list(
+                    search._contains_all_words(all_questions, term).order_by(
+                        "-created_at"
+                    )[:RESULTS]
+                )
+
+            def ranked():
+                search.ranked_questions(all_questions, term, RESULTS)
+
+            def ranked_own():
+                search.ranked_questions(own_questions, term, RESULTS)
+
+            def admin_count():
+                search.filter_questions(all_questions, term).count()
+
+            matches = search.filter_questions(all_questions, term).count()
+            self.stdout.write(f"  {label} ({matches} matches)")
+            for name, func, times in [
+                ("LIKE '%term%'", like, max(repeat // 4, 1)),
+                ("FTS ranked", ranked, repeat),
+                ("FTS ranked, own", ranked_own, repeat),
+                ("FTS count", admin_count, repeat),
+            ]:
+                durations = measure(func, times)
+                self.stdout.write(
+                    f"    {name:<18} p50 {format_ms(percentile(durations, 50))}"
+                    f"   p95 {format_ms(percentile(durations, 95))}"
+                )
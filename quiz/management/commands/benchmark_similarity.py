@@ -0,0 +1,152 @@
+"""
+Measures the near-duplicate index of questions (quiz/similarity.py): the time
+to rebuild it for many questions, and the duration of a lookup when a question
+is submitted, both for a near-duplicate of an existing question and for a new
+question.
+
+Usage: python manage.py benchmark_similarity [--questions 500000] [--courses 20]
+"""
+
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from quiz import similarity
+from quiz.models import Answer, Course, Question
+
+from ._benchmark import benchmark_database, format_ms, measure, percentile
+
+BATCH_SIZE = 5000
+VOCABULARY_SIZE = 20_000
+WORDS_PER_QUESTION = 12
+ANSWERS_PER_QUESTION = 4
+
+
+class Command(BaseCommand):
+    help = "Benchmarks the near-duplicate index of questions."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--questions",
+            type=int,
+            default=500_000,
+            help="Number of questions.",
+        )
+        parser.add_argument(
+            "--courses",
+            type=int,
+            default=20,
+            help="Number of courses the questions are spread over.",
+        )
+        parser.add_argument(
+            "--repeat",
+            type=int,
+            default=200,
+            help="Number of lookups measured per kind.",
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        self.vocabulary = [
+            "".join(rng.choices("abcdefghijklmnopqrstuvwxyz", k=rng.randint(4, 9)))
+            for _ in range(VOCABULARY_SIZE)
+        ]
+
+        with benchmark_database():
+            self.stdout.write("Creating test data...")
+            courses = self._create_data(rng, options["questions"], options["courses"])
+
+            self.stdout.write("Rebuilding the index...")
+            call_command("rebuild_similarity_index", stdout=self.stdout)
+
+            sample = list(
+                Question.objects.prefetch_related("answers").filter(
+                    pk__in=rng.sample(
+                        list(Question.objects.values_list("pk", flat=True)),
+                        options["repeat"],
+                    )
+                )
+            )
+            lookups = {
+                "near-duplicate": [
+                    (
+                        question.course_id,
+                        self._edit(rng, question.text),
+                        [answer.text for answer in question.answers.all()],
+                    )
+                    for question in sample
+                ],
+                "new question": [
+                    (
+                        rng.choice(courses).pk,
+                        self._sentence(rng, WORDS_PER_QUESTION),
+                        [self._sentence(rng, 2) for _ in range(ANSWERS_PER_QUESTION)],
+                    )
+                    for _ in range(options["repeat"])
+                ],
+            }
+
+            for label, arguments in lookups.items():
+                found = 0
+                durations = []
+                for course_id, text, answers in arguments:
+                    start = time.perf_counter()
+                    found += bool(similarity.find_duplicates(course_id, text, answers))
+                    durations.append((time.perf_counter() - start) * 1000)
+                self.stdout.write(
+                    f"  {label:<15} p50 {format_ms(percentile(durations, 50))}"
+                    f"   p95 {format_ms(percentile(durations, 95))}"
+                    f"   duplicates found for {found}/{len(arguments)}"
+                )
+
+            pending = Question.objects.filter(pk__in=[q.pk for q in sample])
+            durations = measure(
+                lambda: similarity.duplicate_clusters(pending),
+                max(options["repeat"] // 20, 1),
+            )
+            self.stdout.write(
+                f"  {'admin clusters':<15} p50 {format_ms(percentile(durations, 50))}"
+                f"   p95 {format_ms(percentile(durations, 95))}"
+                f"   ({len(sample)} pending questions)"
+            )
+
+    def _sentence(self, rng, words):
+        return " ".join(rng.choices(self.vocabulary, k=words))
+
+    def _edit(self, rng, text):
+        """
+        A near-duplicate: one word of the text replaced.
+        """
+        words = text.split()
+        words[rng.randrange(len(words))] = rng.choice(self.vocabulary)
+        return " ".join(words)
+
+    def _create_data(self, rng, question_count, course_count):
+        user = User.objects.create(username="benchmark")
+        courses = Course.objects.bulk_create(
+            Course(name=f"BENCHMARK-{i}") for i in range(course_count)
+        )
+        for start in range(0, question_count, BATCH_SIZE):
+            questions = Question.objects.bulk_create(
+                Question(
+                    course=courses[i % course_count],
+                    creator=user,
+                    text=self._sentence(rng, WORDS_PER_QUESTION),
+                    status="APPROVED",
+                )
+                for i in range(start, min(start + BATCH_SIZE, question_count))
+            )
+            Answer.objects.bulk_create(
+                Answer(
+                    question=question,
+                    text=self._sentence(rng, 2),
+                    is_correct=number == 0,
+                )
+                for question in questions
+                for number in range(ANSWERS_PER_QUESTION)
+            )
+        self.stdout.write(f"  {question_count} questions in {course_count} courses")
+        return courses
@@ -0,0 +1,183 @@
+"""
+Compares the default SQLite configuration of Django with the tuned options of
+the production database profile (SQLITE_OPTIONS in quizsystem/settings.py)
+under concurrent writes.
+
+Writer threads simulate submit_answer: a transaction that reads the game,
+inserts an answer and updates the game. Reader threads simulate the pollers.
+Every thread has its own connection to a temporary database file, like the
+worker threads of the server.
+
+Usage: python manage.py benchmark_sqlite_writers [--writers 20] [--readers 20]
+"""
+
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ._benchmark import percentile
+
+SCHEMA = """
+CREATE TABLE game (id INTEGER PRIMARY KEY, answered INTEGER NOT NULL);
+CREATE TABLE answer (
+    id INTEGER PRIMARY KEY,
+    game_id INTEGER NOT NULL REFERENCES game (id),
+    writer INTEGER NOT NULL,
+    text TEXT NOT NULL
+);
+CREATE INDEX answer_game_id ON answer (game_id);
+"""
+
+GAMES = 10
+
+# Django's defaults: no init command, deferred transactions, 5 seconds busy timeout
+DEFAULT_OPTIONS = {"init_command": "", "transaction_mode": "DEFERRED", "timeout": 5}
+
+
+class Profile:
+    """
+    Opens connections with the given OPTIONS of the Django SQLite backend.
+    """
+
+    def __init__(self, name, options):
+        self.name = name
+        self.init_command = options.get("init_command", "")
+        self.begin = f"BEGIN {options.get('transaction_mode') or 'DEFERRED'}"
+        self.timeout = options.get("timeout", 5)
+
+    def connect(self, path):
+        connection = sqlite3.connect(
+            path, timeout=self.timeout, isolation_level=None, check_same_thread=False
+        )
+        if self.init_command:
+            connection.executescript(self.init_command)
+        return connection
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks concurrent SQLite writers with the default and the tuned options."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--writers", type=int, default=20, help="Concurrent writer threads."
+        )
+        parser.add_argument(
+            "--readers", type=int, default=20, help="Concurrent reader threads."
+        )
+        parser.add_argument(
+            "--transactions",
+            type=int,
+            default=100,
+            help="Write transactions per writer.",
+        )
+
+    def handle(self, *args, **options):
+        tuned = settings.SQLITE_OPTIONS
+        profiles = [Profile("default", DEFAULT_OPTIONS), Profile("tuned", tuned)]
+
+        self.stdout.write(
+            f"{options['writers']} writers x {options['transactions']} transactions, "
+            f"{options['readers']} readers"
+        )
+        self.stdout.write(
+            f"{'profile':<10}{'commits':>9}{'locked':>8}{'tx/s':>9}"
+            f"{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'reads':>9}"
+        )
+        for profile in profiles:
+            with tempfile.TemporaryDirectory() as directory:
+                self._run(profile, Path(directory) / "benchmark.sqlite3", options)
+
+    def _run(self, profile, path, options):
+        setup = profile.connect(path)
+        setup.executescript(SCHEMA)
+        setup.executemany(
+            "INSERT INTO game (id, answered) VALUES (?, 0)",
+            [(i,) for i in range(GAMES)],
+        )
+        setup.close()
+
+        lock = threading.Lock()
+        latencies = []
+        locked = [0]
+        reads = [0]
+        writers_done = threading.Event()
+
+        def write(writer):
+            connection = profile.connect(path)
+            for i in range(options["transactions"]):
+                game_id = (writer + i) % GAMES
+                start = time.perf_counter()
+                try:
+                    connection.execute(profile.begin)
+                    connection.execute(
+                        "SELECT answered FROM game WHERE id = ?", (game_id,)
+                    ).fetchone()
+                    connection.execute(
+                        "INSERT INTO answer (game_id, writer, text) VALUES (?, ?, ?)",
+                        (game_id, writer, "x" * 200),
+                    )
+                    connection.execute(
+                        "UPDATE game SET answered = answered + 1 WHERE id = ?",
+                        (game_id,),
+                    )
+                    connection.execute("COMMIT")
+                except sqlite3.OperationalError as error:
+                    if connection.in_transaction:
+                        connection.execute("ROLLBACK")
+                    if "locked" not in str(error):
+                        raise
+                    with lock:
+                        locked[0] += 1
+                    continue
+                with lock:
+                    latencies.append((time.perf_counter() - start) * 1000)
+            connection.close()
+
+        def read():
+            connection = profile.connect(path)
+            count = 0
+            while not writers_done.is_set():
+                try:
+                    connection.execute(
+                        "SELECT game.answered, COUNT(answer.id) FROM game "
+                        "LEFT JOIN answer ON answer.game_id = game.id "
+                        "WHERE game.id = ? GROUP BY game.id",
+                        (count % GAMES,),
+                    ).fetchall()
+                    count += 1
+                except sqlite3.OperationalError as error:
+                    if "locked" not in str(error):
+                        raise
+                time.sleep(0.001)
+            connection.close()
+            with lock:
+                reads[0] += count
+
+        writers = [
+            threading.Thread(target=write, args=(i,)) for i in range(options["writers"])
+        ]
+        readers = [threading.Thread(target=read) for _ in range(options["readers"])]
+
+        start = time.perf_counter()
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        writers_done.set()
+        for thread in readers:
+            thread.join()
+
+        self.stdout.write(
+            f"{profile.name:<10}{len(latencies):>9}{locked[0]:>8}"
+            f"{len(latencies) / elapsed:>9.1f}{percentile(latencies, 50):>9.1f}"
+            f"{percentile(latencies, 95):>9.1f}{percentile(latencies, 99):>9.1f}"
+            f"{reads[0]:>9}"
+        )
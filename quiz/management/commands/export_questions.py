@@ -0,0 +1,58 @@
+"""
+Exports questions and their answers as CSV or JSON Lines (see quiz/question_io.py
+for the formats). The output can be imported again with import_questions.
+
+Usage: python manage.py export_questions [--course ISEF01] [--status APPROVED]
+       [--format jsonl] [--output bank.jsonl]
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz import question_io
+from quiz.models import Course, Question
+
+
+class Command(BaseCommand):
+    help = "Exports questions and answers as CSV or JSON Lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--course", help="Only questions of this course (name).")
+        parser.add_argument(
+            "--status",
+            choices=[code for code, name in Question.STATUS_CHOICES],
+            help="Only questions with this review status.",
+        )
+        parser.add_argument(
+            "--format", choices=question_io.FORMATS, default="csv", help="File format."
+        )
+        parser.add_argument(
+            "--output", help="File to write to (default: standard output)."
+        )
+
+    def handle(self, *args, **options):
+        questions = Question.objects.all()
+        if options["course"]:
+            try:
+                course = Course.objects.get(name=options["course"])
+            except Course.DoesNotExist:
+                raise CommandError(f"Course '{options['course']}' does not exist.")
+            questions = questions.filter(course=course)
+        if options["status"]:
+            questions = questions.filter(status=options["status"])
+
+        lines = question_io.export_questions(questions, options["format"])
+
+        if not options["output"]:
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+
+        try:
+            with open(options["output"], "w", encoding="utf-8", newline="") as file:
+                count = -1 if options["format"] == "csv" else 0  # CSV header
+                for line in lines:
+                    file.write(line)
+                    count += 1
+        except OSError as error:
+            raise CommandError(f"Cannot write {options['output']}: {error}")
+        self.stderr.write(f"Exported {count} questions to {options['output']}.")
@@ -0,0 +1,106 @@
+"""
+Imports a question bank from a CSV or JSON Lines file (see quiz/question_io.py
+for the formats).
+
+Usage: python manage.py import_questions questions.csv [--course ISEF01]
+       [--creator USERNAME] [--status APPROVED] [--dry-run]
+"""
+
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from quiz import question_io
+from quiz.models import Course, Question
+
+
+class Command(BaseCommand):
+    help = "Imports questions and answers from a CSV or JSON Lines file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or JSON Lines file to import.")
+        parser.add_argument(
+            "--format",
+            choices=question_io.FORMATS,
+            help="File format (default: from the file extension).",
+        )
+        parser.add_argument(
+            "--course",
+            help="Name of the course for questions without a course.",
+        )
+        parser.add_argument(
+            "--creator",
+            help="Username of the creator of the imported questions.",
+        )
+        parser.add_argument(
+            "--status",
+            choices=[code for code, name in Question.STATUS_CHOICES],
+            default="PENDING",
+            help="Review status of the imported questions (default: PENDING).",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Questions per bulk insert (and transaction).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only validate the file, don't import anything.",
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options["path"])
+        file_format = options["format"] or path.suffix.lstrip(".").lower()
+        if file_format not in question_io.FORMATS:
+            raise CommandError(
+                f"Unknown file format '{file_format}', use --format "
+                f"({', '.join(question_io.FORMATS)})."
+            )
+
+        default_course = creator = None
+        if options["course"]:
+            try:
+                default_course = Course.objects.get(name=options["course"])
+            except Course.DoesNotExist:
+                raise CommandError(f"Course '{options['course']}' does not exist.")
+        if options["creator"]:
+            try:
+                creator = User.objects.get(username=options["creator"])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['creator']}' does not exist.")
+
+        def report_error(line_number, messages):
+            for message in messages:
+                self.stderr.write(f"Line {line_number}: {message}")
+
+        try:
+            with path.open(encoding="utf-8", newline="") as file:
+                imported, failed = question_io.import_questions(
+                    file,
+                    file_format,
+                    creator=creator,
+                    status=options["status"],
+                    default_course=default_course,
+                    batch_size=options["batch_size"],
+                    dry_run=options["dry_run"],
+                    on_error=report_error,
+                )
+        except OSError as error:
+            raise CommandError(f"Cannot read {path}: {error}")
+        except UnicodeDecodeError as error:
+            # Batches before the undecodable line are already saved
+            raise CommandError(
+                f"{path} is not UTF-8 encoded ({error.reason})."
+                + ("" if options["dry_run"] else " Earlier batches may be imported.")
+            )
+
+        if options["dry_run"]:
+            self.stdout.write(f"{imported} valid and {failed} invalid questions.")
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f"Imported {imported} questions.")
+                + (f" Skipped {failed} invalid questions." if failed else "")
+            )
@@ -0,0 +1,366 @@
+"""
+Load test of the cooperative game flow against a running server.
+
+Simulates K lobbies with N players each. Every player is a thread with its own
+session that goes through the real HTTP flow: create/join a game, poll the lobby,
+start the game, poll the game state, race to submit an answer and move on to the
+next question until the game is finished.
+
+Start the server first, using the same settings (database) as this command:
+
+    python manage.py runserver --noreload        # or: uvicorn quizsystem.asgi:application
+    python manage.py loadtest_game --lobbies 10 --players 30
+
+The query totals are only available if the server sends the X-Query-Count
+header (QUIZ_QUERY_HEADERS, see quiz/middleware.py). Lock timeouts are
+recognized by "database is locked" in the error page, which requires DEBUG.
+The load test users, questions and games are deleted afterwards.
+"""
+
+import random
+import re
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from email.message import Message
+from http.cookies import SimpleCookie
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+
+from quiz.models import Answer, Course, GameSession, Question
+from quiz.views import QUESTIONS_PER_GAME
+
+from ._benchmark import percentile
+
+COURSE_NAME = "LOADTEST"
+USERNAME_PREFIX = "loadtest-"
+
+ANSWER_URL_PATTERN = re.compile(r"/submit/(\d+)/")
+
+
+class _NoRedirect(urllib.request.HTTPRedirectHandler):
+    """
+    Returns redirects as responses, so every request is measured on its own.
+    """
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class Stats:
+    """
+    Thread-safe collection of the measured requests per endpoint.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.lock_timeouts = defaultdict(int)
+        self.queries = defaultdict(int)
+        self.query_headers = False
+
+    def record(self, endpoint, duration, status, body, headers):
+        with self.lock:
+            self.latencies[endpoint].append(duration * 1000)
+            if status >= 500 or status == 0:
+                self.errors[endpoint] += 1
+                if b"database is locked" in body:
+                    self.lock_timeouts[endpoint] += 1
+            if "X-Query-Count" in headers:
+                self.query_headers = True
+                self.queries[endpoint] += int(headers["X-Query-Count"])
+
+
+class Player:
+    """
+    A simulated player with its own session cookie.
+    """
+
+    def __init__(self, base_url, user, stats):
+        self.base_url = base_url
+        self.stats = stats
+        self.etags = {}
+
+        # Log in without the password hashing on the server (like the test client)
+        client = Client()
+        client.force_login(user)
+        self.cookies = {
+            settings.SESSION_COOKIE_NAME: client.cookies[
+                settings.SESSION_COOKIE_NAME
+            ].value
+        }
+        self.opener = urllib.request.build_opener(_NoRedirect)
+
+    def request(self, endpoint, path, data=None, conditional=False):
+        """
+        Sends a request and records it. Returns (status, body, headers).
+        """
+        headers = {
+            "HX-Request": "true",
+            "Cookie": "; ".join(f"{k}={v}" for k, v in self.cookies.items()),
+        }
+        if data is not None:
+            headers["X-CSRFToken"] = self.cookies.get(settings.CSRF_COOKIE_NAME, "")
+            headers["Referer"] = self.base_url
+            data = urllib.parse.urlencode(data).encode()
+        if conditional and path in self.etags:
+            headers["If-None-Match"] = self.etags[path]
+
+        request = urllib.request.Request(self.base_url + path, data, headers)
+        start = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                status, body, response_headers = (
+                    response.status,
+                    response.read(),
+                    response.headers,
+                )
+        except urllib.error.HTTPError as error:
+            status, body, response_headers = error.code, error.read(), error.headers
+        except OSError:
+            status, body, response_headers = 0, b"", Message()
+        self.stats.record(
+            endpoint, time.perf_counter() - start, status, body, response_headers
+        )
+
+        for header in response_headers.get_all("Set-Cookie") or []:
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+
+        if conditional and response_headers.get("ETag"):
+            self.etags[path] = response_headers["ETag"]
+        return status, body, response_headers
+
+
+class Lobby:
+    """
+    One game played by a host and its players, each in its own thread.
+    """
+
+    def __init__(self, command, players, options):
+        self.command = command
+        self.players = players
+        self.options = options
+        self.join_code = None
+        self.created = threading.Event()
+        self.barrier = threading.Barrier(len(players))
+        self.finished = False
+
+    def wait(self):
+        try:
+            self.barrier.wait(timeout=120)
+        except threading.BrokenBarrierError:
+            raise CommandError("A player did not reach the next step in time.")
+
+    def run_player(self, index):
+        player = self.players[index]
+        is_host = index == 0
+        interval = self.options["poll_interval"]
+
+        # Get the CSRF cookie like a browser loading the homepage
+        player.request("home", "/")
+
+        # 1. Create or join the lobby
+        if is_host:
+            status, body, headers = player.request(
+                "create_game", "/game/create/", {"course": self.command.course.pk}
+            )
+            self.join_code = headers.get("Location", "").strip("/").split("/")[1]
+            self.created.set()
+        else:
+            self.created.wait()
+            player.request("join_game", "/game/join/", {"join_code": self.join_code})
+
+        code = self.join_code
+        for _ in range(self.options["lobby_polls"]):
+            player.request("poll_lobby", f"/game/{code}/poll_lobby/", conditional=True)
+            if not is_host:
+                player.request(
+                    "poll_game_start", f"/game/{code}/poll_start/", conditional=True
+                )
+            time.sleep(interval)
+        self.wait()
+
+        # 2. The host starts the game
+        if is_host:
+            player.request("start_game", f"/game/{code}/start/", {})
+        self.wait()
+
+        # 3. Play all questions
+        while True:
+            answer_ids = []
+            for _ in range(self.options["state_polls"]):
+                status, body, headers = player.request(
+                    "game_state_poller", f"/game/{code}/state/", conditional=True
+                )
+                if headers.get("HX-Redirect"):
+                    self.finished = True
+                answer_ids = answer_ids or ANSWER_URL_PATTERN.findall(body.decode())
+                time.sleep(interval)
+
+            self.wait()
+            if self.finished:
+                break
+
+            # Everybody clicks at the same time, the first answer counts
+            if answer_ids:
+                player.request(
+                    "submit_answer",
+                    f"/game/{code}/submit/{random.choice(answer_ids)}/",
+                    {},
+                )
+            self.wait()
+
+            if is_host:
+                status, body, headers = player.request(
+                    "next_question", f"/game/{code}/next/", {}
+                )
+            self.wait()
+
+        player.request("game_results", f"/game/{code}/results/")
+
+
+class Command(BaseCommand):
+    help = "Simulates classrooms playing cooperative games against a running server."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--base-url",
+            default="http://127.0.0.1:8000",
+            help="URL of the running server.",
+        )
+        parser.add_argument(
+            "--lobbies", type=int, default=5, help="Number of parallel games (K)."
+        )
+        parser.add_argument(
+            "--players", type=int, default=20, help="Players per game (N)."
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            default=0.5,
+            help="Seconds between two polls of a player.",
+        )
+        parser.add_argument(
+            "--lobby-polls",
+            type=int,
+            default=3,
+            help="Lobby polls per player before the game starts.",
+        )
+        parser.add_argument(
+            "--state-polls",
+            type=int,
+            default=2,
+            help="Game state polls per player and question.",
+        )
+        parser.add_argument(
+            "--keep-data",
+            action="store_true",
+            help="Keep the load test users, questions and games afterwards.",
+        )
+
+    def handle(self, *args, **options):
+        base_url = options["base_url"].rstrip("/")
+        try:
+            urllib.request.urlopen(base_url + "/login/", timeout=10)
+        except OSError as error:
+            raise CommandError(f"The server at {base_url} is not reachable: {error}")
+
+        self.stdout.write("Preparing users and questions...")
+        self._prepare_course()
+        stats = Stats()
+        lobbies = []
+        for k in range(options["lobbies"]):
+            players = [
+                Player(base_url, self._get_user(f"{k}-{n}"), stats)
+                for n in range(options["players"])
+            ]
+            lobbies.append(Lobby(self, players, options))
+
+        threads = [
+            threading.Thread(target=lobby.run_player, args=(index,), daemon=True)
+            for lobby in lobbies
+            for index in range(len(lobby.players))
+        ]
+
+        self.stdout.write(
+            f"Playing {options['lobbies']} games with {options['players']} players each..."
+        )
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+
+        self._report(stats, elapsed)
+
+        if not options["keep_data"]:
+            self._cleanup()
+
+    def _prepare_course(self):
+        self.course, _ = Course.objects.get_or_create(name=COURSE_NAME)
+        missing = QUESTIONS_PER_GAME * 2 - self.course.questions.count()
+        for i in range(max(missing, 0)):
+            question = Question.objects.create(
+                course=self.course, text=f"Load test question {i}", status="APPROVED"
+            )
+            Answer.objects.bulk_create(
+                [
+                    Answer(question=question, text="Correct", is_correct=True),
+                    Answer(question=question, text="Wrong 1"),
+                    Answer(question=question, text="Wrong 2"),
+                    Answer(question=question, text="Wrong 3"),
+                ]
+            )
+
+    def _get_user(self, suffix):
+        user, _ = User.objects.get_or_create(username=f"{USERNAME_PREFIX}{suffix}")
+        return user
+
+    def _cleanup(self):
+        GameSession.objects.filter(course=self.course).delete()
+        self.course.questions.all().delete()
+        self.course.delete()
+        User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+
+    def _report(self, stats, elapsed):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Results ({elapsed:.1f} s)"))
+        self.stdout.write(
+            f"{'endpoint':<20}{'requests':>9}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}"
+            f"{'p99 ms':>9}{'errors':>8}{'locked':>8}{'queries':>9}"
+        )
+
+        total_requests = total_errors = total_locked = total_queries = 0
+        for endpoint, latencies in stats.latencies.items():
+            count = len(latencies)
+            queries = stats.queries[endpoint] if stats.query_headers else "n/a"
+            self.stdout.write(
+                f"{endpoint:<20}{count:>9}{count / elapsed:>9.1f}"
+                f"{percentile(latencies, 50):>9.1f}{percentile(latencies, 95):>9.1f}"
+                f"{percentile(latencies, 99):>9.1f}{stats.errors[endpoint]:>8}"
+                f"{stats.lock_timeouts[endpoint]:>8}{queries:>9}"
+            )
+            total_requests += count
+            total_errors += stats.errors[endpoint]
+            total_locked += stats.lock_timeouts[endpoint]
+            total_queries += stats.queries[endpoint]
+
+        self.stdout.write(
+            f"Total: {total_requests} requests ({total_requests / elapsed:.1f} req/s), "
+            f"error rate {total_errors / max(total_requests, 1):.2%}, "
+            f"lock timeout rate {total_locked / max(total_requests, 1):.2%}"
+        )
+        if stats.query_headers:
+            self.stdout.write(f"Database queries: {total_queries}")
+        else:
+            self.stdout.write(
+                "Database queries: n/a (enable QUIZ_QUERY_HEADERS on the server)"
+            )
@@ -0,0 +1,134 @@
+"""
+Retention of old game sessions.
+
+1. Abandoned lobbies (never started) older than --lobby-hours are deleted.
+2. Finished games older than --retention-days are archived: their results are
+   kept in the GameSummary (score, participants and the answer of the team for
+   every question, see quiz/summaries.py) and the raw TeamGameAnswer rows are
+   deleted. The results page keeps working from the summary.
+
+The sessions are processed in batches of --batch-size in order of their id,
+every batch in its own short transaction, with a pause of --sleep seconds in
+between. So the command only holds the SQLite write lock briefly and can run
+alongside live games, e.g. nightly from cron. It is resumable: an interrupted
+run simply continues with the sessions that are not deleted or archived yet.
+
+Usage: python manage.py prune_sessions [--lobby-hours 24] [--retention-days 90] [--dry-run]
+"""
+
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from quiz import game_state, summaries
+from quiz.models import GameSession, GameSummary, TeamGameAnswer
+
+
+class Command(BaseCommand):
+    help = "Deletes abandoned lobbies and archives the answers of old finished games."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--lobby-hours",
+            type=int,
+            default=24,
+            help="Delete lobbies that were created more than this many hours ago.",
+        )
+        parser.add_argument(
+            "--retention-days",
+            type=int,
+            default=90,
+            help="Archive finished games that were created more than this many days ago.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=200,
+            help="Sessions per batch (and transaction).",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0.1,
+            help="Seconds to pause between two batches.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only count the sessions that would be deleted or archived.",
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        lobbies = GameSession.objects.filter(
+            status="LOBBY",
+            created_at__lt=now - timedelta(hours=options["lobby_hours"]),
+        )
+        finished = GameSession.objects.filter(
+            status="FINISHED",
+            archived_at__isnull=True,
+            created_at__lt=now - timedelta(days=options["retention_days"]),
+        )
+
+        if options["dry_run"]:
+            self.stdout.write(f"Abandoned lobbies to delete: {lobbies.count()}")
+            self.stdout.write(f"Finished games to archive: {finished.count()}")
+            return
+
+        deleted = self._in_batches(lobbies, self._delete_lobbies, options)
+        self.stdout.write(f"Deleted {deleted} abandoned lobbies.")
+
+        archived = self._in_batches(finished, self._archive_games, options)
+        self.stdout.write(f"Archived {archived} finished games.")
+
+    def _in_batches(self, queryset, process, options):
+        """
+        Calls process() with the ids of the sessions in batches, in order of id.
+        Only the ids of one batch are held in memory.
+        """
+        done = 0
+        last_id = 0
+        while True:
+            ids = list(
+                queryset.filter(pk__gt=last_id)
+                .order_by("pk")
+                .values_list("pk", flat=True)[: options["batch_size"]]
+            )
+            if not ids:
+                return done
+
+            process(ids)
+            done += len(ids)
+            last_id = ids[-1]
+            if options["verbosity"] > 1:
+                self.stdout.write(f"  {done} sessions processed")
+            time.sleep(options["sleep"])
+
+    def _delete_lobbies(self, ids):
+        join_codes = list(
+            GameSession.objects.filter(pk__in=ids).values_list("join_code", flat=True)
+        )
+        with transaction.atomic():
+            # Participants and question sequences are deleted with their session
+            GameSession.objects.filter(pk__in=ids, status="LOBBY").delete()
+        game_state.discard(join_codes)
+
+    def _archive_games(self, ids):
+        # The summaries are built outside of the write transaction
+        missing = GameSession.objects.filter(pk__in=ids, summary__isnull=True)
+        for game_session in missing.select_related("course"):
+            summaries.create_summary(game_session)
+
+        archived_ids = list(
+            GameSummary.objects.filter(session_id__in=ids).values_list(
+                "session_id", flat=True
+            )
+        )
+        with transaction.atomic():
+            TeamGameAnswer.objects.filter(session_id__in=archived_ids).delete()
+            GameSession.objects.filter(pk__in=archived_ids).update(
+                archived_at=timezone.now()
+            )
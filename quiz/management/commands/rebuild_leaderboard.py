@@ -0,0 +1,28 @@
+"""
+Recomputes the leaderboards of all courses and the all-time leaderboard from
+the finished games (see quiz/leaderboard.py), e.g. to include the games
+finished before the leaderboards existed. Games that finish while the command
+runs may be missing, so it is best run when no game is running.
+
+Usage: python manage.py rebuild_leaderboard
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from quiz import leaderboard
+
+
+class Command(BaseCommand):
+    help = "Recomputes the leaderboards from the finished games."
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = leaderboard.rebuild()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt {count} leaderboard entries in {elapsed:.1f} s."
+            )
+        )
@@ -0,0 +1,28 @@
+"""
+Recomputes the usage and difficulty statistics of all questions from the
+played games (see quiz/question_stats.py), e.g. to fill them for the games
+played before the statistics existed. Games that are played while the command
+runs may be counted incompletely, so it is best run when no game is running.
+
+Usage: python manage.py rebuild_question_stats
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from quiz import question_stats
+
+
+class Command(BaseCommand):
+    help = "Recomputes the usage and difficulty statistics of all questions."
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        count = question_stats.rebuild()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rebuilt the statistics of {count} questions in {elapsed:.1f} s."
+            )
+        )
@@ -0,0 +1,23 @@
+"""
+Recreates the full-text search index of the questions (see quiz/search.py),
+e.g. after a migration that recreated the quiz_question table and thereby
+dropped the triggers that keep the index up to date.
+
+Usage: python manage.py rebuild_search_index
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from quiz import search
+
+
+class Command(BaseCommand):
+    help = "Recreates the full-text search index of the questions."
+
+    def handle(self, *args, **options):
+        if not search.install(connection):
+            raise CommandError(
+                "The database doesn't support FTS5, searches use icontains lookups."
+            )
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
@@ -0,0 +1,53 @@
+"""
+Recomputes the near-duplicate index (signatures and LSH buckets, see
+quiz/similarity.py) of all questions, e.g. after changing its parameters.
+
+Usage: python manage.py rebuild_similarity_index [--batch-size 2000]
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+
+from quiz import similarity
+from quiz.models import Question, QuestionSignature, SimilarityBucket
+
+
+class Command(BaseCommand):
+    help = "Recomputes the near-duplicate index of all questions."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=2000,
+            help="Questions indexed per transaction.",
+        )
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        SimilarityBucket.objects.all().delete()
+        QuestionSignature.objects.all().delete()
+
+        indexed = 0
+        last_id = 0
+        while True:
+            batch = list(
+                Question.objects.filter(pk__gt=last_id)
+                .order_by("pk")
+                .values_list("pk", flat=True)[: options["batch_size"]]
+            )
+            if not batch:
+                break
+            similarity.index_questions(Question.objects.filter(pk__in=batch))
+            indexed += len(batch)
+            last_id = batch[-1]
+            self.stdout.write(f"  {indexed} questions", ending="\r")
+
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Indexed {indexed} questions in {elapsed:.1f} s "
+                f"({indexed / max(elapsed, 0.001):.0f} questions/s)."
+            )
+        )
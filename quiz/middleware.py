@@ -0,0 +1,157 @@
+import heapq
+import logging
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger("quiz.queries")
+
+# The recorder of the current request. Database connections are per thread,
+# but context variables follow a request into the threads of sync_to_async.
+_current_recorder = ContextVar("quiz_query_recorder", default=None)
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper that counts the queries of a request,
+    sums up their duration and keeps the slowest statements.
+    """
+
+    def __init__(self, keep_slowest=3):
+        self.count = 0
+        self.total_time = 0.0
+        self.keep_slowest = keep_slowest
+        self._slowest = []  # min-heap of (duration, sql)
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            self.count += 1
+            self.total_time += duration
+
+            if len(self._slowest) < self.keep_slowest:
+                heapq.heappush(self._slowest, (duration, sql))
+            else:
+                heapq.heappushpop(self._slowest, (duration, sql))
+
+    @property
+    def slowest(self):
+        """
+        The slowest statements as (duration in ms, sql), slowest first.
+        """
+        return [
+            (round(duration * 1000, 2), sql)
+            for duration, sql in sorted(self._slowest, reverse=True)
+        ]
+
+
+def record_queries(execute, sql, params, many, context):
+    """
+    Execute wrapper of every database connection (installed in
+    QuizConfig.ready()) that passes the queries to the current recorder.
+    """
+    recorder = _current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_recorder(connection, **kwargs):
+    if record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_queries)
+
+
+class QueryBudgetMiddleware:
+    """
+    Records the number of SQL queries, the total SQL time and the slowest
+    statements of every request.
+
+    If QUIZ_QUERY_HEADERS is set (default: DEBUG), they are exposed as response
+    headers (X-Query-Count, X-Query-Time and Server-Timing for the browser's
+    developer tools, with an entry per slow statement). Otherwise, a record is
+    written to the "quiz.queries" logger: at DEBUG level, or at WARNING level
+    if the request exceeds QUIZ_QUERY_BUDGET (queries, SQL time in ms).
+
+    Works in sync and async middleware chains, so ASGI requests are not
+    switched to a thread for it.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        recorder = QueryRecorder()
+        token = _current_recorder.set(recorder)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_recorder.reset(token)
+        self.report(request, response, recorder)
+        return response
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        token = _current_recorder.set(recorder)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_recorder.reset(token)
+        self.report(request, response, recorder)
+        return response
+
+    def report(self, request, response, recorder):
+        total_ms = round(recorder.total_time * 1000, 2)
+
+        if settings.QUIZ_QUERY_HEADERS:
+            response["X-Query-Count"] = str(recorder.count)
+            response["X-Query-Time"] = f"{total_ms}ms"
+            response["Server-Timing"] = ", ".join(
+                [f'db;dur={total_ms};desc="{recorder.count} queries"']
+                + [
+                    f'sql-{number};dur={duration};desc="{_timing_description(sql)}"'
+                    for number, (duration, sql) in enumerate(recorder.slowest, 1)
+                ]
+            )
+            return
+
+        max_count, max_ms = settings.QUIZ_QUERY_BUDGET
+        over_budget = recorder.count > max_count or total_ms > max_ms
+        logger.log(
+            logging.WARNING if over_budget else logging.DEBUG,
+            "%s %s: %d queries in %.2f ms",
+            request.method,
+            request.path,
+            recorder.count,
+            total_ms,
+            extra={
+                "path": request.path,
+                "status_code": response.status_code,
+                "query_count": recorder.count,
+                "query_time_ms": total_ms,
+                "slowest_queries": recorder.slowest,
+            },
+        )
+
+
+def _timing_description(sql, max_length=100):
+    """
+    A statement shortened to one line that fits into a quoted header value.
+    """
+    sql = " ".join(sql.split()).replace("\\", "").replace('"', "'")
+    sql = sql.encode("ascii", "replace").decode()
+    if len(sql) > max_length:
+        sql = sql[: max_length - 3] + "..."
+    return sql
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0002_question_rejection_reason"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="gamesession",
+            name="state_version",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="Increases with every change of the game state (join, start, answer, next question).",
+            ),
+        ),
+    ]
@@ -0,0 +1,121 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_questions_to_sequence(apps, schema_editor):
+    """
+    Moves the questions of existing game sessions into the ordered sequence.
+    Questions used to be played in the order of their id.
+    """
+    GameSession = apps.get_model("quiz", "GameSession")
+    GameQuestion = apps.get_model("quiz", "GameQuestion")
+
+    for game_session in GameSession.objects.iterator():
+        question_ids = list(
+            game_session.questions.order_by("id").values_list("id", flat=True)
+        )
+        GameQuestion.objects.bulk_create(
+            GameQuestion(session=game_session, question_id=question_id, position=i)
+            for i, question_id in enumerate(question_ids)
+        )
+
+        game_session.question_count = len(question_ids)
+        if game_session.current_question_id in question_ids:
+            game_session.current_position = question_ids.index(
+                game_session.current_question_id
+            )
+        game_session.save(update_fields=["question_count", "current_position"])
+
+
+def copy_sequence_to_questions(apps, schema_editor):
+    GameQuestion = apps.get_model("quiz", "GameQuestion")
+    GameSession = apps.get_model("quiz", "GameSession")
+    Through = GameSession.questions.through
+
+    Through.objects.bulk_create(
+        Through(gamesession_id=session_id, question_id=question_id)
+        for session_id, question_id in GameQuestion.objects.values_list(
+            "session_id", "question_id"
+        ).iterator()
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0003_gamesession_state_version"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="gamesession",
+            name="current_position",
+            field=models.PositiveSmallIntegerField(
+                blank=True,
+                help_text="Position of the current question in the question sequence (0-based).",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="gamesession",
+            name="question_count",
+            field=models.PositiveSmallIntegerField(
+                default=0, help_text="The number of questions in this game session."
+            ),
+        ),
+        migrations.CreateModel(
+            name="GameQuestion",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "position",
+                    models.PositiveSmallIntegerField(
+                        help_text="Position of the question in the game session (0-based)."
+                    ),
+                ),
+                (
+                    "question",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="game_questions",
+                        to="quiz.question",
+                    ),
+                ),
+                (
+                    "session",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="game_questions",
+                        to="quiz.gamesession",
+                    ),
+                ),
+            ],
+            options={
+                "unique_together": {("session", "position"), ("session", "question")},
+            },
+        ),
+        migrations.RunPython(copy_questions_to_sequence, copy_sequence_to_questions),
+        migrations.RemoveField(
+            model_name="gamesession",
+            name="questions",
+        ),
+        migrations.AddField(
+            model_name="gamesession",
+            name="questions",
+            field=models.ManyToManyField(
+                related_name="game_sessions",
+                through="quiz.GameQuestion",
+                to="quiz.question",
+            ),
+        ),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:43
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+
+
+def copy_participant_scores(apps, schema_editor):
+    """
+    Moves the scores of the participants to their game session.
+    In coop mode, all participants of a session had the same score.
+    """
+    GameSession = apps.get_model("quiz", "GameSession")
+
+    sessions = GameSession.objects.annotate(
+        max_score=Max("participants__score"),
+        correct_answers=Count(
+            "team_answers", filter=Q(team_answers__is_correct=True), distinct=True
+        ),
+    )
+    for game_session in sessions.iterator():
+        game_session.team_score = game_session.max_score or 0
+        game_session.correct_count = game_session.correct_answers
+        game_session.save(update_fields=["team_score", "correct_count"])
+
+
+def copy_team_scores(apps, schema_editor):
+    GameSession = apps.get_model("quiz", "GameSession")
+    GameParticipant = apps.get_model("quiz", "GameParticipant")
+
+    for session_id, team_score in GameSession.objects.filter(
+        team_score__gt=0
+    ).values_list("id", "team_score"):
+        GameParticipant.objects.filter(session_id=session_id).update(score=team_score)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0004_gamequestion_sequence"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="gamesession",
+            name="correct_count",
+            field=models.PositiveSmallIntegerField(
+                default=0, help_text="The number of correctly answered questions."
+            ),
+        ),
+        migrations.AddField(
+            model_name="gamesession",
+            name="team_score",
+            field=models.PositiveIntegerField(
+                default=0,
+                help_text="The score of the team. In coop mode, all participants share it.",
+            ),
+        ),
+        migrations.RunPython(copy_participant_scores, copy_team_scores),
+        migrations.RemoveField(
+            model_name="gameparticipant",
+            name="score",
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0005_team_score"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="GameSummary",
+            fields=[
+                (
+                    "session",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="summary",
+                        serialize=False,
+                        to="quiz.gamesession",
+                    ),
+                ),
+                (
+                    "data",
+                    models.JSONField(
+                        help_text="Score, participants and the answer of the team for every question."
+                    ),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0006_gamesummary"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="gamesession",
+            name="archived_at",
+            field=models.DateTimeField(
+                blank=True,
+                help_text="When the answers of the finished game were compacted into its summary.",
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.7 on 2026-10-16 22:48
+
+import quiz.models
+from django.db import migrations, models
+
+
+def create_sequence(apps, schema_editor):
+    """
+    Creates the counter of the join code allocator.
+    """
+    JoinCodeSequence = apps.get_model("quiz", "JoinCodeSequence")
+    JoinCodeSequence.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0007_gamesession_archived_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="JoinCodeSequence",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("next_number", models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_sequence, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="gamesession",
+            name="join_code",
+            field=models.CharField(
+                db_index=True,
+                default=quiz.models.generate_join_code,
+                help_text="Code for players to join this game session, unique among live game sessions.",
+                max_length=6,
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="gamesession",
+            constraint=models.UniqueConstraint(
+                condition=models.Q(("status__in", ["LOBBY", "ACTIVE"])),
+                fields=("join_code",),
+                name="unique_live_join_code",
+            ),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:20
+
+from django.db import migrations
+
+from quiz import search
+
+
+def create_index(apps, schema_editor):
+    """
+    Creates the full-text index of the questions (SQLite with FTS5 only).
+    """
+    search.install(schema_editor.connection)
+
+
+def drop_index(apps, schema_editor):
+    search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0009_created_at_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_index, drop_index),
+    ]
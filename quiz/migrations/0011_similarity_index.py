@@ -0,0 +1,88 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from quiz import similarity
+
+
+def index_questions(apps, schema_editor):
+    """
+    Computes the signatures and buckets of the existing questions.
+    """
+    Question = apps.get_model("quiz", "Question")
+    QuestionSignature = apps.get_model("quiz", "QuestionSignature")
+    SimilarityBucket = apps.get_model("quiz", "SimilarityBucket")
+
+    for question in Question.objects.prefetch_related("answers").iterator(
+        chunk_size=2000
+    ):
+        values = similarity.signature(
+            question.text, [answer.text for answer in question.answers.all()]
+        )
+        QuestionSignature.objects.create(
+            question=question, minhash=similarity.pack(values)
+        )
+        SimilarityBucket.objects.bulk_create(
+            SimilarityBucket(question=question, key=key)
+            for key in similarity.bucket_keys(question.course_id, values)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0010_question_search_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="QuestionSignature",
+            fields=[
+                (
+                    "question",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="signature",
+                        serialize=False,
+                        to="quiz.question",
+                    ),
+                ),
+                (
+                    "minhash",
+                    models.BinaryField(help_text="The MinHash values (32 bit each)."),
+                ),
+            ],
+        ),
+        migrations.CreateModel(
+            name="SimilarityBucket",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "key",
+                    models.BigIntegerField(
+                        db_index=True,
+                        help_text="Hash of the course, the band and its MinHash values.",
+                    ),
+                ),
+                (
+                    "question",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="similarity_buckets",
+                        to="quiz.question",
+                    ),
+                ),
+            ],
+        ),
+        migrations.RunPython(index_questions, migrations.RunPython.noop),
+    ]
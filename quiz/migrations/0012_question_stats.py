@@ -0,0 +1,60 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:55
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0011_similarity_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="QuestionStats",
+            fields=[
+                (
+                    "question",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="quiz.question",
+                    ),
+                ),
+                (
+                    "times_served",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="How often the question was shown in a game.",
+                    ),
+                ),
+                (
+                    "times_answered",
+                    models.PositiveIntegerField(
+                        default=0, help_text="How often a team answered the question."
+                    ),
+                ),
+                (
+                    "times_correct",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="How often a team answered the question correctly.",
+                    ),
+                ),
+                (
+                    "last_used_at",
+                    models.DateTimeField(
+                        blank=True,
+                        help_text="When the question was last shown in a game.",
+                        null=True,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "question stats",
+            },
+        ),
+    ]
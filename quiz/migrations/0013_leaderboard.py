@@ -0,0 +1,82 @@
+# Generated by Django 5.2.7 on 2026-10-16 23:58
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0012_question_stats"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LeaderboardEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("total_score", models.PositiveIntegerField(default=0)),
+                ("games_played", models.PositiveIntegerField(default=0)),
+                (
+                    "correct_count",
+                    models.PositiveIntegerField(
+                        default=0,
+                        help_text="The number of correctly answered questions.",
+                    ),
+                ),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+                (
+                    "course",
+                    models.ForeignKey(
+                        blank=True,
+                        help_text="Empty for the all-time leaderboard over all courses.",
+                        null=True,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="leaderboard_entries",
+                        to="quiz.course",
+                    ),
+                ),
+                (
+                    "user",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="leaderboard_entries",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name_plural": "leaderboard entries",
+                "indexes": [
+                    models.Index(
+                        models.F("course"),
+                        models.OrderBy(models.F("total_score"), descending=True),
+                        models.F("user"),
+                        name="quiz_leaderboard_rank_idx",
+                    )
+                ],
+                "constraints": [
+                    models.UniqueConstraint(
+                        condition=models.Q(("course__isnull", False)),
+                        fields=("user", "course"),
+                        name="unique_course_leaderboard_entry",
+                    ),
+                    models.UniqueConstraint(
+                        condition=models.Q(("course__isnull", True)),
+                        fields=("user",),
+                        name="unique_all_time_leaderboard_entry",
+                    ),
+                ],
+            },
+        ),
+    ]
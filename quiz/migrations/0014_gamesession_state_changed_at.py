@@ -0,0 +1,22 @@
+# Generated by Django 5.2.7 on 2026-10-17 00:24
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("quiz", "0013_leaderboard"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="gamesession",
+            name="state_changed_at",
+            field=models.DateTimeField(
+                default=django.utils.timezone.now,
+                help_text="When the state version was last increased.",
+            ),
+        ),
+    ]
@@ -1,7 +1,7 @@
 from django.db import models
+from django.db.models import F
 from django.contrib.auth.models import User
 from django.utils import timezone
-import uuid
 
 
 class Course(models.Model):
@@ -63,7 +63,7 @@ class Question(models.Model):
         null=True,
         help_text="If rejected, the reason for rejection.",
     )
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
@@ -95,9 +95,39 @@ class Answer(models.Model):
 
 def generate_join_code():
     """
-    Generates a unique 6-digit lobby code for game sessions.
+    Allocates a 6-digit lobby code that no live game session uses
+    (see quiz/join_codes.py).
+    """
+    from .join_codes import allocate
+
+    return allocate()
+
+
+class JoinCodeSequence(models.Model):
+    """
+    Counter of the join code allocator. Has a single row (id 1).
     """
-    return uuid.uuid4().hex[:6].upper()
+
+    next_number = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f"Next join code number: {self.next_number}"
+
+
+class GameSessionQuerySet(models.QuerySet):
+    def _with_join_code(self, join_code):
+        # Join codes are recycled (see join_codes.py): the newest game session
+        # with a code is the current one
+        return self.filter(join_code=join_code.upper()).order_by("-pk")
+
+    def current(self, join_code):
+        """
+        Returns the newest of the game sessions with the join code, or None.
+        """
+        return self._with_join_code(join_code).first()
+
+    async def acurrent(self, join_code):
+        return await self._with_join_code(join_code).afirst()
 
 
 class GameSession(models.Model):
@@ -136,11 +166,17 @@ class GameSession(models.Model):
     )
     join_code = models.CharField(
         max_length=6,
-        unique=True,
+        db_index=True,
         default=generate_join_code,
-        help_text="Unique code for players to join this game session.",
+        help_text="Code for players to join this game session, unique among live game sessions.",
+    )
+    questions = models.ManyToManyField(
+        Question, through="GameQuestion", related_name="game_sessions"
+    )
+    question_count = models.PositiveSmallIntegerField(
+        default=0,
+        help_text="The number of questions in this game session.",
     )
-    questions = models.ManyToManyField(Question, related_name="game_sessions")
     current_question = models.ForeignKey(
         Question,
         on_delete=models.SET_NULL,
@@ -149,16 +185,104 @@ class GameSession(models.Model):
         related_name="+",  # Prevents reverse relation
         help_text="The current question being answered in the game session.",
     )
-    created_at = models.DateTimeField(auto_now_add=True)
+    current_position = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        help_text="Position of the current question in the question sequence (0-based).",
+    )
+    team_score = models.PositiveIntegerField(
+        default=0,
+        help_text="The score of the team. In coop mode, all participants share it.",
+    )
+    correct_count = models.PositiveSmallIntegerField(
+        default=0,
+        help_text="The number of correctly answered questions.",
+    )
+    state_version = models.PositiveIntegerField(
+        default=0,
+        help_text="Increases with every change of the game state (join, start, answer, next question).",
+    )
+    state_changed_at = models.DateTimeField(
+        default=timezone.now,
+        help_text="When the state version was last increased.",
+    )
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    archived_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the answers of the finished game were compacted into its summary.",
+    )
+
+    class Meta:
+        constraints = [
+            # Codes of finished games are recycled by the join code allocator
+            models.UniqueConstraint(
+                fields=["join_code"],
+                condition=models.Q(status__in=["LOBBY", "ACTIVE"]),
+                name="unique_live_join_code",
+            ),
+        ]
+
+    objects = GameSessionQuerySet.as_manager()
 
     def __str__(self):
         return f"Game {self.join_code} ({self.get_status_display()})"
 
+    def update_state(self, expected=None, **fields):
+        """
+        Saves the given fields and increases the state version in a single query.
+        Pollers compare the state version to find out whether anything changed,
+        and poll less often the longer ago it changed (state_changed_at).
+        Fields updated with an expression (e.g. F("team_score") + 10) are
+        reloaded from the database when they are accessed next.
+
+        With expected (field values, e.g. {"status": "ACTIVE"}), the state is
+        only changed if the row still has these values, so that only one of
+        several simultaneous requests makes a change. Returns whether the
+        state was changed.
+        """
+        fields["state_changed_at"] = timezone.now()
+        updated = GameSession.objects.filter(pk=self.pk, **(expected or {})).update(
+            state_version=F("state_version") + 1, **fields
+        )
+        if not updated:
+            return False
+
+        for name, value in fields.items():
+            if hasattr(value, "resolve_expression"):
+                self.__dict__.pop(name, None)
+            else:
+                setattr(self, name, value)
+        return True
+
+
+class GameQuestion(models.Model):
+    """
+    A question of a game session at a fixed position in the question sequence.
+    Allows looking up the current and next question with a single row.
+    """
+
+    session = models.ForeignKey(
+        GameSession, on_delete=models.CASCADE, related_name="game_questions"
+    )
+    question = models.ForeignKey(
+        Question, on_delete=models.CASCADE, related_name="game_questions"
+    )
+    position = models.PositiveSmallIntegerField(
+        help_text="Position of the question in the game session (0-based)."
+    )
+
+    class Meta:
+        # Every position is used once, every question is asked once per game session
+        unique_together = [("session", "position"), ("session", "question")]
+
+    def __str__(self):
+        return f"Question {self.position + 1} in Game {self.session.join_code}"
+
 
 class GameParticipant(models.Model):
     """
     Links a User to a GameSession.
-    Stores the individual player's score.
     """
 
     user = models.ForeignKey(
@@ -167,7 +291,6 @@ class GameParticipant(models.Model):
     session = models.ForeignKey(
         GameSession, on_delete=models.CASCADE, related_name="participants"
     )
-    score = models.IntegerField(default=0, help_text="The player's score in this game.")
 
     class Meta:
         # A user can't join the same game session multiple times
@@ -176,6 +299,13 @@ class GameParticipant(models.Model):
     def __str__(self):
         return f"{self.user.username} in Game {self.session.join_code}"
 
+    @property
+    def score(self):
+        """
+        The player's score in this game. In coop mode, it is the team score.
+        """
+        return self.session.team_score
+
 
 class TeamGameAnswer(models.Model):
     """
@@ -205,11 +335,167 @@ class TeamGameAnswer(models.Model):
     is_correct = models.BooleanField(
         default=False,
     )
-    created_at = models.DateTimeField(auto_now_add=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
 
     class Meta:
         # Ensure one answer per question per game session
         unique_together = ("session", "question")
 
     def __str__(self):
-        return f"Answer for Question {self.question.id} in Game {self.session.id}"
+        return f"Answer for Question {self.question_id} in Game {self.session_id}"
+
+
+class GameSummary(models.Model):
+    """
+    The results of a finished game session, stored once when the game ends.
+    The results never change afterwards, so the results page is rendered
+    from this summary instead of the session, its participants and answers.
+    """
+
+    session = models.OneToOneField(
+        GameSession,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="summary",
+    )
+    data = models.JSONField(
+        help_text="Score, participants and the answer of the team for every question."
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Summary of Game {self.session_id}"
+
+
+class QuestionSignature(models.Model):
+    """
+    The MinHash signature of a question, its text and answers, used to find
+    near-duplicate questions (see quiz/similarity.py).
+    """
+
+    question = models.OneToOneField(
+        Question,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="signature",
+    )
+    minhash = models.BinaryField(help_text="The MinHash values (32 bit each).")
+
+    def __str__(self):
+        return f"Signature of Question {self.question_id}"
+
+
+class SimilarityBucket(models.Model):
+    """
+    One LSH band of the signature of a question. Questions that share a
+    bucket are candidates for near-duplicates (see quiz/similarity.py).
+    """
+
+    question = models.ForeignKey(
+        Question, on_delete=models.CASCADE, related_name="similarity_buckets"
+    )
+    key = models.BigIntegerField(
+        db_index=True,
+        help_text="Hash of the course, the band and its MinHash values.",
+    )
+
+    def __str__(self):
+        return f"Bucket {self.key} of Question {self.question_id}"
+
+
+class QuestionStats(models.Model):
+    """
+    How often a question was used in games and answered correctly, updated
+    with every served question and team answer (see quiz/question_stats.py).
+    """
+
+    question = models.OneToOneField(
+        Question,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name="stats",
+    )
+    times_served = models.PositiveIntegerField(
+        default=0, help_text="How often the question was shown in a game."
+    )
+    times_answered = models.PositiveIntegerField(
+        default=0, help_text="How often a team answered the question."
+    )
+    times_correct = models.PositiveIntegerField(
+        default=0, help_text="How often a team answered the question correctly."
+    )
+    last_used_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When the question was last shown in a game.",
+    )
+
+    class Meta:
+        verbose_name_plural = "question stats"
+
+    def __str__(self):
+        return f"Stats of Question {self.question_id}"
+
+    @property
+    def correct_rate(self):
+        """
+        The share of correct team answers (0 to 1), None if never answered.
+        """
+        if not self.times_answered:
+            return None
+        return self.times_correct / self.times_answered
+
+
+class LeaderboardEntry(models.Model):
+    """
+    The points a user scored in all finished games of a course, or of all
+    courses if the course is empty (see quiz/leaderboard.py).
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="leaderboard_entries"
+    )
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name="leaderboard_entries",
+        help_text="Empty for the all-time leaderboard over all courses.",
+    )
+    total_score = models.PositiveIntegerField(default=0)
+    games_played = models.PositiveIntegerField(default=0)
+    correct_count = models.PositiveIntegerField(
+        default=0, help_text="The number of correctly answered questions."
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "leaderboard entries"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "course"],
+                condition=models.Q(course__isnull=False),
+                name="unique_course_leaderboard_entry",
+            ),
+            # NULLs are distinct in a unique constraint
+            models.UniqueConstraint(
+                fields=["user"],
+                condition=models.Q(course__isnull=True),
+                name="unique_all_time_leaderboard_entry",
+            ),
+        ]
+        indexes = [
+            # The ranking of a leaderboard, read from the top or counted
+            # up to the score of a user
+            models.Index(
+                "course",
+                models.F("total_score").desc(),
+                "user",
+                name="quiz_leaderboard_rank_idx",
+            ),
+        ]
+
+    def __str__(self):
+        scope = f"Course {self.course_id}" if self.course_id else "all courses"
+        return f"{self.total_score} points of User {self.user_id} in {scope}"
@@ -0,0 +1,105 @@
+"""
+Pagination of large tables.
+
+Keyset (cursor) pagination: instead of OFFSET, which has to skip all previous
+rows, the next page starts after the last row of the current page:
+WHERE (field, id) > (last value, last id). The cursor encodes the sort value
+and id of that row, so every page costs the same regardless of how far the user
+has scrolled.
+
+Estimated counts: SQLite has no row count statistics that are always up to
+date, so COUNT(*) reads the whole table. EstimatedCountPaginator (used by the
+admin) estimates the size of unfiltered tables from the range of their ids,
+which is two index lookups.
+"""
+
+import json
+from datetime import datetime
+
+from django.core.paginator import Paginator
+from django.db.models import DateTimeField, Max, Min, Q, QuerySet
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+def _encode_cursor(obj, field):
+    value = getattr(obj, field)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return urlsafe_base64_encode(json.dumps([value, obj.pk]).encode())
+
+
+def _decode_cursor(queryset, cursor, field):
+    """
+    Returns the (value, pk) tuple of a cursor, or None if it is invalid.
+    """
+    try:
+        value, pk = json.loads(urlsafe_base64_decode(cursor))
+        if isinstance(queryset.model._meta.get_field(field), DateTimeField):
+            value = datetime.fromisoformat(value)
+        return value, int(pk)
+    except (ValueError, TypeError):
+        return None
+
+
+def keyset_page(queryset, field, descending, cursor, page_size):
+    """
+    Returns one page of the queryset ordered by (field, pk) and the cursor
+    of the next page (None on the last page).
+    """
+    if descending:
+        queryset = queryset.order_by(f"-{field}", "-pk")
+        lookup = "lt"
+    else:
+        queryset = queryset.order_by(field, "pk")
+        lookup = "gt"
+
+    position = _decode_cursor(queryset, cursor, field) if cursor else None
+    if position is not None:
+        value, pk = position
+        queryset = queryset.filter(
+            Q(**{f"{field}__{lookup}": value})
+            | Q(**{field: value, f"pk__{lookup}": pk})
+        )
+
+    # Fetch one more row to find out whether there is a next page
+    rows = list(queryset[: page_size + 1])
+    if len(rows) <= page_size:
+        return rows, None
+
+    rows = rows[:page_size]
+    return rows, _encode_cursor(rows[-1], field)
+
+
+# Below this many rows, an exact COUNT(*) is cheap enough
+ESTIMATE_THRESHOLD = 10_000
+
+
+def estimated_count(queryset):
+    """
+    Returns an estimate of the number of rows of an unfiltered queryset, or
+    None if the queryset is filtered. The estimate is the range of ids, so
+    deleted rows are counted as well.
+    """
+    if not isinstance(queryset, QuerySet) or queryset.query.has_filters():
+        return None
+    # Two queries, SQLite only looks up MIN() or MAX() alone in the index
+    rows = queryset.model._default_manager
+    first = rows.aggregate(first=Min("pk"))["first"]
+    if first is None:
+        return 0
+    return rows.aggregate(last=Max("pk"))["last"] - first + 1
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that estimates the number of rows of large unfiltered tables
+    instead of counting them. The last pages may therefore be short or empty.
+    """
+
+    @cached_property
+    def count(self):
+        estimate = estimated_count(self.object_list)
+        if estimate is None or estimate < ESTIMATE_THRESHOLD:
+            return super().count
+        return estimate
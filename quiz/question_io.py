@@ -0,0 +1,333 @@
+"""
+Import and export of question banks.
+
+Two formats are supported, both read line by line so that the memory use does
+not depend on the size of the file:
+
+CSV with a header row:
+    course,text,explanation,answer_1,answer_2,answer_3,answer_4,correct
+    ISEF01,Was ist 1+1?,,1,2,3,4,2
+    ("correct" is the number of the correct answer, 1-4; further answer_<n>
+    columns are read as well, so that questions with too many answers are
+    reported as invalid instead of losing answers)
+
+JSON Lines, one question per line:
+    {"course": "ISEF01", "text": "Was ist 1+1?", "explanation": "",
+     "answers": [{"text": "2", "is_correct": true}, {"text": "3"}]}
+
+Every imported question is validated with the same rules as the question form
+of the website (QuestionForm, AnswerForm and validate_answers()). Valid
+questions are inserted with bulk_create, one transaction per batch.
+
+Exports use the same formats (plus the review status), so an exported bank can
+be imported again. They are generated line by line from chunks of questions,
+so even large banks are never held in memory as a whole. Under ASGI, Django
+would collect a sync iterator in a list before sending it, so the export view
+streams through aiter_export() there.
+"""
+
+import csv
+import json
+import re
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+
+from django import forms
+from django.db import transaction
+from django.db.models import Count, Max, Prefetch
+
+from . import sampling, similarity
+from .forms import AnswerForm, AnswerFormSet, QuestionForm, validate_answers
+from .models import Answer, Course, Question
+
+FORMATS = ("csv", "jsonl")
+
+CSV_ANSWER_COLUMN = re.compile(r"answer_(\d+)")
+
+
+def _csv_answer_columns(count):
+    return [f"answer_{i}" for i in range(1, count + 1)]
+
+
+CSV_ANSWER_COLUMNS = _csv_answer_columns(AnswerFormSet.max_num)
+
+CONTENT_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+EXPORT_CHUNK_SIZE = 2000
+
+
+def _csv_rows(file):
+    reader = csv.DictReader(file)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def _record_from_csv(row):
+    correct = (row.get("correct") or "").strip()
+    numbers = sorted(
+        int(match.group(1))
+        for match in map(CSV_ANSWER_COLUMN.fullmatch, filter(None, row))
+        if match
+    )
+    answers = [
+        {"text": row.get(f"answer_{number}") or "", "is_correct": correct == str(i)}
+        for i, number in enumerate(numbers, start=1)
+    ]
+    return {
+        "course": row.get("course"),
+        "text": row.get("text"),
+        "explanation": row.get("explanation"),
+        "answers": answers,
+    }
+
+
+def _jsonl_rows(file):
+    for line_number, line in enumerate(file, start=1):
+        if line.strip():
+            yield line_number, line
+
+
+def _record_from_jsonl(line):
+    try:
+        record = json.loads(line)
+    except ValueError as error:
+        raise forms.ValidationError(f"Ungültiges JSON: {error}")
+    if not isinstance(record, dict) or not isinstance(record.get("answers", []), list):
+        raise forms.ValidationError("Ungültiger Datensatz.")
+    return record
+
+
+_READERS = {
+    "csv": (_csv_rows, _record_from_csv),
+    "jsonl": (_jsonl_rows, _record_from_jsonl),
+}
+
+
+def _form_errors(form, prefix=""):
+    return [
+        f"{prefix}{field}: {message}" if field != "__all__" else f"{prefix}{message}"
+        for field, messages in form.errors.items()
+        for message in messages
+    ]
+
+
+def build_question(record, courses, default_course=None):
+    """
+    Validates a record and returns the unsaved question and its answers.
+    Raises a ValidationError with all error messages of the record.
+    """
+    question_form = QuestionForm(
+        data={
+            "text": record.get("text") or "",
+            "explanation": record.get("explanation") or "",
+        }
+    )
+    errors = [] if question_form.is_valid() else _form_errors(question_form)
+
+    course = default_course
+    if record.get("course"):
+        course = courses.get(str(record["course"]).strip())
+        if course is None:
+            errors.append(f"course: Unbekannter Kurs '{record['course']}'.")
+
+    # Empty answers are skipped, like the empty forms of the answer formset
+    answer_forms = [
+        AnswerForm(
+            data={
+                "text": answer.get("text") or "",
+                "is_correct": bool(answer.get("is_correct")),
+            }
+        )
+        for answer in record.get("answers", [])
+        if isinstance(answer, dict) and (answer.get("text") or "").strip()
+    ]
+    if len(answer_forms) > AnswerFormSet.max_num:
+        errors.append(
+            f"answers: Es sind maximal {AnswerFormSet.max_num} Antworten erlaubt."
+        )
+    for i, answer_form in enumerate(answer_forms, start=1):
+        if not answer_form.is_valid():
+            errors.extend(_form_errors(answer_form, prefix=f"answer {i} "))
+
+    if not errors:
+        try:
+            validate_answers(
+                [
+                    (form.cleaned_data["text"], form.cleaned_data["is_correct"])
+                    for form in answer_forms
+                ]
+            )
+        except forms.ValidationError as error:
+            errors.extend(f"answers: {message}" for message in error.messages)
+
+    if errors:
+        raise forms.ValidationError(errors)
+
+    question = question_form.save(commit=False)
+    question.course = course
+    answers = [answer_form.save(commit=False) for answer_form in answer_forms]
+    return question, answers
+
+
+def _save_batch(batch):
+    with transaction.atomic():
+        Question.objects.bulk_create([question for question, answers in batch])
+        for question, answers in batch:
+            for answer in answers:
+                answer.question = question
+        Answer.objects.bulk_create(
+            [answer for question, answers in batch for answer in answers]
+        )
+        # bulk_create sends no post_save signals (see quiz/signals.py)
+        similarity.index(
+            (
+                question.pk,
+                question.course_id,
+                question.text,
+                [answer.text for answer in answers],
+            )
+            for question, answers in batch
+        )
+
+
+def import_questions(
+    file,
+    file_format,
+    creator=None,
+    status="PENDING",
+    default_course=None,
+    batch_size=500,
+    dry_run=False,
+    on_error=None,
+):
+    """
+    Imports the questions of an open text file and returns (imported, failed).
+    on_error(line_number, messages) is called for every invalid question.
+    With dry_run, the questions are only validated.
+    """
+    rows, to_record = _READERS[file_format]
+    courses = {course.name: course for course in Course.objects.all()}
+    imported = failed = 0
+    approved_course_ids = set()
+    batch = []
+
+    for line_number, row in rows(file):
+        try:
+            question, answers = build_question(to_record(row), courses, default_course)
+        except forms.ValidationError as error:
+            failed += 1
+            if on_error:
+                on_error(line_number, error.messages)
+            continue
+
+        question.creator = creator
+        question.status = status
+        if status == "APPROVED" and question.course_id:
+            approved_course_ids.add(question.course_id)
+
+        batch.append((question, answers))
+        if len(batch) >= batch_size:
+            if not dry_run:
+                _save_batch(batch)
+            imported += len(batch)
+            batch = []
+
+    if batch:
+        if not dry_run:
+            _save_batch(batch)
+        imported += len(batch)
+
+    # bulk_create sends no post_save signals (see quiz/signals.py)
+    if not dry_run:
+        for course_id in approved_course_ids:
+            sampling.invalidate(course_id)
+
+    return imported, failed
+
+
+class _Echo:
+    """
+    File-like object for csv.writer that returns the written line.
+    """
+
+    def write(self, value):
+        return value
+
+
+def _csv_lines(questions, answer_count):
+    """
+    Yields the CSV lines with answer_count answer columns, enough for the
+    question with the most answers.
+    """
+    writer = csv.writer(_Echo())
+    yield writer.writerow(
+        ["course", "text", "explanation"]
+        + _csv_answer_columns(answer_count)
+        + ["correct", "status"]
+    )
+    for question in questions:
+        answers = list(question.answers.all())
+        texts = [answer.text for answer in answers]
+        texts += [""] * (answer_count - len(texts))
+        correct = next(
+            (str(i) for i, answer in enumerate(answers, 1) if answer.is_correct), ""
+        )
+        yield writer.writerow(
+            [
+                question.course.name if question.course else "",
+                question.text,
+                question.explanation or "",
+                *texts,
+                correct,
+                question.status,
+            ]
+        )
+
+
+def _jsonl_lines(questions):
+    for question in questions:
+        record = {
+            "course": question.course.name if question.course else None,
+            "text": question.text,
+            "explanation": question.explanation or "",
+            "status": question.status,
+            "answers": [
+                {"text": answer.text, "is_correct": answer.is_correct}
+                for answer in question.answers.all()
+            ],
+        }
+        yield json.dumps(record, ensure_ascii=False) + "\n"
+
+
+def export_questions(queryset, file_format):
+    """
+    Yields the lines of the export of the questions in the queryset.
+    The questions and their answers are loaded in chunks of EXPORT_CHUNK_SIZE.
+    """
+    questions = (
+        queryset.select_related("course")
+        .prefetch_related(Prefetch("answers", queryset=Answer.objects.order_by("id")))
+        .order_by("pk")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    if file_format == "csv":
+        # Questions edited in the admin may have more answers than the form
+        # allows; their answers are written to further columns
+        most_answers = queryset.annotate(answer_count=Count("answers")).aggregate(
+            Max("answer_count")
+        )["answer_count__max"]
+        return _csv_lines(questions, max(most_answers or 0, len(CSV_ANSWER_COLUMNS)))
+    return _jsonl_lines(questions)
+
+
+async def aiter_export(lines):
+    """
+    Async iterator over the lines of export_questions(), for streaming
+    responses under ASGI. The lines are generated (and the questions loaded)
+    in a thread, EXPORT_CHUNK_SIZE lines at a time.
+    """
+    next_chunk = sync_to_async(lambda: list(islice(lines, EXPORT_CHUNK_SIZE)))
+    while chunk := await next_chunk():
+        for line in chunk:
+            yield line
@@ -0,0 +1,145 @@
+"""
+Usage and difficulty statistics of questions.
+
+Counting how often a question was used and answered correctly from the
+TeamGameAnswer rows aggregates the whole answer log, which grows with every
+game. Instead, every question has a QuestionStats row, created when the
+question is first picked for a game. It is updated when the question is
+served (start_game, next_question) and when a team answers it (in the
+transaction of the answer, see gameplay.claim_answer). The admin shows
+and sorts the questions by these counters.
+
+rebuild() recomputes the statistics from all games, e.g. to fill them for the
+games played before they existed (python manage.py rebuild_question_stats).
+The answers of archived games are deleted (see prune_sessions), so their
+answers are read from the game summaries.
+"""
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+
+from .models import GameQuestion, GameSummary, QuestionStats, TeamGameAnswer
+
+BATCH_SIZE = 2000
+
+
+def create_missing(questions):
+    """
+    Creates the statistics of the questions of a new game that were never
+    used before, so that playing the game only updates them.
+    """
+    QuestionStats.objects.bulk_create(
+        [QuestionStats(question=question) for question in questions],
+        ignore_conflicts=True,
+    )
+
+
+def _update(question_id, **changes):
+    """
+    Updates the statistics of a question in a single query. The row is
+    created if it is missing, e.g. for a game created before the statistics
+    existed.
+    """
+    stats = QuestionStats.objects.filter(question_id=question_id)
+    if not stats.update(**changes):
+        QuestionStats.objects.get_or_create(question_id=question_id)
+        stats.update(**changes)
+
+
+def record_served(question_id):
+    """
+    Counts that the question is shown in a game.
+    """
+    _update(
+        question_id,
+        times_served=F("times_served") + 1,
+        last_used_at=timezone.now(),
+    )
+
+
+def record_answer(question_id, is_correct):
+    """
+    Counts the answer of a team to the question.
+    """
+    _update(
+        question_id,
+        times_answered=F("times_answered") + 1,
+        times_correct=F("times_correct") + int(is_correct),
+    )
+
+
+def rebuild():
+    """
+    Recomputes the statistics of all questions from the played games.
+    Returns the number of questions with statistics.
+
+    The time a question was last used is not stored for past games, the
+    creation time of the last game that used it is taken instead.
+    """
+    stats = {}
+
+    def stats_of(question_id):
+        if question_id not in stats:
+            stats[question_id] = QuestionStats(question_id=question_id)
+        return stats[question_id]
+
+    # Every question picked for a game has statistics (see create_missing)
+    for question_id in GameQuestion.objects.values_list(
+        "question_id", flat=True
+    ).distinct():
+        stats_of(question_id)
+
+    # Finished games showed all their questions, running games the ones up
+    # to the current question
+    served = (
+        GameQuestion.objects.filter(
+            Q(session__status="FINISHED")
+            | Q(
+                session__status="ACTIVE",
+                position__lte=F("session__current_position"),
+            )
+        )
+        .values("question_id")
+        .annotate(count=Count("pk"), last_used_at=Max("session__created_at"))
+    )
+    for row in served:
+        entry = stats_of(row["question_id"])
+        entry.times_served = row["count"]
+        entry.last_used_at = row["last_used_at"]
+
+    answered = TeamGameAnswer.objects.values("question_id").annotate(
+        count=Count("pk"), correct=Count("pk", filter=Q(is_correct=True))
+    )
+    for row in answered:
+        entry = stats_of(row["question_id"])
+        entry.times_answered += row["count"]
+        entry.times_correct += row["correct"]
+
+    # The summary lists the questions of a game in the order of their position
+    archived = GameSummary.objects.filter(session__archived_at__isnull=False)
+    last_id = 0
+    while True:
+        summaries = list(archived.filter(pk__gt=last_id).order_by("pk")[:BATCH_SIZE])
+        if not summaries:
+            break
+        last_id = summaries[-1].pk
+
+        question_ids = {
+            (session_id, position): question_id
+            for session_id, position, question_id in GameQuestion.objects.filter(
+                session_id__in=[summary.pk for summary in summaries]
+            ).values_list("session_id", "position", "question_id")
+        }
+        for summary in summaries:
+            for question in summary.data["questions"]:
+                question_id = question_ids.get((summary.pk, question["number"] - 1))
+                if question_id is not None and question["answered"]:
+                    entry = stats_of(question_id)
+                    entry.times_answered += 1
+                    entry.times_correct += question["is_correct"]
+
+    with transaction.atomic():
+        QuestionStats.objects.all().delete()
+        QuestionStats.objects.bulk_create(stats.values(), batch_size=BATCH_SIZE)
+    return len(stats)
@@ -0,0 +1,100 @@
+"""
+Random selection of questions for new game sessions.
+
+Picking questions with ORDER BY RANDOM() sorts every approved question of a
+course, which gets slow for large question banks. Instead, every process keeps
+an index of the approved question ids per course in memory and samples from it,
+so selecting questions does not depend on the size of the question bank.
+
+The index is invalidated through a version token in the default cache after
+the approved questions of a course have changed. With a shared cache backend
+(e.g. Redis or Memcached), all processes reload the index right away. With the
+default locmem cache, the token only reaches the process that made the change;
+the other processes reload their index after INDEX_MAX_AGE seconds at the
+latest, so newly approved questions may be missing from their games until then.
+Sampled ids are checked against the database, so a stale index never puts a
+question into a game that is not (or no longer) approved.
+"""
+
+import random
+import time
+import uuid
+from array import array
+
+from django.core.cache import cache
+
+from .models import Question
+
+# Reload the index at least this often, for process-local caches (see above)
+INDEX_MAX_AGE = 60
+
+# Process-local index: course id -> (version token, load time, array of question ids)
+_index = {}
+
+
+def _version_key(course_id):
+    return f"question-index-version:{course_id}"
+
+
+def _current_version(course_id):
+    key = _version_key(course_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, uuid.uuid4().hex, None)
+        version = cache.get(key)
+    return version
+
+
+def invalidate(course_id):
+    """
+    Marks the question index of a course as outdated in all processes.
+    Must be called whenever questions of the course are added, removed or
+    change their status.
+    """
+    cache.set(_version_key(course_id), uuid.uuid4().hex, None)
+
+
+def approved_question_ids(course_id):
+    """
+    Returns the ids of all approved questions of a course (cached).
+    """
+    version = _current_version(course_id)
+    cached = _index.get(course_id)
+    if (
+        cached is not None
+        and cached[0] == version
+        and time.monotonic() - cached[1] < INDEX_MAX_AGE
+    ):
+        return cached[2]
+
+    question_ids = array(
+        "q",
+        Question.objects.filter(course_id=course_id, status="APPROVED")
+        .values_list("id", flat=True)
+        .iterator(),
+    )
+    _index[course_id] = (version, time.monotonic(), question_ids)
+    return question_ids
+
+
+def sample_questions(course, count):
+    """
+    Returns `count` distinct random approved questions of the course,
+    or None if the course does not have enough approved questions.
+    """
+    for attempt in range(2):
+        question_ids = approved_question_ids(course.pk)
+        if len(question_ids) < count:
+            return None
+
+        sampled_ids = random.sample(question_ids, count)
+        questions = Question.objects.filter(
+            pk__in=sampled_ids, course=course, status="APPROVED"
+        ).in_bulk()
+        if len(questions) == count:
+            return [questions[question_id] for question_id in sampled_ids]
+
+        # The index was outdated, reload it once and try again
+        invalidate(course.pk)
+
+    return None
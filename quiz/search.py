@@ -0,0 +1,182 @@
+"""
+Full-text search over the text and explanation of questions.
+
+On SQLite, the questions are indexed in the FTS5 table quiz_question_fts. It is
+an external content table: it stores only the index and reads the text from
+quiz_question. Triggers on quiz_question keep the index up to date for every
+insert, update and delete, including bulk_create, update() and cascades.
+Matches are ranked with BM25, matches in the question text count double.
+
+Every word of a search is a prefix ("klass" finds "Klasse"), and all words
+have to occur. Other databases, or SQLite builds without FTS5, fall back to
+icontains lookups without ranking.
+
+SQLite recreates a table for most schema changes, which drops its triggers.
+After a migration that changes quiz_question, run rebuild_search_index.
+"""
+
+import re
+
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "quiz_question_fts"
+
+# Number of the newest matches that are ranked
+RANK_WINDOW = 10_000
+
+# BM25 with the weights of the columns text and explanation
+RANK = f"bm25({FTS_TABLE}, 2.0, 1.0)"
+
+_CREATE_STATEMENTS = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text, explanation,
+        content='quiz_question', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON quiz_question
+    BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text, explanation)
+        VALUES (new.id, new.text, new.explanation);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON quiz_question
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text, explanation)
+        VALUES ('delete', old.id, old.text, old.explanation);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+    AFTER UPDATE OF text, explanation ON quiz_question
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text, explanation)
+        VALUES ('delete', old.id, old.text, old.explanation);
+        INSERT INTO {FTS_TABLE}(rowid, text, explanation)
+        VALUES (new.id, new.text, new.explanation);
+    END
+    """,
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+_DROP_STATEMENTS = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_update",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+# (alias, database name) -> whether the index exists
+_available = {}
+
+
+def install(connection):
+    """
+    Creates the search index and its triggers (if missing) and indexes all
+    questions. Returns False if the database doesn't support FTS5.
+    """
+    _available.clear()
+    if connection.vendor != "sqlite":
+        return False
+    with connection.cursor() as cursor:
+        try:
+            cursor.execute(_CREATE_STATEMENTS[0])
+        except OperationalError:  # SQLite without FTS5
+            return False
+        for statement in _CREATE_STATEMENTS[1:]:
+            cursor.execute(statement)
+    return True
+
+
+def uninstall(connection):
+    _available.clear()
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            for statement in _DROP_STATEMENTS:
+                cursor.execute(statement)
+
+
+def is_available(using=DEFAULT_DB_ALIAS):
+    connection = connections[using]
+    if connection.vendor != "sqlite":
+        return False
+    key = (using, str(connection.settings_dict["NAME"]))
+    if key not in _available:
+        _available[key] = FTS_TABLE in connection.introspection.table_names()
+    return _available[key]
+
+
+def _words(term):
+    return re.findall(r"\w+", term or "")
+
+
+def match_expression(term):
+    """
+    Returns the FTS5 query for a search, or None if it contains no words.
+    Every word is quoted, so FTS5 operators in the search have no effect.
+    """
+    words = _words(term)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+def _contains_all_words(queryset, term):
+    for word in _words(term):
+        queryset = queryset.filter(
+            Q(text__icontains=word) | Q(explanation__icontains=word)
+        )
+    return queryset
+
+
+def filter_questions(queryset, term):
+    """
+    Restricts a queryset of questions to the matches of a search.
+    """
+    expression = match_expression(term)
+    if expression is None:
+        return queryset
+    if not is_available(queryset.db):
+        return _contains_all_words(queryset, term)
+    return queryset.filter(
+        pk__in=RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [expression]
+        )
+    )
+
+
+def ranked_questions(queryset, term, limit):
+    """
+    Returns the best `limit` matches of a search within a queryset of
+    questions, best match first. Only the newest RANK_WINDOW matches are
+    ranked, so that a word found in most questions doesn't rank the whole
+    table. Without the search index, the newest matches are returned.
+    """
+    expression = match_expression(term)
+    if expression is None:
+        return []
+    if not is_available(queryset.db):
+        return list(_contains_all_words(queryset, term).order_by("-created_at")[:limit])
+
+    # The index finds and ranks the matches, the queryset only restricts them.
+    # The + keeps SQLite from running the MATCH once for every candidate.
+    candidates, params = queryset.order_by().values("pk").query.sql_with_params()
+    matches = (
+        f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+        f"AND +rowid IN ({candidates})"
+    )
+    with connections[queryset.db].cursor() as cursor:
+        cursor.execute(
+            f"{matches} AND rowid >= (SELECT coalesce(min(rowid), 0) FROM "
+            f"({matches} ORDER BY rowid DESC LIMIT %s)) ORDER BY {RANK} LIMIT %s",
+            [expression, *params, expression, *params, RANK_WINDOW, limit],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+
+    questions = queryset.in_bulk(ids)
+    return [questions[pk] for pk in ids if pk in questions]
@@ -0,0 +1,79 @@
+"""
+Signal handlers keeping derived data in sync with the questions and the
+leaderboards.
+Registered in QuizConfig.ready().
+"""
+
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import leaderboard, sampling, similarity
+from .models import Answer, LeaderboardEntry, Question
+
+
+def _indexed_state(question):
+    """
+    The fields of a question that decide whether it is in the question index
+    of a course, or None if they were not loaded.
+    """
+    if "status" not in question.__dict__ or "course_id" not in question.__dict__:
+        return None
+    return (question.status, question.course_id)
+
+
+@receiver(post_init, sender=Question)
+def remember_indexed_state(sender, instance, **kwargs):
+    instance._indexed_state = _indexed_state(instance)
+
+
+@receiver(post_save, sender=Question)
+def invalidate_question_index(sender, instance, created, **kwargs):
+    """
+    The approved questions of a course change when an approved question is
+    added, or a question is approved, unapproved or moved to another course.
+    Edits of the text or of pending questions leave the index unchanged.
+    """
+    old = None if created else instance._indexed_state
+    new = _indexed_state(instance)
+    instance._indexed_state = new
+
+    if created:
+        course_ids = {instance.course_id} if instance.status == "APPROVED" else set()
+    elif old is None or new is None:
+        # Unknown state (deferred fields): assume that it changed
+        course_ids = {instance.course_id}
+    elif old != new and (old[1] != new[1] or "APPROVED" in (old[0], new[0])):
+        course_ids = {old[1], new[1]}
+    else:
+        course_ids = set()
+
+    for course_id in course_ids - {None}:
+        sampling.invalidate(course_id)
+
+
+@receiver(post_delete, sender=Question)
+def remove_from_question_index(sender, instance, **kwargs):
+    if instance.course_id is not None and instance.status == "APPROVED":
+        sampling.invalidate(instance.course_id)
+
+
+@receiver(post_save, sender=Question)
+@receiver(post_save, sender=Answer)
+@receiver(post_delete, sender=Answer)
+def update_similarity_index(sender, instance, **kwargs):
+    """
+    The signature of the question changes with its text, course and answers.
+    Deleted questions lose their signature by the cascade.
+    """
+    question_id = instance.pk if sender is Question else instance.question_id
+    if not kwargs.get("raw"):
+        similarity.schedule(question_id)
+
+
+@receiver(post_delete, sender=LeaderboardEntry)
+def invalidate_leaderboard(sender, instance, **kwargs):
+    """
+    Entries are deleted with their user or course. The cached top list of
+    the leaderboard would show them until it expires.
+    """
+    leaderboard.invalidate(instance.course_id)
@@ -0,0 +1,296 @@
+"""
+Near-duplicate detection of questions.
+
+Every question is described by the set of its shingles: the overlapping
+5-character pieces of its normalized text and answers (the answers sorted, so
+their order doesn't matter). Two questions are near-duplicates if their sets
+are similar, i.e. if their Jaccard similarity |A ∩ B| / |A ∪ B| is high.
+
+MinHash signatures estimate the Jaccard similarity without comparing the
+shingles: the fraction of equal values of two signatures is the estimate. The
+signatures use one-permutation hashing: every shingle is hashed once, the hash
+selects one of NUM_HASHES bins, and each bin keeps the smallest hash.
+
+Locality-sensitive hashing (LSH) finds the candidates without comparing the
+signature with every other question: the signature is split into BANDS bands
+of ROWS values, and each band is hashed to a bucket key (together with the
+course, as only duplicates in the same course are reported). Questions that
+share at least one bucket are candidates; with 16 bands of 4 values, a pair
+with a similarity of 0.5 shares a bucket with a probability of 64%, a pair
+with 0.8 with more than 99.9%. A lookup is a single query on the bucket index.
+
+The signature and buckets of a question are updated after every transaction
+that saved the question or one of its answers (see quiz/signals.py).
+"""
+
+import hashlib
+import re
+import struct
+import threading
+import unicodedata
+import zlib
+
+from django.db import connections, router, transaction
+from django.db.models import Count
+
+from .models import Question, QuestionSignature, SimilarityBucket
+
+SHINGLE_SIZE = 5
+NUM_HASHES = 64
+BANDS = 16
+ROWS = NUM_HASHES // BANDS
+
+# Estimated Jaccard similarity from which questions count as near-duplicates
+DUPLICATE_THRESHOLD = 0.6
+
+# Candidates (sharing the most buckets) compared in a lookup
+MAX_CANDIDATES = 200
+
+_SIGNATURE_FORMAT = f"<{NUM_HASHES}I"
+
+# Empty bins take the value of the next bin, shifted by this per bin of distance
+_EMPTY_BIN_OFFSET = 2**32 // NUM_HASHES
+
+
+def normalize(text):
+    """
+    Lower case words without accents, separated by single spaces.
+    """
+    text = unicodedata.normalize("NFKD", (text or "").lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    return " ".join(re.findall(r"\w+", text))
+
+
+def shingles(text, answers=()):
+    document = " | ".join(
+        [normalize(text), *sorted(normalize(answer) for answer in answers)]
+    )
+    if len(document) <= SHINGLE_SIZE:
+        return {document}
+    return {
+        document[i : i + SHINGLE_SIZE] for i in range(len(document) - SHINGLE_SIZE + 1)
+    }
+
+
+def signature(text, answers=()):
+    """
+    Returns the MinHash signature (NUM_HASHES integers) of a question text
+    and its answer texts.
+    """
+    bins = [None] * NUM_HASHES
+    for shingle in shingles(text, answers):
+        bin_index, value = divmod(zlib.crc32(shingle.encode()), _EMPTY_BIN_OFFSET)
+        if bins[bin_index] is None or value < bins[bin_index]:
+            bins[bin_index] = value
+
+    # Densification: an empty bin takes the value of the next non-empty bin
+    result = []
+    for i in range(NUM_HASHES):
+        distance = 0
+        while bins[(i + distance) % NUM_HASHES] is None:
+            distance += 1
+        result.append(bins[(i + distance) % NUM_HASHES] + distance * _EMPTY_BIN_OFFSET)
+    return result
+
+
+def similarity(signature_a, signature_b):
+    """
+    Estimated Jaccard similarity (0 to 1) of two signatures.
+    """
+    equal = sum(a == b for a, b in zip(signature_a, signature_b))
+    return equal / NUM_HASHES
+
+
+def pack(values):
+    return struct.pack(_SIGNATURE_FORMAT, *values)
+
+
+def unpack(data):
+    return struct.unpack(_SIGNATURE_FORMAT, bytes(data))
+
+
+def bucket_keys(course_id, values):
+    """
+    Returns the LSH bucket keys (one per band) of a signature in a course.
+    """
+    keys = []
+    for band in range(BANDS):
+        band_values = values[band * ROWS : (band + 1) * ROWS]
+        digest = hashlib.blake2b(
+            struct.pack(f"<qH{ROWS}I", course_id or 0, band, *band_values),
+            digest_size=8,
+        ).digest()
+        # Positive 63 bit integers fit into a BigIntegerField
+        keys.append(int.from_bytes(digest, "big") >> 1)
+    return keys
+
+
+def index(entries):
+    """
+    Stores the signatures and buckets of questions, given as
+    (question_id, course_id, text, answer_texts) tuples, replacing the old ones.
+    """
+    signatures = []
+    buckets = []
+    for question_id, course_id, text, answers in entries:
+        values = signature(text, answers)
+        signatures.append(
+            QuestionSignature(question_id=question_id, minhash=pack(values))
+        )
+        buckets += [(question_id, key) for key in bucket_keys(course_id, values)]
+    if not signatures:
+        return
+
+    # The buckets are inserted without model instances, as there are BANDS
+    # rows per question and the rebuild creates millions of them.
+    connection = connections[router.db_for_write(SimilarityBucket)]
+    opts = SimilarityBucket._meta
+    insert = "INSERT INTO {} ({}, {}) VALUES (%s, %s)".format(
+        connection.ops.quote_name(opts.db_table),
+        connection.ops.quote_name(opts.get_field("question").column),
+        connection.ops.quote_name(opts.get_field("key").column),
+    )
+    with transaction.atomic(using=connection.alias):
+        SimilarityBucket.objects.filter(
+            question_id__in=[entry.question_id for entry in signatures]
+        ).delete()
+        QuestionSignature.objects.bulk_create(
+            signatures,
+            update_conflicts=True,
+            unique_fields=["question"],
+            update_fields=["minhash"],
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(insert, buckets)
+
+
+def index_questions(questions):
+    """
+    Indexes the questions of a queryset, reading their answers.
+    """
+    index(
+        (
+            question.pk,
+            question.course_id,
+            question.text,
+            [answer.text for answer in question.answers.all()],
+        )
+        for question in questions.prefetch_related("answers")
+    )
+
+
+# Questions saved in the current transaction, indexed when it is committed
+_pending = threading.local()
+
+
+def schedule(question_id):
+    """
+    Indexes the question after the current transaction (or right away in
+    autocommit mode). A question saved together with its answers in one
+    transaction is indexed once.
+    """
+    if not hasattr(_pending, "ids"):
+        _pending.ids = set()
+    _pending.ids.add(question_id)
+    transaction.on_commit(_index_pending)
+
+
+def _index_pending():
+    ids = getattr(_pending, "ids", None)
+    if ids:
+        _pending.ids = set()
+        index_questions(Question.objects.filter(pk__in=ids))
+
+
+def find_duplicates(course_id, text, answers=(), exclude=None):
+    """
+    Returns the near-duplicates of a question in the same course as
+    (similarity, question) tuples, most similar first.
+    `exclude` is the id of the question itself when it is edited.
+    """
+    values = signature(text, answers)
+    candidates = SimilarityBucket.objects.filter(key__in=bucket_keys(course_id, values))
+    if exclude is not None:
+        candidates = candidates.exclude(question_id=exclude)
+    candidate_ids = (
+        candidates.values("question_id")
+        .annotate(shared=Count("pk"))
+        .order_by("-shared")
+        .values("question_id")[:MAX_CANDIDATES]
+    )
+
+    duplicates = []
+    for question in Question.objects.filter(pk__in=candidate_ids).select_related(
+        "signature", "course"
+    ):
+        score = similarity(values, unpack(question.signature.minhash))
+        if score >= DUPLICATE_THRESHOLD:
+            duplicates.append((score, question))
+    duplicates.sort(key=lambda duplicate: (-duplicate[0], duplicate[1].pk))
+    return duplicates
+
+
+def duplicate_clusters(questions):
+    """
+    Groups the questions of a queryset (e.g. the pending ones) and their
+    near-duplicates in the same course into clusters. Every cluster contains
+    at least one of the questions, so a reviewer can act on it.
+    Returns lists of questions, the largest cluster first.
+
+    Only the questions of the queryset are compared with the other members of
+    their buckets, so a bucket costs (questions of the queryset in it) x
+    (members) comparisons instead of all pairs of its members. The clusters
+    are merged with union-find.
+    """
+    question_ids = set(questions.values_list("pk", flat=True))
+    members = {}
+    for key, question_id in SimilarityBucket.objects.filter(
+        key__in=SimilarityBucket.objects.filter(question_id__in=question_ids).values(
+            "key"
+        )
+    ).values_list("key", "question_id"):
+        members.setdefault(key, set()).add(question_id)
+    buckets = [ids for ids in members.values() if len(ids) > 1]
+
+    signatures = {
+        question_id: unpack(minhash)
+        for question_id, minhash in QuestionSignature.objects.filter(
+            question_id__in=set().union(*buckets)
+        ).values_list("question_id", "minhash")
+    }
+
+    parent = {}
+
+    def root(question_id):
+        while parent.get(question_id, question_id) != question_id:
+            question_id = parent[question_id]
+        return question_id
+
+    compared = set()
+    for ids in buckets:
+        for a in ids & question_ids:
+            for b in ids:
+                pair = (min(a, b), max(a, b))
+                if a == b or pair in compared:
+                    continue
+                compared.add(pair)
+                if similarity(signatures[a], signatures[b]) >= DUPLICATE_THRESHOLD:
+                    parent[root(a)] = root(b)
+
+    clusters = {}
+    for question_id in parent.keys() | set(parent.values()):
+        clusters.setdefault(root(question_id), []).append(question_id)
+
+    by_id = Question.objects.select_related("course", "creator").in_bulk(
+        [question_id for cluster in clusters.values() for question_id in cluster]
+    )
+    return sorted(
+        (
+            sorted(
+                (by_id[question_id] for question_id in cluster if question_id in by_id),
+                key=lambda question: question.pk,
+            )
+            for cluster in clusters.values()
+        ),
+        key=lambda cluster: (-len(cluster), cluster[0].pk),
+    )
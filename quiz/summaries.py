@@ -0,0 +1,99 @@
+"""
+Summaries of finished game sessions.
+
+Once a game session is finished, its results never change. next_question stores
+them as a GameSummary when the game ends: the score, the participants and the
+answer of the team for every question, loaded with a few bulk queries. The
+results page is rendered from the summary alone and can be cached by the
+browser for a long time.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+
+from .models import Answer, GameQuestion, GameSummary, TeamGameAnswer
+
+
+def build_summary(game_session):
+    """
+    Returns the results of a game session as a JSON-serializable dict.
+    """
+    participants = list(
+        game_session.participants.order_by("id").values_list(
+            "user__username", flat=True
+        )
+    )
+    team_answers = {
+        team_answer.question_id: team_answer
+        for team_answer in TeamGameAnswer.objects.filter(
+            session=game_session
+        ).select_related("answered_by")
+    }
+    game_questions = (
+        GameQuestion.objects.filter(session=game_session)
+        .select_related("question")
+        .prefetch_related(
+            Prefetch("question__answers", queryset=Answer.objects.order_by("id"))
+        )
+        .order_by("position")
+    )
+
+    questions = []
+    for game_question in game_questions:
+        question = game_question.question
+        team_answer = team_answers.get(question.id)
+        questions.append(
+            {
+                "number": game_question.position + 1,
+                "text": question.text,
+                "explanation": question.explanation,
+                "answered": team_answer is not None,
+                "is_correct": bool(team_answer and team_answer.is_correct),
+                "answered_by": (
+                    team_answer.answered_by.username
+                    if team_answer and team_answer.answered_by
+                    else None
+                ),
+                "answers": [
+                    {
+                        "text": answer.text,
+                        "is_correct": answer.is_correct,
+                        "selected": bool(
+                            team_answer and team_answer.selected_answer_id == answer.id
+                        ),
+                    }
+                    for answer in question.answers.all()
+                ],
+            }
+        )
+
+    return {
+        "join_code": game_session.join_code,
+        "course": game_session.course.name if game_session.course else None,
+        "team_score": game_session.team_score,
+        "correct_count": game_session.correct_count,
+        "question_count": game_session.question_count,
+        "participants": participants,
+        "questions": questions,
+    }
+
+
+def create_summary(game_session):
+    """
+    Stores the summary of a finished game session and returns it.
+    If a concurrent request stored it first, that summary is returned.
+    """
+    try:
+        with transaction.atomic():
+            return GameSummary.objects.create(
+                session=game_session, data=build_summary(game_session)
+            )
+    except IntegrityError:
+        return GameSummary.objects.get(session=game_session)
+
+
+def summary_etag(summary):
+    """
+    Strong ETag of a summary. A summary is never changed after it was stored.
+    """
+    return f'"summary-{summary.session_id}-{int(summary.created_at.timestamp())}"'
@@ -1,3 +1,1868 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import types
+from contextlib import contextmanager
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse
+from django.test import (
+    Client,
+    RequestFactory,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, reverse
+from django.utils import timezone
+
+from quiz import (
+    async_views,
+    events,
+    fragments,
+    game_state,
+    join_codes,
+    leaderboard,
+    pagination,
+    question_io,
+    sampling,
+    search,
+    similarity,
+)
+from quiz.date_hierarchy import IndexedDateQuerySet
+from quiz.middleware import QueryBudgetMiddleware
+from quiz.urls import game_state_urls
+from quiz.models import (
+    Answer,
+    Course,
+    GameParticipant,
+    GameSession,
+    GameSummary,
+    LeaderboardEntry,
+    Question,
+    QuestionStats,
+    SimilarityBucket,
+    TeamGameAnswer,
+)
+
+
+@override_settings(QUIZ_QUERY_HEADERS=True)
+class QuizTestCase(TestCase):
+    """
+    Base class for the quiz tests.
+    Provides a course with enough approved questions and helpers to play a game.
+    """
+
+    QUESTION_COUNT = 12
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.host = User.objects.create_user("host")
+        cls.player = User.objects.create_user("player")
+        cls.course = Course.objects.create(name="ISEF01")
+
+        for i in range(cls.QUESTION_COUNT):
+            question = Question.objects.create(
+                course=cls.course,
+                creator=cls.host,
+                text=f"Frage {i}",
+                status="APPROVED",
+            )
+            Answer.objects.create(question=question, text="Richtig", is_correct=True)
+            Answer.objects.create(question=question, text="Falsch", is_correct=False)
+
+    def setUp(self):
+        # Game states, fragments and question indexes must not leak between tests
+        for alias in ("default", "game_state"):
+            caches[alias].clear()
+        sampling._index.clear()
+        similarity._pending.ids = set()
+
+        self.client.force_login(self.host)
+
+    def login(self, user):
+        self.client.force_login(user)
+
+    def create_game(self):
+        response = self.client.post(reverse("create_game"), {"course": self.course.pk})
+        self.assertEqual(response.status_code, 302)
+        return GameSession.objects.latest("id").join_code
+
+    def add_player(self, join_code, username):
+        user = User.objects.create_user(username)
+        game_session = GameSession.objects.get(join_code=join_code)
+        GameParticipant.objects.create(user=user, session=game_session)
+
+        # Like join_game: a new state version and an up-to-date cached state
+        game_session.update_state()
+        with self.captureOnCommitCallbacks(execute=True):
+            game_state.refresh(join_code)
+        return user
+
+    def start_game(self, join_code):
+        self.client.post(reverse("start_game", args=[join_code]))
+
+    def current_answer(self, join_code, correct=True):
+        game_session = GameSession.objects.get(join_code=join_code)
+        return game_session.current_question.answers.get(is_correct=correct)
+
+    def finish_game(self, join_code):
+        for _ in range(self.QUESTION_COUNT):
+            response = self.client.post(reverse("next_question", args=[join_code]))
+            if response.has_header("HX-Redirect"):
+                return
+        self.fail("The game did not finish.")
+
+    def play_game(self, *usernames, correct=1):
+        """
+        Plays a game of the host and the given players to the end, with
+        `correct` correctly answered questions. Returns the join code.
+        """
+        join_code = self.create_game()
+        for username in usernames:
+            self.add_player(join_code, username)
+        self.start_game(join_code)
+        for _ in range(correct):
+            answer = self.current_answer(join_code)
+            self.client.post(reverse("submit_answer", args=[join_code, answer.pk]))
+            self.client.post(reverse("next_question", args=[join_code]))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.finish_game(join_code)
+        return join_code
+
+    @contextmanager
+    def assertMaxQueries(self, budget):
+        """
+        Fails if the enclosed code runs more than `budget` SQL queries.
+        """
+        with CaptureQueriesContext(connection) as context:
+            yield context
+
+        executed = len(context.captured_queries)
+        if executed > budget:
+            queries = "\n".join(
+                f"{i}. {query['sql']}"
+                for i, query in enumerate(context.captured_queries, start=1)
+            )
+            self.fail(
+                f"{executed} queries executed, budget is {budget}.\n"
+                f"Queries:\n{queries}"
+            )
+
+
+class QueryBudgetMiddlewareTests(QuizTestCase):
+    def test_headers_contain_query_count_and_time(self):
+        response = self.client.get(reverse("home"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(int(response["X-Query-Count"]), 0)
+        self.assertTrue(response["X-Query-Time"].endswith("ms"))
+        self.assertTrue(response["Server-Timing"].startswith("db;dur="))
+        # The slowest statements follow as their own entries
+        self.assertRegex(response["Server-Timing"], r', sql-1;dur=[\d.]+;desc="SELECT ')
+
+    @override_settings(QUIZ_QUERY_HEADERS=False)
+    def test_log_record_without_headers(self):
+        with self.assertLogs("quiz.queries", level="DEBUG") as logs:
+            response = self.client.get(reverse("home"))
+
+        self.assertFalse(response.has_header("X-Query-Count"))
+        record = logs.records[0]
+        self.assertEqual(record.levelname, "DEBUG")
+        self.assertEqual(record.path, reverse("home"))
+        self.assertGreater(record.query_count, 0)
+        self.assertLessEqual(len(record.slowest_queries), 3)
+
+    @override_settings(QUIZ_QUERY_HEADERS=False, QUIZ_QUERY_BUDGET=(1, 1000))
+    def test_requests_over_budget_are_warnings(self):
+        with self.assertLogs("quiz.queries", level="WARNING") as logs:
+            self.client.get(reverse("home"))
+        self.assertEqual(logs.records[0].levelname, "WARNING")
+
+    def test_async_requests(self):
+        async def view(request):
+            await Course.objects.acount()
+            return HttpResponse()
+
+        middleware = QueryBudgetMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(RequestFactory().get("/"))
+        self.assertEqual(response["X-Query-Count"], "1")
+
+
+class ViewQueryBudgetTests(QuizTestCase):
+    """
+    Every view in quiz/urls.py must stay within its SQL query budget.
+    The budgets include the two queries of the session and auth middleware.
+    A budget that grows with the number of rows (N+1) must fail here.
+    """
+
+    def test_home(self):
+        with self.assertMaxQueries(4):
+            self.client.get(reverse("home"))
+
+    def test_register(self):
+        self.client.logout()
+        with self.assertMaxQueries(0):
+            self.client.get(reverse("register"))
+
+    def test_login(self):
+        self.client.logout()
+        with self.assertMaxQueries(0):
+            self.client.get(reverse("login"))
+
+    def test_logout(self):
+        with self.assertMaxQueries(4):
+            self.client.post(reverse("logout"))
+
+    def test_my_questions(self):
+        with self.assertMaxQueries(5):
+            self.client.get(reverse("my_questions"))
+
+    def test_create_question(self):
+        with self.assertMaxQueries(3):
+            self.client.get(reverse("create_question"))
+
+        data = {
+            "course": self.course.pk,
+            "text": "Neue Frage",
+            "explanation": "",
+            "answers-TOTAL_FORMS": "4",
+            "answers-INITIAL_FORMS": "0",
+            "answers-MIN_NUM_FORMS": "0",
+            "answers-MAX_NUM_FORMS": "4",
+            "answers-0-text": "Richtig",
+            "answers-0-is_correct": "on",
+            "answers-1-text": "Falsch",
+        }
+        # Including the lookup of near-duplicates and the savepoint around the save
+        with self.assertMaxQueries(10):
+            response = self.client.post(reverse("create_question"), data)
+        self.assertEqual(response.status_code, 302)
+
+    def test_update_question(self):
+        question = Question.objects.create(
+            course=self.course, creator=self.host, text="Entwurf"
+        )
+        with self.assertMaxQueries(5):
+            self.client.get(reverse("update_question", args=[question.pk]))
+
+    def test_export_questions(self):
+        self.host.is_staff = True
+        self.host.save()
+
+        with self.assertMaxQueries(5):
+            response = self.client.get(
+                reverse("export_questions"), {"course": self.course.pk}
+            )
+            content = b"".join(response.streaming_content)
+        self.assertEqual(content.count(b"ISEF01"), self.QUESTION_COUNT)
+
+    def test_create_game(self):
+        with self.assertMaxQueries(12):
+            self.create_game()
+
+    def test_join_game(self):
+        join_code = self.create_game()
+        self.login(self.player)
+
+        with self.assertMaxQueries(8):
+            response = self.client.post(reverse("join_game"), {"join_code": join_code})
+        self.assertEqual(response.status_code, 302)
+
+    def test_game_lobby(self):
+        join_code = self.create_game()
+        for i in range(20):
+            self.add_player(join_code, f"player{i}")
+
+        with self.assertMaxQueries(6):
+            self.client.get(reverse("game_lobby", args=[join_code]))
+
+    def test_poll_lobby(self):
+        join_code = self.create_game()
+        for i in range(20):
+            self.add_player(join_code, f"player{i}")
+
+        with self.assertMaxQueries(3):
+            response = self.client.get(reverse("poll_lobby", args=[join_code]))
+        self.assertContains(response, "player19")
+
+        with self.assertMaxQueries(2):
+            response = self.client.get(
+                reverse("poll_lobby", args=[join_code]),
+                HTTP_IF_NONE_MATCH=response["ETag"],
+            )
+        self.assertEqual(response.status_code, 304)
+
+    def test_poll_lobby_sends_only_new_participants(self):
+        join_code = self.create_game()
+        for i in range(20):
+            self.add_player(join_code, f"player{i}")
+        seen = GameParticipant.objects.get(user__username="player9")
+        last = GameParticipant.objects.latest("id")
+
+        response = self.client.get(
+            reverse("poll_lobby", args=[join_code]), {"after": seen.pk}
+        )
+        self.assertContains(response, 'hx-swap-oob="beforeend:#participant-items"')
+        self.assertNotContains(response, "player9<")
+        self.assertContains(response, "player10")
+        self.assertContains(response, f"?after={last.pk}")
+        self.assertNotContains(response, "Host")
+
+        response = self.client.get(
+            reverse("poll_lobby", args=[join_code]), {"after": last.pk}
+        )
+        self.assertNotContains(response, "hx-swap-oob")
+        self.assertContains(response, f"?after={last.pk}")
+
+    def test_poll_game_start(self):
+        join_code = self.create_game()
+        with self.assertMaxQueries(4):
+            self.client.get(reverse("poll_game_start", args=[join_code]))
+
+    def test_start_game(self):
+        join_code = self.create_game()
+        with self.assertMaxQueries(8):
+            self.start_game(join_code)
+
+    def test_game_view(self):
+        join_code = self.create_game()
+        self.start_game(join_code)
+        with self.assertMaxQueries(3):
+            self.client.get(reverse("game_view", args=[join_code]))
+
+    def test_game_state_poller(self):
+        join_code = self.create_game()
+        self.start_game(join_code)
+        url = reverse("game_state_poller", args=[join_code])
+
+        with self.assertMaxQueries(7):
+            response = self.client.get(url)
+        self.assertContains(response, "1 / 10")
+
+        # Same state: served from the cached snapshot and fragment
+        with self.assertMaxQueries(2):
+            self.client.get(url)
+
+        with self.assertMaxQueries(2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+        # The ETag and the poller share one read of the cached state
+        with mock.patch.object(
+            game_state, "get_snapshot", wraps=game_state.get_snapshot
+        ) as get_snapshot:
+            self.client.get(url)
+        self.assertEqual(get_snapshot.call_count, 1)
+
+    def test_submit_answer(self):
+        join_code = self.create_game()
+        for i in range(20):
+            self.add_player(join_code, f"player{i}")
+        self.start_game(join_code)
+        answer = self.current_answer(join_code)
+
+        with self.assertMaxQueries(11):
+            response = self.client.post(
+                reverse("submit_answer", args=[join_code, answer.pk])
+            )
+        self.assertContains(response, "Richtig!")
+
+    def test_submit_answer_writes_the_team_score_once(self):
+        join_code = self.create_game()
+        for i in range(20):
+            self.add_player(join_code, f"player{i}")
+        self.start_game(join_code)
+
+        with CaptureQueriesContext(connection) as context:
+            self.client.post(
+                reverse(
+                    "submit_answer", args=[join_code, self.current_answer(join_code).pk]
+                )
+            )
+        updates = [
+            q["sql"]
+            for q in context.captured_queries
+            if q["sql"].startswith('UPDATE "quiz_gamesession"')
+        ]
+        self.assertEqual(len(updates), 1)
+
+        game_session = GameSession.objects.get(join_code=join_code)
+        self.assertEqual(game_session.team_score, 10)
+        self.assertEqual(game_session.correct_count, 1)
+
+    def test_game_events_disabled(self):
+        join_code = self.create_game()
+        with self.assertMaxQueries(2):
+            response = self.client.get(reverse("game_events", args=[join_code]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_next_question(self):
+        join_code = self.create_game()
+        self.start_game(join_code)
+        with self.assertMaxQueries(6):
+            self.client.post(reverse("next_question", args=[join_code]))
+
+    def test_game_results(self):
+        join_code = self.create_game()
+        for i in range(20):
+            self.add_player(join_code, f"player{i}")
+        self.start_game(join_code)
+        self.finish_game(join_code)
+
+        with self.assertMaxQueries(3):
+            response = self.client.get(reverse("game_results", args=[join_code]))
+        self.assertContains(response, "player19")
+
+        with self.assertMaxQueries(3):
+            response = self.client.get(
+                reverse("game_results", args=[join_code]),
+                HTTP_IF_NONE_MATCH=response["ETag"],
+            )
+        self.assertEqual(response.status_code, 304)
+
+
+# The URLs of the project with the async game state views (QUIZ_ASYNC_VIEWS)
+async_urls = types.ModuleType("async_urls")
+async_urls.urlpatterns = [
+    *game_state_urls(async_views),
+    path("", include(settings.ROOT_URLCONF)),
+]
+
+
+@override_settings(ROOT_URLCONF=async_urls)
+class AsyncViewsTests(QuizTestCase):
+    def test_poll_lobby(self):
+        join_code = self.create_game()
+        for i in range(20):
+            self.add_player(join_code, f"player{i}")
+        url = reverse("poll_lobby", args=[join_code])
+        self.assertTrue(iscoroutinefunction(self.client.get(url).resolver_match.func))
+
+        with self.assertMaxQueries(3):
+            response = self.client.get(url)
+        self.assertContains(response, "player19")
+        self.assertEqual(response["X-Poll-Interval"], "1")
+
+        with self.assertMaxQueries(2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_poll_game_start(self):
+        join_code = self.create_game()
+        url = reverse("poll_game_start", args=[join_code])
+        self.assertFalse(self.client.get(url).has_header("HX-Redirect"))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.start_game(join_code)
+        self.assertEqual(
+            self.client.get(url)["HX-Redirect"],
+            reverse("game_view", args=[join_code]),
+        )
+
+    def test_game_state_poller(self):
+        join_code = self.create_game()
+        self.start_game(join_code)
+        url = reverse("game_state_poller", args=[join_code])
+
+        with self.assertMaxQueries(7):
+            response = self.client.get(url)
+        self.assertContains(response, "1 / 10")
+        self.assertNotContains(response, fragments.CSRF_PLACEHOLDER)
+
+        with self.assertMaxQueries(2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+        self.login(self.player)
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_submit_answer(self):
+        join_code = self.create_game()
+        self.add_player(join_code, "guest")
+        self.start_game(join_code)
+        answer = self.current_answer(join_code)
+        url = reverse("submit_answer", args=[join_code, answer.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url)
+        self.assertContains(response, "Richtig!")
+        self.assertContains(response, "Beantwortet von host.")
+        self.assertEqual(GameSession.objects.get(join_code=join_code).team_score, 10)
+        self.assertTrue(game_state.get_snapshot(join_code)["answered"])
+
+        # The answer is claimed once, later submitters see the team answer
+        self.login(User.objects.get(username="guest"))
+        response = self.client.post(url)
+        self.assertContains(response, "Beantwortet von host.")
+        self.assertEqual(GameSession.objects.get(join_code=join_code).team_score, 10)
+
+        self.assertEqual(
+            self.client.post(reverse("submit_answer", args=[join_code, 0])).status_code,
+            404,
+        )
+
+
+class GameStateCacheTests(QuizTestCase):
+    def cache(self):
+        return caches[settings.QUIZ_GAME_STATE_CACHE]
+
+    def test_changes_write_the_snapshot_through(self):
+        join_code = self.create_game()
+        self.assertEqual(game_state.get_snapshot(join_code)["status"], "LOBBY")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.start_game(join_code)
+
+        game_session = GameSession.objects.get(join_code=join_code)
+        with mock.patch.object(game_state, "build_snapshot") as build_snapshot:
+            snapshot = game_state.get_snapshot(join_code)
+        build_snapshot.assert_not_called()
+        self.assertEqual(snapshot["status"], "ACTIVE")
+        self.assertEqual(snapshot["version"], game_session.state_version)
+        self.assertEqual(snapshot["question_id"], game_session.current_question_id)
+
+    def test_an_older_snapshot_does_not_replace_a_newer_one(self):
+        join_code = self.create_game()
+        old = game_state.build_snapshot(join_code)
+        self.add_player(join_code, "guest")
+
+        game_state.store_snapshot(old)
+        self.assertEqual(
+            game_state.get_snapshot(join_code)["version"], old["version"] + 1
+        )
+
+    def test_concurrent_rebuilds_keep_the_newer_snapshot(self):
+        join_code = self.create_game()
+        old = game_state.build_snapshot(join_code)
+        self.add_player(join_code, "guest")
+        new = game_state.build_snapshot(join_code)
+        self.cache().clear()
+
+        # The writer of the old snapshot is paused after reading the cached
+        # version, while the newer snapshot is written
+        paused, resume = threading.Event(), threading.Event()
+        cache_get = LocMemCache.get
+
+        def get(cache, key, *args, **kwargs):
+            value = cache_get(cache, key, *args, **kwargs)
+            if threading.current_thread().name == "old-writer":
+                paused.set()
+                resume.wait(5)
+            return value
+
+        with mock.patch.object(LocMemCache, "get", get):
+            writer = threading.Thread(
+                target=game_state.store_snapshot, args=[old], name="old-writer"
+            )
+            writer.start()
+            paused.wait(5)
+            new_writer = threading.Thread(target=game_state.store_snapshot, args=[new])
+            new_writer.start()
+            time.sleep(0.05)  # The new writer waits for the lock
+            resume.set()
+            writer.join()
+            new_writer.join()
+
+        self.assertEqual(game_state.get_snapshot(join_code)["version"], new["version"])
+
+    def test_finished_games_expire_soon(self):
+        join_code = self.create_game()
+        with mock.patch.object(
+            self.cache(), "set", wraps=self.cache().set
+        ) as cache_set:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.start_game(join_code)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.finish_game(join_code)
+
+        self.assertEqual(cache_set.call_args_list[0].args[2], game_state.LIVE_TIMEOUT)
+        self.assertEqual(
+            cache_set.call_args_list[-1].args[2], game_state.FINISHED_TIMEOUT
+        )
+        self.assertEqual(cache_set.call_args_list[-1].args[1]["status"], "FINISHED")
+
+    def test_cached_fragments_get_the_token_of_the_user(self):
+        join_code = self.create_game()
+        self.add_player(join_code, "guest")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.start_game(join_code)
+        url = reverse("game_state_poller", args=[join_code])
+        self.client.get(url)  # Renders the fragment
+
+        guest = Client(enforce_csrf_checks=True)
+        guest.force_login(User.objects.get(username="guest"))
+        guest.get(reverse("game_view", args=[join_code]))  # Sets the CSRF cookie
+        with mock.patch.object(fragments, "render_to_string") as render_to_string:
+            response = guest.get(url)
+        render_to_string.assert_not_called()
+        self.assertNotContains(response, fragments.CSRF_PLACEHOLDER)
+
+        token = re.search(
+            rb'name="csrfmiddlewaretoken" value="([^"]+)"', response.content
+        ).group(1)
+        answer = self.current_answer(join_code)
+        response = guest.post(
+            reverse("submit_answer", args=[join_code, answer.pk]),
+            {"csrfmiddlewaretoken": token.decode()},
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class GameEventsTests(QuizTestCase):
+    def test_state_changes_are_published(self):
+        join_code = self.create_game()
+        with mock.patch.object(events, "publish") as publish:
+            self.start_game(join_code)
+        question_id = GameSession.objects.get(join_code=join_code).current_question_id
+        publish.assert_called_once_with(
+            join_code, events.EVENT_QUESTION, question=question_id
+        )
+
+    def test_stream_sends_the_published_events(self):
+        async def receive():
+            stream = events.stream("ABC123")
+            messages = [await anext(stream)]  # Subscribes
+            events.publish("ABC123", events.EVENT_ANSWER, question=7)
+            events.publish("OTHER1", events.EVENT_ANSWER, question=8)
+            events.publish("ABC123", events.EVENT_FINISH)
+            async for message in stream:
+                messages.append(message)
+            return messages
+
+        # Without a transaction, the events are sent right away
+        with mock.patch.object(events.transaction, "on_commit", lambda send: send()):
+            messages = asyncio.run(asyncio.wait_for(receive(), 5))
+
+        self.assertEqual(
+            messages,
+            [
+                f"retry: {events.RETRY_MILLISECONDS}\n\n",
+                'event: answer\ndata: {"question": 7}\n\n',
+                "event: finish\ndata: {}\n\n",
+            ],
+        )
+        self.assertFalse(events._subscribers)
+
+    @override_settings(QUIZ_SSE_ENABLED=True)
+    def test_only_participants_of_the_current_session(self):
+        join_code = self.create_game()
+        response = self.client.get(reverse("game_events", args=[join_code]))
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+
+        # The code is recycled for a game of another user
+        with self.captureOnCommitCallbacks(execute=True):
+            self.start_game(join_code)
+            self.finish_game(join_code)
+        self.login(self.player)
+        self.create_game()
+        GameSession.objects.filter(pk=GameSession.objects.latest("id").pk).update(
+            join_code=join_code
+        )
+
+        self.login(self.host)
+        response = self.client.get(reverse("game_events", args=[join_code]))
+        self.assertEqual(response.status_code, 404)
+
+
+class AdaptivePollingTests(QuizTestCase):
+    def test_interval_backs_off_until_the_next_change(self):
+        snapshot = {"status": "LOBBY", "changed_at": 1000.0}
+        for idle, interval in [(0, 1), (1.5, 2), (5, 4), (9, 8), (600, 10)]:
+            with self.subTest(idle=idle):
+                with mock.patch.object(
+                    game_state.time, "time", return_value=1000 + idle
+                ):
+                    self.assertEqual(game_state.poll_interval(snapshot), interval)
+
+        with mock.patch.object(game_state.time, "time", return_value=1600):
+            self.assertEqual(
+                game_state.poll_interval({**snapshot, "status": "ACTIVE"}), 4
+            )
+            self.assertEqual(
+                game_state.poll_interval({**snapshot, "status": "FINISHED"}), 0
+            )
+
+    def test_backoff_survives_a_cache_miss(self):
+        join_code = self.create_game()
+        changed_at = game_state.get_snapshot(join_code)["changed_at"]
+
+        # A rebuilt snapshot keeps the time of the change, not of the rebuild
+        caches[settings.QUIZ_GAME_STATE_CACHE].clear()
+        with mock.patch.object(game_state.time, "time", return_value=changed_at + 60):
+            snapshot = game_state.get_snapshot(join_code)
+            self.assertEqual(snapshot["changed_at"], changed_at)
+            self.assertEqual(game_state.poll_interval(snapshot), 10)
+
+        self.add_player(join_code, "guest")
+        self.assertGreater(game_state.get_snapshot(join_code)["changed_at"], changed_at)
+
+    def test_pollers_send_the_next_interval(self):
+        join_code = self.create_game()
+        response = self.client.get(reverse("game_lobby", args=[join_code]))
+        self.assertContains(response, 'hx-trigger="poll', count=1)
+        self.assertNotContains(response, "every 3s")
+
+        response = self.client.get(reverse("poll_lobby", args=[join_code]))
+        self.assertEqual(response["X-Poll-Interval"], "1")
+        self.assertContains(response, 'data-poll="1"')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.start_game(join_code)
+        url = reverse("game_state_poller", args=[join_code])
+        response = self.client.get(url)
+        # Also when the state is unchanged
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["X-Poll-Interval"], "1")
+
+        with mock.patch.object(game_state.time, "time", return_value=time.time() + 60):
+            response = self.client.get(url)
+        self.assertEqual(response["X-Poll-Interval"], "4")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.finish_game(join_code)
+        response = self.client.get(url)
+        self.assertEqual(
+            response["HX-Redirect"], reverse("game_results", args=[join_code])
+        )
+        self.assertEqual(response["X-Poll-Interval"], "0")
+
+
+class GameResultsTests(QuizTestCase):
+    def test_summary_is_stored_when_the_game_ends(self):
+        join_code = self.play_game()
+
+        summary = GameSummary.objects.get(session__join_code=join_code)
+        self.assertEqual(summary.data["team_score"], 10)
+        self.assertEqual(summary.data["participants"], ["host"])
+        self.assertEqual(len(summary.data["questions"]), 10)
+        first = summary.data["questions"][0]
+        self.assertTrue(first["is_correct"])
+        self.assertEqual(first["answered_by"], "host")
+        self.assertFalse(summary.data["questions"][1]["answered"])
+
+    def test_results_are_cacheable(self):
+        join_code = self.play_game()
+
+        response = self.client.get(reverse("game_results", args=[join_code]))
+        self.assertContains(response, "1 von 10 Fragen richtig beantwortet")
+        self.assertFalse(response["ETag"].startswith("W/"))
+        self.assertIn("private", response["Cache-Control"])
+        self.assertIn("immutable", response["Cache-Control"])
+
+    def test_summary_is_created_for_older_games(self):
+        join_code = self.play_game()
+        GameSummary.objects.all().delete()
+
+        response = self.client.get(reverse("game_results", args=[join_code]))
+        self.assertContains(response, "10 Punkte")
+        self.assertTrue(
+            GameSummary.objects.filter(session__join_code=join_code).exists()
+        )
+
+    def test_results_only_for_participants(self):
+        join_code = self.play_game()
+        self.login(self.player)
+
+        response = self.client.get(reverse("game_results", args=[join_code]))
+        self.assertEqual(response.status_code, 404)
+
+
+class MyQuestionListTests(QuizTestCase):
+    def test_keyset_pages_contain_every_question_once(self):
+        for i in range(30):
+            Question.objects.create(
+                course=self.course, creator=self.host, text=f"Entwurf {i:02d}"
+            )
+
+        response = self.client.get(reverse("my_questions"), {"sort_by": "text"})
+        group = response.context["grouped_questions"]["PENDING"]
+        self.assertEqual(group["count"], 30)
+        texts = [question.text for question in group["questions"]]
+
+        next_query = group["next_query"]
+        while next_query:
+            response = self.client.get(
+                f"{reverse('my_questions')}?{next_query}", HTTP_HX_REQUEST="true"
+            )
+            self.assertTemplateUsed(response, "quiz/partials/_my_questions_rows.html")
+            # The rendered rows, not only the context
+            rows = re.findall(r"<p[^>]*>(Entwurf \d+)</p>", response.content.decode())
+            self.assertEqual(len(rows), len(response.context["questions"]))
+            self.assertTrue(rows)
+            texts += rows
+            next_query = response.context["next_query"]
+
+        self.assertEqual(texts, [f"Entwurf {i:02d}" for i in range(30)])
+
+    def test_invalid_cursor_starts_from_the_first_page(self):
+        response = self.client.get(
+            reverse("my_questions"),
+            {"group": "APPROVED", "cursor": "kaputt"},
+            HTTP_HX_REQUEST="true",
+        )
+        self.assertEqual(len(response.context["questions"]), self.QUESTION_COUNT)
+
+
+@override_settings(QUIZ_QUERY_HEADERS=True)
+class SubmitAnswerConcurrencyTests(TransactionTestCase):
+    """
+    Simultaneous submitters of a team: the first answer wins, everybody else
+    gets the winner's answer. Runs against the real database connections of
+    the threads, so it cannot use the transaction of a TestCase.
+    """
+
+    SUBMITTERS = 50
+
+    def setUp(self):
+        for alias in ("default", "game_state"):
+            caches[alias].clear()
+        sampling._index.clear()
+
+        self.host = User.objects.create_user("host")
+        self.course = Course.objects.create(name="ISEF01")
+        for i in range(QuizTestCase.QUESTION_COUNT):
+            question = Question.objects.create(
+                course=self.course,
+                creator=self.host,
+                text=f"Frage {i}",
+                status="APPROVED",
+            )
+            Answer.objects.create(question=question, text="Richtig", is_correct=True)
+            Answer.objects.create(question=question, text="Falsch", is_correct=False)
+
+        self.client.force_login(self.host)
+        self.client.post(reverse("create_game"), {"course": self.course.pk})
+        self.game_session = GameSession.objects.get()
+        self.client.post(reverse("start_game", args=[self.game_session.join_code]))
+        self.game_session.refresh_from_db()
+
+        self.players = [
+            User.objects.create_user(f"player{i}") for i in range(self.SUBMITTERS)
+        ]
+        GameParticipant.objects.bulk_create(
+            GameParticipant(session=self.game_session, user=user)
+            for user in self.players
+        )
+
+    def test_first_answer_wins_without_errors(self):
+        answers = list(self.game_session.current_question.answers.all())
+        barrier = threading.Barrier(self.SUBMITTERS)
+        results = []
+        lock = threading.Lock()
+
+        def submit(index):
+            client = Client(raise_request_exception=False)
+            client.force_login(self.players[index])
+            answer = answers[index % len(answers)]
+            url = reverse(
+                "submit_answer", args=[self.game_session.join_code, answer.pk]
+            )
+            try:
+                barrier.wait()
+                start = time.perf_counter()
+                response = client.post(url)
+                duration = time.perf_counter() - start
+                with lock:
+                    results.append((response.status_code, duration, response.content))
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=submit, args=(i,)) for i in range(self.SUBMITTERS)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual([status for status, _, _ in results], [200] * self.SUBMITTERS)
+        self.assertLess(max(duration for _, duration, _ in results), 5)
+
+        team_answer = TeamGameAnswer.objects.get(session=self.game_session)
+        expected = "Richtig!" if team_answer.is_correct else "Falsch!"
+        for _, _, content in results:
+            self.assertIn(expected, content.decode())
+
+        self.game_session.refresh_from_db()
+        self.assertEqual(self.game_session.state_version, 2)
+        self.assertEqual(self.game_session.team_score, 10 * team_answer.is_correct)
+        self.assertEqual(self.game_session.correct_count, int(team_answer.is_correct))
+
+
+class PruneSessionsTests(QuizTestCase):
+    def age(self, join_code, **delta):
+        GameSession.objects.filter(join_code=join_code).update(
+            created_at=timezone.now() - timedelta(**delta)
+        )
+
+    def prune(self, *args):
+        call_command("prune_sessions", "--sleep", "0", *args, stdout=StringIO())
+
+    def test_deletes_abandoned_lobbies(self):
+        old_lobby = self.create_game()
+        self.add_player(old_lobby, "player1")
+        self.age(old_lobby, hours=25)
+        new_lobby = self.create_game()
+
+        self.prune("--batch-size", "1")
+
+        self.assertFalse(GameSession.objects.filter(join_code=old_lobby).exists())
+        self.assertFalse(
+            GameParticipant.objects.filter(user__username="player1").exists()
+        )
+        self.assertTrue(GameSession.objects.filter(join_code=new_lobby).exists())
+
+    def test_archives_old_finished_games(self):
+        join_code = self.play_game()
+        recent = self.play_game()
+        GameSummary.objects.filter(session__join_code=join_code).delete()
+        self.age(join_code, days=91)
+
+        self.prune()
+        self.prune()  # Nothing left to do
+
+        game_session = GameSession.objects.get(join_code=join_code)
+        self.assertIsNotNone(game_session.archived_at)
+        self.assertFalse(TeamGameAnswer.objects.filter(session=game_session).exists())
+        self.assertTrue(
+            TeamGameAnswer.objects.filter(session__join_code=recent).exists()
+        )
+
+        response = self.client.get(reverse("game_results", args=[join_code]))
+        self.assertContains(response, "Richtig beantwortet von host")
+
+    def test_dry_run_changes_nothing(self):
+        join_code = self.create_game()
+        self.age(join_code, hours=25)
+
+        self.prune("--dry-run")
+
+        self.assertTrue(GameSession.objects.filter(join_code=join_code).exists())
+
+
+class QuestionStatsTests(QuizTestCase):
+    def play_answered_game(self, finish=True):
+        """
+        Plays a game with a correct and a wrong answer.
+        Returns the join code and the ids of the answered questions.
+        """
+        join_code = self.create_game()
+        self.start_game(join_code)
+        answered = []
+        for correct in (True, False):
+            answer = self.current_answer(join_code, correct=correct)
+            self.client.post(reverse("submit_answer", args=[join_code, answer.pk]))
+            self.client.post(reverse("next_question", args=[join_code]))
+            answered.append(answer.question_id)
+        if finish:
+            self.finish_game(join_code)
+        return join_code, answered
+
+    def stats(self):
+        return {
+            stats.question_id: (
+                stats.times_served,
+                stats.times_answered,
+                stats.times_correct,
+            )
+            for stats in QuestionStats.objects.all()
+        }
+
+    def test_games_update_the_stats(self):
+        join_code, (correct, wrong) = self.play_answered_game()
+
+        stats = QuestionStats.objects.get(question_id=correct)
+        self.assertEqual(
+            (stats.times_served, stats.times_answered, stats.times_correct), (1, 1, 1)
+        )
+        self.assertIsNotNone(stats.last_used_at)
+        self.assertEqual(QuestionStats.objects.get(question_id=wrong).correct_rate, 0)
+
+        served = GameSession.objects.get(join_code=join_code).question_count
+        self.assertEqual(
+            sum(times_served for times_served, _, _ in self.stats().values()), served
+        )
+
+    def test_simultaneous_start_requests_serve_the_question_once(self):
+        join_code = self.create_game()
+        game_session = GameSession.objects.get(join_code=join_code)
+        first = game_session.game_questions.get(position=0).question_id
+        update_state = GameSession.update_state
+
+        def after_another_request(game_session, **kwargs):
+            # The other request started the game after this one read the game session
+            GameSession.objects.filter(pk=game_session.pk).update(status="ACTIVE")
+            return update_state(game_session, **kwargs)
+
+        with mock.patch.object(
+            GameSession,
+            "update_state",
+            autospec=True,
+            side_effect=after_another_request,
+        ):
+            response = self.client.post(reverse("start_game", args=[join_code]))
+        self.assertRedirects(
+            response,
+            reverse("game_view", args=[join_code]),
+            fetch_redirect_response=False,
+        )
+
+        self.assertEqual(QuestionStats.objects.get(question_id=first).times_served, 0)
+        game_session.refresh_from_db()
+        self.assertEqual(game_session.state_version, 0)
+
+    def test_simultaneous_next_requests_serve_the_question_once(self):
+        join_code = self.create_game()
+        self.start_game(join_code)
+        game_session = GameSession.objects.get(join_code=join_code)
+        second = game_session.game_questions.get(position=1).question_id
+        update_state = GameSession.update_state
+
+        def after_another_request(game_session, **kwargs):
+            # The other request advanced after this one read the game session
+            GameSession.objects.filter(pk=game_session.pk).update(current_position=1)
+            return update_state(game_session, **kwargs)
+
+        with mock.patch.object(
+            GameSession,
+            "update_state",
+            autospec=True,
+            side_effect=after_another_request,
+        ):
+            response = self.client.post(reverse("next_question", args=[join_code]))
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(QuestionStats.objects.get(question_id=second).times_served, 0)
+        game_session.refresh_from_db()
+        self.assertEqual(game_session.state_version, 1)
+
+    def test_rebuild_matches_the_updated_stats(self):
+        archived, _ = self.play_answered_game()
+        self.play_answered_game()
+        self.play_answered_game(finish=False)
+        GameSession.objects.filter(join_code=archived).update(
+            created_at=timezone.now() - timedelta(days=91)
+        )
+        call_command("prune_sessions", "--sleep", "0", stdout=StringIO())
+        self.assertFalse(TeamGameAnswer.objects.filter(session__join_code=archived))
+
+        expected = self.stats()
+        QuestionStats.objects.all().delete()
+        call_command("rebuild_question_stats", stdout=StringIO())
+        self.assertEqual(self.stats(), expected)
+
+    def test_admin_sorts_by_correct_rate(self):
+        self.host.is_staff = self.host.is_superuser = True
+        self.host.save()
+        _, (correct, wrong) = self.play_answered_game()
+
+        url = reverse("admin:quiz_question_changelist")
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, {"o": "-7"})
+        self.assertEqual(
+            [question.pk for question in response.context["cl"].result_list[:2]],
+            [correct, wrong],
+        )
+        self.assertContains(response, "100% of 1")
+        self.assertFalse(
+            any("quiz_teamgameanswer" in q["sql"] for q in context.captured_queries)
+        )
+
+
+class LeaderboardTests(QuizTestCase):
+    def scores(self, course_id):
+        return [
+            (entry["rank"], entry["username"], entry["total_score"])
+            for entry in leaderboard.get_top(course_id)
+        ]
+
+    def test_finished_games_update_the_leaderboards(self):
+        self.play_game("guest")
+        self.assertEqual(self.scores(None), [(1, "host", 10), (1, "guest", 10)])
+
+        self.play_game(correct=2)
+        expected = [(1, "host", 30), (2, "guest", 10)]
+        self.assertEqual(self.scores(self.course.pk), expected)
+        self.assertEqual(self.scores(None), expected)
+
+        entry = LeaderboardEntry.objects.get(user=self.host, course=self.course)
+        self.assertEqual((entry.games_played, entry.correct_count), (2, 3))
+
+        # The rank of a user below the top list is counted
+        guest = User.objects.get(username="guest")
+        with mock.patch.object(leaderboard, "TOP_SIZE", 1):
+            caches["default"].clear()
+            with self.assertNumQueries(3):
+                entry = leaderboard.get_rank(guest, self.course.pk)
+        self.assertEqual((entry["rank"], entry["total_score"]), (2, 10))
+
+    def test_final_next_request_finishes_the_game_once(self):
+        join_code = self.play_game("guest")
+        response = self.client.post(reverse("next_question", args=[join_code]))
+        self.assertEqual(response.status_code, 404)
+
+        # Simultaneous requests: another one finished the game after this one
+        # read it
+        join_code = self.create_game()
+        self.start_game(join_code)
+        GameSession.objects.filter(join_code=join_code).update(current_position=9)
+        update_state = GameSession.update_state
+
+        def after_another_request(game_session, **kwargs):
+            GameSession.objects.filter(pk=game_session.pk).update(status="FINISHED")
+            return update_state(game_session, **kwargs)
+
+        with mock.patch.object(
+            GameSession,
+            "update_state",
+            autospec=True,
+            side_effect=after_another_request,
+        ):
+            response = self.client.post(reverse("next_question", args=[join_code]))
+        self.assertEqual(
+            response["HX-Redirect"], reverse("game_results", args=[join_code])
+        )
+        self.assertFalse(GameSummary.objects.filter(session__join_code=join_code))
+
+        entry = LeaderboardEntry.objects.get(user=self.host, course=self.course)
+        self.assertEqual(entry.games_played, 1)
+
+    def test_top_lists_forget_deleted_users(self):
+        self.play_game("guest")
+        self.assertEqual(len(self.scores(self.course.pk)), 2)
+
+        with mock.patch.object(
+            leaderboard.cache, "set", wraps=leaderboard.cache.set
+        ) as cache_set:
+            User.objects.get(username="guest").delete()
+            self.assertEqual(self.scores(self.course.pk), [(1, "host", 10)])
+            self.assertEqual(self.scores(None), [(1, "host", 10)])
+        self.assertEqual(
+            {call.args[2] for call in cache_set.call_args_list},
+            {leaderboard.TOP_TIMEOUT},
+        )
+
+    def test_results_page_loads_the_leaderboard(self):
+        join_code = self.play_game("guest")
+        response = self.client.get(reverse("game_results", args=[join_code]))
+        url = f"{reverse('leaderboard')}?course={self.course.pk}"
+        self.assertContains(response, f'hx-get="{url}"')
+
+        self.client.get(url)
+        # Served from the cached top lists, independent of the number of games
+        with self.assertMaxQueries(3):
+            response = self.client.get(url)
+        self.assertContains(response, "ISEF01")
+        self.assertContains(response, "1. guest")
+        self.assertContains(response, "Alle Kurse")
+
+    def test_rebuild_matches_the_updated_leaderboards(self):
+        self.play_game("guest")
+        self.play_game(correct=2)
+        self.create_game()  # Unfinished games don't count
+
+        expected = set(
+            LeaderboardEntry.objects.values_list(
+                "user_id", "course_id", "total_score", "games_played", "correct_count"
+            )
+        )
+        LeaderboardEntry.objects.all().delete()
+        call_command("rebuild_leaderboard", stdout=StringIO())
+        self.assertEqual(
+            set(
+                LeaderboardEntry.objects.values_list(
+                    "user_id",
+                    "course_id",
+                    "total_score",
+                    "games_played",
+                    "correct_count",
+                )
+            ),
+            expected,
+        )
+        self.assertEqual(len(expected), 4)
+
+
+class GameQuestionMigrationTests(TransactionTestCase):
+    """
+    The data migration of 0004 moves the questions of existing game sessions
+    into the ordered sequence.
+    """
+
+    before = [("quiz", "0003_gamesession_state_version")]
+    after = [("quiz", "0004_gamequestion_sequence")]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        self.migrate(MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_backfills_the_sequence_of_legacy_sessions(self):
+        apps = self.migrate(self.before)
+        Course = apps.get_model("quiz", "Course")
+        Question = apps.get_model("quiz", "Question")
+        GameSession = apps.get_model("quiz", "GameSession")
+
+        course = Course.objects.create(name="ISEF01")
+        questions = [
+            Question.objects.create(course=course, text=f"Frage {i}") for i in range(3)
+        ]
+        active = GameSession.objects.create(
+            course=course,
+            join_code="AAAAAA",
+            status="ACTIVE",
+            current_question=questions[1],
+        )
+        active.questions.set(reversed(questions))
+        lobby = GameSession.objects.create(course=course, join_code="BBBBBB")
+
+        apps = self.migrate(self.after)
+        GameSession = apps.get_model("quiz", "GameSession")
+        GameQuestion = apps.get_model("quiz", "GameQuestion")
+
+        active = GameSession.objects.get(pk=active.pk)
+        self.assertEqual(active.question_count, 3)
+        self.assertEqual(active.current_position, 1)
+        self.assertEqual(
+            list(
+                GameQuestion.objects.filter(session=active)
+                .order_by("position")
+                .values_list("question_id", flat=True)
+            ),
+            [question.pk for question in questions],
+        )
+        lobby = GameSession.objects.get(pk=lobby.pk)
+        self.assertEqual((lobby.question_count, lobby.current_position), (0, None))
+
+
+class JoinCodeTests(QuizTestCase):
+    def test_codes_are_unique_and_well_formed(self):
+        codes = {join_codes.code_for(number) for number in range(100_000)}
+
+        self.assertEqual(len(codes), 100_000)
+        for code in list(codes)[:1000]:
+            self.assertEqual(len(code), 6)
+            self.assertTrue(set(code) <= set(join_codes.ALPHABET))
+
+    def test_code_space_wraps_around(self):
+        self.assertEqual(
+            join_codes.code_for(0), join_codes.code_for(join_codes.CODE_SPACE)
+        )
+
+    def test_allocate_skips_codes_of_live_sessions(self):
+        next_code = join_codes.code_for(0)
+        GameSession.objects.create(course=self.course, join_code=next_code)
+
+        self.assertEqual(join_codes.allocate(), join_codes.code_for(1))
+
+    def test_codes_of_finished_sessions_are_recycled(self):
+        finished = GameSession.objects.create(
+            course=self.course, join_code="ABC123", status="FINISHED"
+        )
+        live = GameSession.objects.create(course=self.course, join_code="ABC123")
+        GameParticipant.objects.create(session=finished, user=self.host)
+        GameParticipant.objects.create(session=live, user=self.host)
+
+        response = self.client.get(reverse("game_view", args=["ABC123"]))
+        self.assertRedirects(response, reverse("game_lobby", args=["ABC123"]))
+        self.assertEqual(GameSession.objects.current("abc123"), live)
+        self.assertEqual(
+            GameSession.objects.filter(status="FINISHED").current("ABC123"), finished
+        )
+        self.assertEqual(async_to_sync(GameSession.objects.acurrent)("ABC123"), live)
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            GameSession.objects.create(course=self.course, join_code="ABC123")
+
+
+class QuestionIndexTests(QuizTestCase):
+    def version(self, course):
+        return sampling._current_version(course.pk)
+
+    def test_only_changes_of_approved_questions_invalidate(self):
+        other = Course.objects.create(name="ISEF02")
+        question = Question.objects.create(course=self.course, text="Neu")
+
+        for change, invalidated in (
+            ({"text": "Geändert"}, False),
+            ({"status": "APPROVED"}, True),
+            ({"text": "Noch einmal geändert"}, False),
+            ({"status": "REJECTED"}, True),
+        ):
+            with self.subTest(change=change):
+                before = self.version(self.course)
+                for name, value in change.items():
+                    setattr(question, name, value)
+                question.save()
+                self.assertEqual(self.version(self.course) != before, invalidated)
+
+        # Moving a question invalidates both courses
+        question = Question.objects.get(pk=question.pk)
+        versions = (self.version(self.course), self.version(other))
+        question.course = other
+        question.save()
+        self.assertNotEqual(self.version(self.course), versions[0])
+        self.assertNotEqual(self.version(other), versions[1])
+
+    def test_deleting_a_pending_question_keeps_the_index(self):
+        question = Question.objects.create(course=self.course, text="Neu")
+        before = self.version(self.course)
+        question.delete()
+        self.assertEqual(self.version(self.course), before)
+
+        before = self.version(self.course)
+        Question.objects.filter(course=self.course, status="APPROVED").first().delete()
+        self.assertNotEqual(self.version(self.course), before)
+
+    def test_process_local_index_expires(self):
+        ids = sampling.approved_question_ids(self.course.pk)
+        # Changed by another process: the token in this process is unchanged
+        Question.objects.filter(text="Frage 0").update(status="PENDING")
+        self.assertIs(sampling.approved_question_ids(self.course.pk), ids)
+
+        with mock.patch.object(
+            sampling.time,
+            "monotonic",
+            return_value=time.monotonic() + sampling.INDEX_MAX_AGE,
+        ):
+            ids = sampling.approved_question_ids(self.course.pk)
+        self.assertEqual(len(ids), self.QUESTION_COUNT - 1)
+
+
+class ImportQuestionsTests(QuizTestCase):
+    def import_file(self, content, suffix, *args):
+        with tempfile.NamedTemporaryFile(
+            "w", suffix=suffix, encoding="utf-8", delete=False
+        ) as file:
+            file.write(content)
+        self.addCleanup(os.remove, file.name)
+
+        stdout, stderr = StringIO(), StringIO()
+        call_command("import_questions", file.name, *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_csv_import_with_row_errors(self):
+        content = (
+            "course,text,explanation,answer_1,answer_2,answer_3,answer_4,correct\n"
+            "ISEF01,Was ist 1+1?,Grundrechnen,1,2,3,4,2\n"
+            "ISEF01,Ohne richtige Antwort,,a,b,,,\n"
+            "UNBEKANNT,Falscher Kurs,,a,b,,,1\n"
+            f"ISEF01,{'x' * 501},,a,b,,,1\n"
+        )
+        stdout, stderr = self.import_file(
+            content, ".csv", "--creator", "host", "--batch-size", "1"
+        )
+
+        self.assertIn("Imported 1 questions.", stdout)
+        self.assertIn("Line 3: answers: Bitte markieren Sie genau eine Antwort", stderr)
+        self.assertIn("Line 4: course: Unbekannter Kurs 'UNBEKANNT'", stderr)
+        self.assertIn("Line 5: text: Der Fragentext darf maximal 500 Zeichen", stderr)
+
+        question = Question.objects.get(text="Was ist 1+1?")
+        self.assertEqual(question.status, "PENDING")
+        self.assertEqual(question.creator, self.host)
+        self.assertEqual(question.course, self.course)
+        self.assertEqual(
+            list(question.answers.order_by("id").values_list("text", "is_correct")),
+            [("1", False), ("2", True), ("3", False), ("4", False)],
+        )
+
+    def test_jsonl_import_approved(self):
+        content = "\n".join(
+            json.dumps(
+                {
+                    "text": f"Importierte Frage {i}",
+                    "answers": [
+                        {"text": "Richtig", "is_correct": True},
+                        {"text": "Falsch"},
+                    ],
+                }
+            )
+            for i in range(3)
+        )
+        content += "\n{kein json\n"
+        stdout, stderr = self.import_file(
+            content, ".jsonl", "--course", "ISEF01", "--status", "APPROVED"
+        )
+
+        self.assertIn("Imported 3 questions.", stdout)
+        self.assertIn("Line 4: Ungültiges JSON", stderr)
+        self.assertEqual(
+            len(sampling.approved_question_ids(self.course.pk)),
+            self.QUESTION_COUNT + 3,
+        )
+
+    def test_dry_run_imports_nothing(self):
+        content = (
+            "course,text,explanation,answer_1,answer_2,answer_3,answer_4,correct\n"
+            "ISEF01,Was ist 1+1?,,1,2,,,2\n"
+        )
+        stdout, stderr = self.import_file(content, ".csv", "--dry-run")
+
+        self.assertIn("1 valid and 0 invalid questions.", stdout)
+        self.assertFalse(Question.objects.filter(text="Was ist 1+1?").exists())
+
+    def test_non_utf8_file_is_an_error(self):
+        with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as file:
+            file.write(
+                "course,text,explanation,answer_1,answer_2,answer_3,answer_4,correct\n"
+                "ISEF01,Was ist größer?,,1,2,,,2\n".encode("latin-1")
+            )
+        self.addCleanup(os.remove, file.name)
+
+        with self.assertRaisesMessage(CommandError, "is not UTF-8 encoded"):
+            call_command("import_questions", file.name, stdout=StringIO())
+
+
+class ExportQuestionsTests(QuizTestCase):
+    def test_export_is_staff_only(self):
+        response = self.client.get(reverse("export_questions"))
+        self.assertEqual(response.status_code, 302)
+
+    def test_jsonl_export_streams_answers(self):
+        self.host.is_staff = True
+        self.host.save()
+
+        response = self.client.get(
+            reverse("export_questions"), {"format": "jsonl", "status": "APPROVED"}
+        )
+        self.assertEqual(
+            response["Content-Type"], "application/x-ndjson; charset=utf-8"
+        )
+        records = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).decode().splitlines()
+        ]
+        self.assertEqual(len(records), self.QUESTION_COUNT)
+        self.assertEqual(
+            records[0]["answers"],
+            [
+                {"text": "Richtig", "is_correct": True},
+                {"text": "Falsch", "is_correct": False},
+            ],
+        )
+
+    async def test_export_streams_under_asgi(self):
+        await User.objects.filter(pk=self.host.pk).aupdate(is_staff=True)
+        await self.async_client.aforce_login(self.host)
+
+        with mock.patch.object(question_io, "EXPORT_CHUNK_SIZE", 5):
+            response = await self.async_client.get(
+                reverse("export_questions"), {"format": "jsonl"}
+            )
+            self.assertTrue(response.is_async)
+            lines = [line async for line in response.streaming_content]
+        self.assertEqual(len(lines), self.QUESTION_COUNT)
+        self.assertEqual(json.loads(lines[0])["text"], "Frage 0")
+
+    def test_unknown_status_is_rejected(self):
+        self.host.is_staff = True
+        self.host.save()
+
+        response = self.client.get(
+            reverse("export_questions"), {"status": 'APPROVED"; x="'}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertNotIn("Content-Disposition", response)
+
+    def test_answers_beyond_the_form_limit_are_exported(self):
+        question = Question.objects.create(
+            course=self.course, text="Fünf Antworten", status="APPROVED"
+        )
+        for i in range(1, 5):
+            Answer.objects.create(question=question, text=f"Falsch {i}")
+        Answer.objects.create(question=question, text="Richtig", is_correct=True)
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "bank.csv")
+            call_command(
+                "export_questions",
+                "--output",
+                path,
+                stdout=StringIO(),
+                stderr=StringIO(),
+            )
+            with open(path, encoding="utf-8", newline="") as file:
+                rows = list(csv.DictReader(file))
+            self.assertEqual(
+                (rows[-1]["answer_5"], rows[-1]["correct"]), ("Richtig", "5")
+            )
+            self.assertEqual(rows[0]["answer_5"], "")
+
+            # The import reports the question instead of dropping the correct answer
+            Question.objects.all().delete()
+            stderr = StringIO()
+            call_command("import_questions", path, stdout=StringIO(), stderr=stderr)
+
+        self.assertIn("Es sind maximal 4 Antworten erlaubt.", stderr.getvalue())
+        self.assertFalse(Question.objects.filter(text="Fünf Antworten").exists())
+        self.assertEqual(Question.objects.count(), self.QUESTION_COUNT)
+
+    def test_export_can_be_imported_again(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "bank.csv")
+            call_command(
+                "export_questions",
+                "--output",
+                path,
+                stdout=StringIO(),
+                stderr=StringIO(),
+            )
+            Question.objects.all().delete()
+            call_command(
+                "import_questions", path, "--status", "APPROVED", stdout=StringIO()
+            )
+
+        self.assertEqual(
+            Question.objects.filter(course=self.course).count(), self.QUESTION_COUNT
+        )
+        self.assertEqual(
+            Answer.objects.filter(is_correct=True).count(), self.QUESTION_COUNT
+        )
+
+
+class AdminTests(QuizTestCase):
+    def setUp(self):
+        super().setUp()
+        self.host.is_staff = self.host.is_superuser = True
+        self.host.save()
+
+    def test_change_lists_of_large_tables(self):
+        join_code = self.create_game()
+        self.add_player(join_code, "guest")
+        self.start_game(join_code)
+        self.client.post(
+            reverse(
+                "submit_answer", args=[join_code, self.current_answer(join_code).pk]
+            )
+        )
+
+        # The budgets don't depend on the number of rows
+        for model, budget in (
+            ("question", 12),
+            ("gamesession", 12),
+            ("gameparticipant", 7),
+            ("teamgameanswer", 11),
+        ):
+            with self.subTest(model=model), self.assertMaxQueries(budget):
+                response = self.client.get(reverse(f"admin:quiz_{model}_changelist"))
+                self.assertEqual(response.status_code, 200)
+
+        game_session = GameSession.objects.get(join_code=join_code)
+        for url in (
+            reverse("admin:quiz_gamesession_change", args=[game_session.pk]),
+            reverse(
+                "admin:quiz_question_change", args=[game_session.current_question_id]
+            ),
+        ):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_estimated_count(self):
+        Question.objects.filter(text="Frage 5").delete()
+        questions = Question.objects.order_by("pk")
+
+        with mock.patch.object(pagination, "ESTIMATE_THRESHOLD", 0):
+            # Unfiltered: the range of ids, including the deleted question
+            paginator = pagination.EstimatedCountPaginator(questions, 5)
+            self.assertEqual(paginator.count, self.QUESTION_COUNT)
+            self.assertEqual(paginator.num_pages, 3)
+
+            # Filtered: counted exactly
+            paginator = pagination.EstimatedCountPaginator(
+                questions.filter(status="APPROVED"), 5
+            )
+            self.assertEqual(paginator.count, self.QUESTION_COUNT - 1)
+
+        # Small tables are always counted
+        self.assertEqual(
+            pagination.EstimatedCountPaginator(questions, 5).count,
+            self.QUESTION_COUNT - 1,
+        )
+
+    def test_date_hierarchy_uses_the_days_with_rows(self):
+        now = timezone.now()
+        Question.objects.filter(text="Frage 0").update(
+            created_at=now - timedelta(days=40)
+        )
+        Question.objects.filter(text="Frage 1").update(
+            created_at=now - timedelta(days=400)
+        )
+
+        for kind in ("year", "month", "day"):
+            with self.subTest(kind=kind):
+                self.assertEqual(
+                    list(
+                        IndexedDateQuerySet(Question).datetimes(
+                            "created_at", kind, "DESC"
+                        )
+                    ),
+                    list(Question.objects.datetimes("created_at", kind, "DESC")),
+                )
+
+        response = self.client.get(
+            reverse("admin:quiz_question_changelist"),
+            {"created_at__year": now.year, "created_at__month": now.month},
+        )
+        self.assertContains(response, f"?created_at__day={now.day}")
+
+
+class SearchTests(QuizTestCase):
+    def test_index_follows_saves_updates_and_deletes(self):
+        question = Question.objects.create(text="Was ist Polymorphie?")
+        self.assertQuerySetEqual(
+            search.filter_questions(Question.objects.all(), "polymorph"), [question]
+        )
+
+        question.text = "Was ist Vererbung?"
+        question.save()
+        self.assertFalse(search.filter_questions(Question.objects.all(), "polymorph"))
+        self.assertTrue(search.filter_questions(Question.objects.all(), "vererb"))
+
+        Question.objects.bulk_create([Question(text="Überladung und Polymorphie")])
+        Question.objects.filter(pk=question.pk).delete()
+        self.assertQuerySetEqual(
+            search.filter_questions(Question.objects.all(), "uberladung"),
+            ["Überladung und Polymorphie"],
+            transform=str,
+        )
+        self.assertFalse(search.filter_questions(Question.objects.all(), "vererbung"))
+
+    def test_matches_in_the_text_rank_first(self):
+        in_explanation = Question.objects.create(
+            creator=self.host, text="Was gibt Python aus?", explanation="Rekursion"
+        )
+        in_text = Question.objects.create(
+            creator=self.host, text="Was ist Rekursion?", explanation="Eine Funktion"
+        )
+        Question.objects.create(creator=self.player, text="Rekursion und Iteration")
+
+        results = search.ranked_questions(
+            Question.objects.filter(creator=self.host), "rekursion", limit=10
+        )
+        self.assertEqual(results, [in_text, in_explanation])
+
+    def test_operators_are_searched_as_words(self):
+        Question.objects.create(text="Was bedeutet NOT in SQL?")
+        for term in ('NOT "sql', "sql*", "(", ""):
+            with self.subTest(term=term):
+                search.filter_questions(Question.objects.all(), term).count()
+
+    def test_my_questions_search(self):
+        with self.assertMaxQueries(5):
+            response = self.client.get(reverse("my_questions"), {"q": "Frage 1"})
+        self.assertEqual(
+            sorted(question.text for question in response.context["search_results"]),
+            ["Frage 1", "Frage 10", "Frage 11"],
+        )
+        self.assertContains(response, "Status: Approved", count=3)
+
+    def test_admin_search(self):
+        self.host.is_staff = self.host.is_superuser = True
+        self.host.save()
+
+        response = self.client.get(
+            reverse("admin:quiz_question_changelist"), {"q": "frage 11"}
+        )
+        self.assertEqual(
+            [question.text for question in response.context["cl"].result_list],
+            ["Frage 11"],
+        )
+
+        response = self.client.get(
+            reverse("admin:quiz_question_changelist"),
+            {"creator__id__exact": self.player.pk},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.context["cl"].result_list)
+
+    def test_fallback_without_index(self):
+        with mock.patch.object(search, "is_available", return_value=False):
+            results = search.ranked_questions(Question.objects.all(), "frage 1", 10)
+        self.assertEqual(len(results), 3)
+
+
+class SimilarityTests(QuizTestCase):
+    TEXT = "Was ist der Unterschied zwischen einer Liste und einem Tupel in Python?"
+    ANSWERS = ["Tupel sind unveränderlich", "Listen sind schneller", "Kein Unterschied"]
+
+    def setUp(self):
+        super().setUp()
+        self.original = Question.objects.create(
+            course=self.course, creator=self.player, text=self.TEXT, status="APPROVED"
+        )
+        for i, text in enumerate(self.ANSWERS):
+            Answer.objects.create(question=self.original, text=text, is_correct=i == 0)
+        similarity.index_questions(Question.objects.all())
+
+    def form_data(self, text, course=None, **extra):
+        data = {
+            "course": (course or self.course).pk,
+            "text": text,
+            "explanation": "",
+            "answers-TOTAL_FORMS": "4",
+            "answers-INITIAL_FORMS": "0",
+            "answers-MIN_NUM_FORMS": "0",
+            "answers-MAX_NUM_FORMS": "4",
+            **extra,
+        }
+        for i, answer in enumerate(self.ANSWERS):
+            data[f"answers-{i}-text"] = answer
+        data["answers-0-is_correct"] = "on"
+        return data
+
+    def test_signature_estimates_jaccard_similarity(self):
+        a = similarity.signature(self.TEXT, self.ANSWERS)
+        self.assertEqual(similarity.similarity(a, a), 1.0)
+        self.assertEqual(similarity.unpack(similarity.pack(a)), tuple(a))
+        # Case, accents, punctuation and the order of the answers don't matter
+        self.assertEqual(
+            similarity.signature(self.TEXT.upper().rstrip("?"), self.ANSWERS[::-1]), a
+        )
+        self.assertLess(
+            similarity.similarity(a, similarity.signature("Was ist eine Klasse?")), 0.2
+        )
+
+    def test_index_follows_saves(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            question = Question.objects.create(course=self.course, text=self.TEXT)
+            for text in self.ANSWERS:
+                Answer.objects.create(question=question, text=text)
+        self.assertEqual(question.similarity_buckets.count(), similarity.BANDS)
+        self.assertEqual(
+            [
+                question
+                for _, question in similarity.find_duplicates(
+                    self.course.pk, self.TEXT, self.ANSWERS
+                )
+            ],
+            [self.original, question],
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            question.text = "Was ist eine Klasse?"
+            question.save()
+        self.assertEqual(
+            [
+                question
+                for _, question in similarity.find_duplicates(
+                    self.course.pk, self.TEXT, self.ANSWERS
+                )
+            ],
+            [self.original],
+        )
+
+    def test_create_question_warns_about_duplicates(self):
+        text = self.TEXT.replace("Python", "Python 3")
+        with self.assertMaxQueries(9):
+            response = self.client.post(
+                reverse("create_question"), self.form_data(text)
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [question for _, question in response.context["duplicates"]],
+            [self.original],
+        )
+        self.assertContains(response, "confirm_duplicates")
+        self.assertFalse(Question.objects.filter(text=text).exists())
+
+        response = self.client.post(
+            reverse("create_question"), self.form_data(text, confirm_duplicates="1")
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Question.objects.filter(text=text).exists())
+
+    def test_duplicates_in_other_courses_are_allowed(self):
+        other_course = Course.objects.create(name="ISEF02")
+        response = self.client.post(
+            reverse("create_question"), self.form_data(self.TEXT, course=other_course)
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def test_update_question_ignores_itself(self):
+        self.original.creator = self.host
+        self.original.save()
+        response = self.client.post(
+            reverse("update_question", args=[self.original.pk]),
+            self.form_data(self.TEXT + " Erkläre."),
+        )
+        self.assertEqual(response.status_code, 302)
+
+    def test_admin_lists_duplicate_clusters(self):
+        self.host.is_staff = self.host.is_superuser = True
+        self.host.save()
+        pending = Question.objects.create(
+            course=self.course, text=self.TEXT.lower(), status="PENDING"
+        )
+        for text in self.ANSWERS:
+            Answer.objects.create(question=pending, text=text)
+        similarity.index_questions(Question.objects.filter(pk=pending.pk))
+
+        response = self.client.get(reverse("admin:quiz_question_duplicates"))
+        self.assertEqual(response.context["clusters"], [[self.original, pending]])
+
+        response = self.client.get(
+            reverse("admin:quiz_question_duplicates"), {"course": self.course.pk + 1}
+        )
+        self.assertEqual(response.context["clusters"], [])
+
+    def test_clusters_contain_a_pending_question(self):
+        copy = Question.objects.create(
+            course=self.course, text=self.TEXT, status="APPROVED"
+        )
+        for text in self.ANSWERS:
+            Answer.objects.create(question=copy, text=text)
+        unrelated = Question.objects.create(
+            course=self.course, text="Was ist ein Dekorator?", status="PENDING"
+        )
+        similarity.index_questions(
+            Question.objects.filter(pk__in=[copy.pk, unrelated.pk])
+        )
+
+        # The pending question shares a bucket with the approved duplicates,
+        # but is not similar to them
+        key = SimilarityBucket.objects.filter(question=self.original).first().key
+        SimilarityBucket.objects.create(question=unrelated, key=key)
+        pending = Question.objects.filter(status="PENDING")
+        self.assertEqual(similarity.duplicate_clusters(pending), [])
+
+        unrelated.status = "APPROVED"
+        unrelated.save()
+        copy.status = "PENDING"
+        copy.save()
+        self.assertEqual(
+            similarity.duplicate_clusters(pending), [[self.original, copy]]
+        )
+
+    def test_rebuild_command(self):
+        SimilarityBucket.objects.all().delete()
+        call_command("rebuild_similarity_index", stdout=StringIO())
+        self.assertEqual(
+            SimilarityBucket.objects.count(),
+            similarity.BANDS * Question.objects.count(),
+        )
+        self.assertTrue(
+            similarity.find_duplicates(self.course.pk, self.TEXT, self.ANSWERS)
+        )
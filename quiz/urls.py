@@ -1,6 +1,37 @@
+from django.conf import settings
 from django.urls import path
 from django.contrib.auth import views as auth_views
-from . import views
+from . import async_views, views
+
+
+def game_state_urls(game_views):
+    """
+    URLs of the pollers and of submit_answer, which exist as sync views and
+    as async views (quiz/async_views.py), see QUIZ_ASYNC_VIEWS.
+    """
+    return [
+        path(
+            "game/<str:join_code>/poll_lobby/",
+            game_views.poll_lobby_participants,
+            name="poll_lobby",
+        ),
+        path(
+            "game/<str:join_code>/poll_start/",
+            game_views.poll_game_start,
+            name="poll_game_start",
+        ),
+        path(
+            "game/<str:join_code>/state/",
+            game_views.game_state_poller,
+            name="game_state_poller",
+        ),
+        path(
+            "game/<str:join_code>/submit/<int:answer_pk>/",
+            game_views.submit_answer,
+            name="submit_answer",
+        ),
+    ]
+
 
 urlpatterns = [
     path("", views.home, name="home"),
@@ -20,29 +51,15 @@ urlpatterns = [
     path("my-questions/", views.my_question_list, name="my_questions"),
     path("question/new/", views.create_question, name="create_question"),
     path("question/<int:pk>/edit/", views.update_question, name="update_question"),
+    path("questions/export/", views.export_questions, name="export_questions"),
     path("game/create/", views.create_game_session, name="create_game"),
     path("game/join/", views.join_game_session, name="join_game"),
     path("game/<str:join_code>/lobby/", views.game_lobby, name="game_lobby"),
-    path(
-        "game/<str:join_code>/poll_lobby/",
-        views.poll_lobby_participants,
-        name="poll_lobby",
-    ),
-    path(
-        "game/<str:join_code>/poll_start/",
-        views.poll_game_start,
-        name="poll_game_start",
-    ),
+    *game_state_urls(async_views if settings.QUIZ_ASYNC_VIEWS else views),
     path("game/<str:join_code>/start/", views.start_game, name="start_game"),
     path("game/<str:join_code>/play/", views.game_view, name="game_view"),
-    path(
-        "game/<str:join_code>/state/", views.game_state_poller, name="game_state_poller"
-    ),
-    path(
-        "game/<str:join_code>/submit/<int:answer_pk>/",
-        views.submit_answer,
-        name="submit_answer",
-    ),
+    path("game/<str:join_code>/events/", views.game_events, name="game_events"),
     path("game/<str:join_code>/next/", views.next_question, name="next_question"),
     path("game/<str:join_code>/results/", views.game_results, name="game_results"),
+    path("leaderboard/", views.leaderboard_fragment, name="leaderboard"),
 ]
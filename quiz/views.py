@@ -1,7 +1,16 @@
-from django.http import HttpResponse, HttpResponseNotAllowed
+from functools import wraps
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import (
+    Http404,
+    HttpResponse,
+    HttpResponseBadRequest,
+    HttpResponseNotAllowed,
+    StreamingHttpResponse,
+)
 from django.shortcuts import get_object_or_404, render, redirect
 from django.contrib.auth import login
-from django.urls import reverse
 from .forms import (
     CustomerUserCreationForm,
     QuestionForm,
@@ -10,17 +19,36 @@ from .forms import (
     JoinGameForm,
 )
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.http import require_POST
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST
 from .models import (
     Course,
     Question,
     GameSession,
+    GameQuestion,
     GameParticipant,
-    TeamGameAnswer,
     Answer,
+    GameSummary,
+)
+from django.db import transaction
+from django.db.models import Count, Q
+from . import (
+    events,
+    fragments,
+    game_state,
+    gameplay,
+    leaderboard,
+    question_io,
+    question_stats,
+    sampling,
+    search,
+    similarity,
+    summaries,
 )
-from django.db.models import F
+from .pagination import keyset_page
 
 
 # HOMEPAGE
@@ -66,81 +94,172 @@ def register_view(request):
 
 
 # QUESTION SUBMISSION AND EDITING
+QUESTIONS_PER_PAGE = 25
+
+# Number of (ranked) results of a search in the question list
+SEARCH_RESULTS = 50
+
+# Sort options of the question list: (field, descending)
+QUESTION_SORTS = {
+    "-created_at": ("created_at", True),
+    "created_at": ("created_at", False),
+    "text": ("text", False),
+    "-text": ("text", True),
+}
+
+
 @login_required
 def my_question_list(request):
     """
     Displays a list of questions created by the logged-in user,
     with filtering, sorting, and grouping by status.
+    Each status group is paginated with keyset cursors. HTMX requests
+    with a "group" parameter return the next page of that group only.
+    A search ("q") shows the best matches of the full-text search instead.
     """
 
     status_filter = request.GET.get("status")
     course_filter = request.GET.get("course")
     sort_by = request.GET.get("sort_by", "-created_at")
+    search_query = request.GET.get("q", "").strip()
+
+    if sort_by not in QUESTION_SORTS:
+        sort_by = "-created_at"
+    sort_field, descending = QUESTION_SORTS[sort_by]
 
-    queryset = Question.objects.filter(creator=request.user)
+    queryset = Question.objects.filter(creator=request.user).select_related("course")
 
     if status_filter:
         queryset = queryset.filter(status=status_filter)
     if course_filter:
         queryset = queryset.filter(course_id=course_filter)
 
-    valid_sorts = ["created_at", "-created_at", "text", "-text"]
-    if sort_by in valid_sorts:
-        queryset = queryset.order_by(sort_by)
-    else:
-        queryset = queryset.order_by("-created_at")
-
-    grouped_questions = {}
-    total_questions_found = 0
-
-    if status_filter:
-        statuses_to_show = [s for s in Question.STATUS_CHOICES if s[0] == status_filter]
-    else:
-        statuses_to_show = Question.STATUS_CHOICES
-
-    for code, name in statuses_to_show:
-        questions_in_group = queryset.filter(status=code)
-
-        if questions_in_group.exists():
-            grouped_questions[code] = {"name": name, "questions": questions_in_group}
-            total_questions_found += questions_in_group.count()
-
     context = {
-        "grouped_questions": grouped_questions,
         "all_courses": Course.objects.all(),
         "status_choices": Question.STATUS_CHOICES,
         "current_filters": {
             "status": status_filter,
             "course": course_filter,
             "sort_by": sort_by,
+            "q": search_query,
         },
-        "total_questions_found": total_questions_found,
     }
 
+    if search_query:
+        context["search_results"] = search.ranked_questions(
+            queryset, search_query, SEARCH_RESULTS
+        )
+        return render(request, "quiz/my_questions.html", context)
+
+    def get_page(code, cursor=None):
+        """
+        Returns the questions of a status group and the query string of the next page.
+        """
+        questions, next_cursor = keyset_page(
+            queryset.filter(status=code),
+            sort_field,
+            descending,
+            cursor,
+            QUESTIONS_PER_PAGE,
+        )
+        next_query = None
+        if next_cursor:
+            params = request.GET.copy()
+            params["group"] = code
+            params["cursor"] = next_cursor
+            next_query = params.urlencode()
+        return questions, next_query
+
+    # "Load more" of a single status group
+    group = request.GET.get("group")
+    if request.htmx and group:
+        questions, next_query = get_page(group, request.GET.get("cursor"))
+        return render(
+            request,
+            "quiz/partials/_my_questions_rows.html",
+            {"questions": questions, "next_query": next_query},
+        )
+
+    if status_filter:
+        statuses_to_show = [s for s in Question.STATUS_CHOICES if s[0] == status_filter]
+    else:
+        statuses_to_show = Question.STATUS_CHOICES
+
+    # Count the questions of all status groups in a single query
+    counts = queryset.aggregate(
+        **{code: Count("pk", filter=Q(status=code)) for code, name in statuses_to_show}
+    )
+
+    grouped_questions = {}
+    for code, name in statuses_to_show:
+        if counts[code]:
+            questions, next_query = get_page(code)
+            grouped_questions[code] = {
+                "name": name,
+                "count": counts[code],
+                "questions": questions,
+                "next_query": next_query,
+            }
+
+    context["grouped_questions"] = grouped_questions
+    context["total_questions_found"] = sum(counts.values())
     return render(request, "quiz/my_questions.html", context)
 
 
+def _find_duplicates(request, question_form, answer_formset, exclude=None):
+    """
+    Returns the near-duplicates of a submitted question in its course
+    (see quiz/similarity.py), unless the user confirmed to save it anyway.
+    """
+    if request.POST.get("confirm_duplicates"):
+        return []
+
+    course = question_form.cleaned_data.get("course")
+    answers = [
+        form.cleaned_data["text"]
+        for form in answer_formset.forms
+        if form.cleaned_data.get("text")
+    ]
+    duplicates = similarity.find_duplicates(
+        course.pk if course else None,
+        question_form.cleaned_data["text"],
+        answers,
+        exclude=exclude,
+    )
+    if duplicates:
+        messages.warning(
+            request, "Es gibt bereits sehr ähnliche Fragen. Bitte prüfe sie zuerst."
+        )
+    return duplicates
+
+
 @login_required
 def create_question(request):
     """
     View to create a new question and their answers.
+    Warns about near-duplicates in the same course before saving.
     """
+    duplicates = []
 
     if request.method == "POST":
         question_form = QuestionForm(request.POST)
         answer_formset = AnswerFormSet(request.POST)
 
         if question_form.is_valid() and answer_formset.is_valid():
-            question = question_form.save(commit=False)
-            question.creator = request.user
-            question.status = "PENDING"
-            question.save()
-
-            answer_formset.instance = question
-            answer_formset.save()
-
-            messages.success(request, "Frage erfolgreich erstellt!")
-            return redirect("my_questions")
+            duplicates = _find_duplicates(request, question_form, answer_formset)
+            if not duplicates:
+                # One transaction, so the similarity index is updated once
+                with transaction.atomic():
+                    question = question_form.save(commit=False)
+                    question.creator = request.user
+                    question.status = "PENDING"
+                    question.save()
+
+                    answer_formset.instance = question
+                    answer_formset.save()
+
+                messages.success(request, "Frage erfolgreich erstellt!")
+                return redirect("my_questions")
         else:
             # Add error messages to help debug
             if not question_form.is_valid():
@@ -162,6 +281,7 @@ def create_question(request):
         {
             "question_form": question_form,
             "answer_formset": answer_formset,
+            "duplicates": duplicates,
             "page_title": "Neue Frage erstellen",
         },
     )
@@ -171,7 +291,9 @@ def create_question(request):
 def update_question(request, pk):
     """
     View to update an existing question and its answers.
+    Warns about near-duplicates in the same course before saving.
     """
+    duplicates = []
 
     question = get_object_or_404(Question, pk=pk, creator=request.user)
 
@@ -185,10 +307,15 @@ def update_question(request, pk):
         answer_formset = AnswerFormSet(request.POST, instance=question)
 
         if question_form.is_valid() and answer_formset.is_valid():
-            question_form.save()
-            answer_formset.save()
-            messages.success(request, "Frage erfolgreich aktualisiert!")
-            return redirect("my_questions")
+            duplicates = _find_duplicates(
+                request, question_form, answer_formset, exclude=question.pk
+            )
+            if not duplicates:
+                with transaction.atomic():
+                    question_form.save()
+                    answer_formset.save()
+                messages.success(request, "Frage erfolgreich aktualisiert!")
+                return redirect("my_questions")
         else:
             # Add error messages to help debug
             if not question_form.is_valid():
@@ -210,11 +337,48 @@ def update_question(request, pk):
         {
             "question_form": question_form,
             "answer_formset": answer_formset,
+            "duplicates": duplicates,
             "page_title": f"Frage '{question.text[:20]}...' bearbeiten",
         },
     )
 
 
+# QUESTION BANK EXPORT
+@staff_member_required
+def export_questions(request):
+    """
+    Streams all questions (optionally of one course and status) with their
+    answers as CSV or JSON Lines, see quiz/question_io.py. Staff only.
+    """
+    file_format = request.GET.get("format", "csv")
+    if file_format not in question_io.FORMATS:
+        raise Http404("Unknown export format.")
+
+    questions = Question.objects.all()
+    course_filter = request.GET.get("course")
+    status_filter = request.GET.get("status")
+    # The status is also part of the file name, so only known codes are used
+    if status_filter and status_filter not in dict(Question.STATUS_CHOICES):
+        return HttpResponseBadRequest("Unknown status.")
+    if course_filter:
+        if not course_filter.isdigit():
+            raise Http404("Unknown course.")
+        questions = questions.filter(course_id=course_filter)
+    if status_filter:
+        questions = questions.filter(status=status_filter)
+
+    lines = question_io.export_questions(questions, file_format)
+    if isinstance(request, ASGIRequest):
+        lines = question_io.aiter_export(lines)
+    response = StreamingHttpResponse(
+        lines,
+        content_type=f"{question_io.CONTENT_TYPES[file_format]}; charset=utf-8",
+    )
+    filename = "-".join(["questions", *filter(None, [course_filter, status_filter])])
+    response["Content-Disposition"] = f'attachment; filename="{filename}.{file_format}"'
+    return response
+
+
 # GAME SESSION LOGIC
 QUESTIONS_PER_GAME = 10
 
@@ -233,34 +397,35 @@ def create_game_session(request):
     if form.is_valid():
         course = form.cleaned_data["course"]
 
-        # 1. Check if there are enough questions in the selected course
-        questions = Question.objects.filter(
-            course=course,
-            status="APPROVED",
-        )
+        # 1. Choose random questions for the game session
+        #    (None if there are not enough questions in the selected course)
+        selected_questions = sampling.sample_questions(course, QUESTIONS_PER_GAME)
 
-        if questions.count() < QUESTIONS_PER_GAME:
+        if selected_questions is None:
             messages.error(
                 request,
                 f"Fehler: Der Kurs '{course.name}' hat nicht genügend freigegebene Fragen (mindestens {QUESTIONS_PER_GAME} benötigt). Bitte wählen Sie einen anderen Kurs oder erstellen Sie mehr Fragen.",
             )
             return redirect("home")
 
-        # 2. Choose random questions for the game session
-        selected_questions = questions.order_by("?")[:QUESTIONS_PER_GAME]
-
-        # 3. Create the game session (model generates unique join code)
+        # 2. Create the game session (the join code is allocated by quiz/join_codes.py)
+        #    and store the questions in the order they will be played
         game_session = GameSession.objects.create(
             course=course,
             game_mode="COOP",
             status="LOBBY",
+            question_count=len(selected_questions),
         )
-        game_session.questions.set(selected_questions)
+        GameQuestion.objects.bulk_create(
+            GameQuestion(session=game_session, question=question, position=position)
+            for position, question in enumerate(selected_questions)
+        )
+        question_stats.create_missing(selected_questions)
 
-        # 4. Add the creating user as a participant
+        # 3. Add the creating user as a participant
         GameParticipant.objects.create(session=game_session, user=request.user)
 
-        # 5. Redirect to the game lobby
+        # 4. Redirect to the game lobby
         messages.success(
             request,
             f"Spiel-Lobby für Kurs '{course.name}' wurde erstellt.",
@@ -300,7 +465,12 @@ def join_game_session(request):
 
         # 2. Add the user as a participant if not already joined
         # get_or_create prevents duplicate entries
-        GameParticipant.objects.get_or_create(session=game_session, user=request.user)
+        participant, created = GameParticipant.objects.get_or_create(
+            session=game_session, user=request.user
+        )
+        if created:
+            game_session.update_state()
+            gameplay.state_changed(game_session, events.EVENT_JOIN)
 
         # 3. Redirect to the game lobby
         messages.success(
@@ -334,54 +504,99 @@ def game_lobby(request, join_code):
         )
         return redirect("home")
 
-    host_participant = game_session.participants.first()
-    is_host = host_participant.user == request.user
+    # Read the state before the participants, so its ETag is never newer than the list
+    snapshot = game_state.get_snapshot(game_session.join_code)
+    participants = list(game_session.participants.select_related("user").order_by("id"))
+    host_user_id = participants[0].user_id
 
     return render(
         request,
         "quiz/game_lobby.html",
         {
             "game_session": game_session,
-            "is_host": is_host,
+            "participants": participants,
+            "is_host": host_user_id == request.user.pk,
+            "host_user_id": host_user_id,
+            "last_participant_id": participants[-1].pk,
+            "etag": gameplay.state_etag(snapshot),
+            "poll_interval": game_state.poll_interval(snapshot),
+            "sse_enabled": settings.QUIZ_SSE_ENABLED,
         },
     )
 
 
+def session_state_etag(request, join_code):
+    """
+    ETag of a game session's current state.
+    """
+    return gameplay.state_etag(gameplay.get_snapshot(request, join_code))
+
+
+def participant_state_etag(request, join_code):
+    """
+    ETag of a game session's current state, if the user is a participant.
+    """
+    snapshot = gameplay.get_snapshot(request, join_code)
+    return gameplay.participant_state_etag(snapshot, request.user)
+
+
+def adaptive_polling(view_func):
+    """
+    Adds the seconds until the next poll (0: stop polling) to the responses
+    of a poller view.
+    """
+
+    @wraps(view_func)
+    def wrapper(request, join_code, *args, **kwargs):
+        response = view_func(request, join_code, *args, **kwargs)
+        snapshot = gameplay.get_snapshot(request, join_code)
+        return gameplay.add_poll_interval(response, snapshot)
+
+    return wrapper
+
+
 @login_required
+@cache_control(private=True, no_cache=True)
+@adaptive_polling
+@condition(etag_func=session_state_etag)
 def poll_lobby_participants(request, join_code):
     """
-    Endpoint to poll the current list of participants in the game lobby.
-    Returns a partial HTML list for HTMX.
+    Endpoint to poll the participants that joined the game lobby after the
+    last participant the client shows (the "after" parameter).
+    Returns a new poller and the new participants as out-of-band list items,
+    so a poll costs one query and only sends the changes.
     """
-    game_session = get_object_or_404(
-        GameSession,
-        join_code=join_code.upper(),
+    # Read the state before the participants, so its ETag is never newer than the list
+    snapshot = gameplay.check_snapshot(gameplay.get_snapshot(request, join_code))
+    after = gameplay.lobby_after(request)
+
+    participants = list(
+        GameParticipant.objects.filter(session_id=snapshot["session_id"], pk__gt=after)
+        .select_related("user")
+        .order_by("id")
     )
 
     return render(
         request,
-        "quiz/partials/_lobby_participants_list.html",
-        {
-            "game_session": game_session,
-        },
+        "quiz/partials/_lobby_participants_delta.html",
+        gameplay.lobby_delta_context(
+            snapshot, participants, after, settings.QUIZ_SSE_ENABLED
+        ),
     )
 
 
 # GAMEPLAY LOGIC
 @login_required
+@cache_control(private=True, no_cache=True)
+@adaptive_polling
+@condition(etag_func=session_state_etag)
 def poll_game_start(request, join_code):
     """
     Endpoint to poll whether the game has started.
     """
 
-    game_session = get_object_or_404(GameSession, join_code=join_code.upper())
-
-    if game_session.status == "ACTIVE":
-        response = HttpResponse()
-        response["HX-Redirect"] = reverse("game_view", args=[join_code])
-        return response
-
-    return HttpResponse()
+    snapshot = gameplay.check_snapshot(gameplay.get_snapshot(request, join_code))
+    return gameplay.game_start_response(snapshot, join_code)
 
 
 @login_required
@@ -402,17 +617,30 @@ def start_game(request, join_code):
         messages.error(request, "Nur der Gastgeber kann das Spiel starten.")
         return redirect("game_lobby", join_code=join_code)
 
-    first_question = game_session.questions.order_by("id").first()
+    first_question_id = (
+        GameQuestion.objects.filter(session=game_session, position=0)
+        .values_list("question_id", flat=True)
+        .first()
+    )
 
-    if not first_question:
+    if not first_question_id:
         messages.error(
             request, "Fehler: Keine Fragen für diese Spiel-Sitzung gefunden."
         )
         return redirect("home")
 
-    game_session.status = "ACTIVE"
-    game_session.current_question = first_question
-    game_session.save()
+    # Of simultaneous requests (e.g. a double click), only the first starts
+    started = game_session.update_state(
+        expected={"status": "LOBBY"},
+        status="ACTIVE",
+        current_question_id=first_question_id,
+        current_position=0,
+    )
+    if started:
+        question_stats.record_served(first_question_id)
+        gameplay.state_changed(
+            game_session, events.EVENT_QUESTION, question=first_question_id
+        )
 
     return redirect("game_view", join_code=join_code)
 
@@ -424,9 +652,11 @@ def game_view(request, join_code):
     Renders Template which includes HTMX calls for dynamic updates.
     """
 
-    game_session = get_object_or_404(
-        GameSession, join_code=join_code.upper(), participants__user=request.user
+    game_session = GameSession.objects.filter(participants__user=request.user).current(
+        join_code
     )
+    if game_session is None:
+        raise Http404("No game session found for this user.")
 
     if game_session.status == "FINISHED":
         return redirect("game_results", join_code=join_code)
@@ -434,81 +664,69 @@ def game_view(request, join_code):
     if game_session.status == "LOBBY":
         return redirect("game_lobby", join_code=join_code)
 
-    return render(request, "quiz/game_view.html", {"game_session": game_session})
+    return render(
+        request,
+        "quiz/game_view.html",
+        {
+            "game_session": game_session,
+            "sse_enabled": settings.QUIZ_SSE_ENABLED,
+        },
+    )
 
 
 @login_required
-def game_state_poller(request, join_code):
+async def game_events(request, join_code):
     """
-    Endpoint to poll the current game state and question.
-    Returns partial HTML for HTMX updates.
+    Server-sent events stream for a game session (opt-in via QUIZ_SSE_ENABLED).
+    Pushes an event whenever a player joins, the game starts, a question is
+    answered, the next question is shown or the game finishes.
+    Should be served through ASGI (quizsystem/asgi.py), as every open stream
+    would otherwise block a worker thread.
     """
 
-    game_session = get_object_or_404(
-        GameSession, join_code=join_code.upper(), participants__user=request.user
-    )
+    if not settings.QUIZ_SSE_ENABLED:
+        raise Http404("Live updates are disabled.")
 
-    # 1. If game is finished, redirect to results
-    if game_session.status == "FINISHED":
-        response = HttpResponse()
-        response["HX-Redirect"] = reverse("game_results", args=[join_code])
-        return response
+    join_code = join_code.upper()
+    user = await request.auser()
 
-    # 2. Check if current question is already answered by participants
-    current_question = game_session.current_question
+    game_session = await GameSession.objects.acurrent(join_code)
+    if (
+        game_session is None
+        or not await game_session.participants.filter(user=user).aexists()
+    ):
+        raise Http404("No game session found for this user.")
 
-    try:
-        team_answer = TeamGameAnswer.objects.get(
-            session=game_session,
-            question=current_question,
-        )
-        return render(
-            request,
-            "quiz/partials/_question_result.html",
-            {
-                "game_session": game_session,
-                "question": current_question,
-                "team_answer": team_answer,
-                "answered_by_user": (
-                    team_answer.answered_by.username
-                    if team_answer.answered_by
-                    else "jemand"
-                ),
-            },
-        )
-    except TeamGameAnswer.DoesNotExist:
-        # 3. Question not yet answered, show question
+    response = StreamingHttpResponse(
+        events.stream(join_code), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # Disable proxy buffering (e.g. nginx)
+    return response
 
-        all_questions = list(
-            game_session.questions.order_by("id").values_list("id", flat=True)
-        )
-        progress_percentage = 0  # Default value
 
-        try:
-            current_index = all_questions.index(current_question.id)
-            question_number = current_index + 1
-            total_questions = len(all_questions)
+@login_required
+@cache_control(private=True, no_cache=True)
+@adaptive_polling
+@condition(etag_func=participant_state_etag)
+def game_state_poller(request, join_code):
+    """
+    Endpoint to poll the current game state and question.
+    Returns partial HTML for HTMX updates.
+    """
 
-            # Calculate percentage for progress bar
-            if total_questions > 0:
-                progress_percentage = ((question_number - 1) * 100) / total_questions
+    snapshot = gameplay.check_snapshot(
+        gameplay.get_snapshot(request, join_code), user=request.user
+    )
 
-        except (ValueError, AttributeError):
-            question_number = "?"
-            total_questions = "?"
-            progress_percentage = 0  # Fallback
+    # 1. If game is finished, redirect to results
+    if snapshot["status"] == "FINISHED":
+        return gameplay.hx_redirect("game_results", join_code)
 
-        return render(
-            request,
-            "quiz/partials/_game_question.html",
-            {
-                "game_session": game_session,
-                "question": current_question,
-                "question_number": question_number,
-                "total_questions": total_questions,
-                "progress_percentage": progress_percentage,  # <-- Pass the new variable
-            },
-        )
+    # 2. Show the result of the current question once it is answered,
+    #    otherwise the question
+    template_name, get_context = gameplay.question_fragment(snapshot)
+    return fragments.render_fragment(request, template_name, snapshot, get_context)
 
 
 @login_required
@@ -527,35 +745,19 @@ def submit_answer(request, join_code, answer_pk):
     current_question = game_session.current_question
     selected_answer = get_object_or_404(Answer, pk=answer_pk, question=current_question)
 
-    team_answer, created = TeamGameAnswer.objects.get_or_create(
-        session=game_session,
-        question=current_question,
-        defaults={
-            "selected_answer": selected_answer,
-            "answered_by": request.user,
-            "is_correct": selected_answer.is_correct,
-        },
+    team_answer, claimed = gameplay.claim_answer(
+        game_session, current_question, selected_answer, request.user
     )
-
-    if created and team_answer.is_correct:
-        GameParticipant.objects.filter(session=game_session).update(
-            score=F("score") + 10
+    if claimed:
+        gameplay.state_changed(
+            game_session, events.EVENT_ANSWER, question=current_question.id
         )
 
     # Render the question result to the user that submitted the answer, after 3 seconds HTMX will poll for the others
     return render(
         request,
         "quiz/partials/_question_result.html",
-        {
-            "game_session": game_session,
-            "question": current_question,
-            "team_answer": team_answer,
-            "answered_by_user": (
-                team_answer.answered_by.username
-                if team_answer.answered_by
-                else "jemand"
-            ),
-        },
+        gameplay.answer_result_context(game_session, current_question, team_answer),
     )
 
 
@@ -571,42 +773,126 @@ def next_question(request, join_code):
     game_session = get_object_or_404(
         GameSession, join_code=join_code.upper(), status="ACTIVE"
     )
-    current_question = game_session.current_question
-
-    all_questions = list(game_session.questions.order_by("id"))
+    next_position = game_session.current_position + 1
+    next_question_id = None
+
+    if next_position < game_session.question_count:
+        next_question_id = (
+            GameQuestion.objects.filter(session=game_session, position=next_position)
+            .values_list("question_id", flat=True)
+            .first()
+        )
 
-    try:
-        current_index = all_questions.index(current_question)
-        next_question = all_questions[current_index + 1]
+    if next_question_id:
+        # Of simultaneous requests (e.g. a double click), only the first advances
+        advanced = game_session.update_state(
+            expected={
+                "status": "ACTIVE",
+                "current_position": game_session.current_position,
+            },
+            current_question_id=next_question_id,
+            current_position=next_position,
+        )
+        if advanced:
+            question_stats.record_served(next_question_id)
+            gameplay.state_changed(
+                game_session, events.EVENT_NEXT, question=next_question_id
+            )
 
-        game_session.current_question = next_question
-        game_session.save()
+    else:
+        # The results are stored together with the end of the game, by the
+        # first of simultaneous requests only
+        with transaction.atomic():
+            finished = game_session.update_state(
+                expected={"status": "ACTIVE"},
+                status="FINISHED",
+                current_question=None,
+                current_position=None,
+            )
+            if finished:
+                summaries.create_summary(game_session)
+                leaderboard.record_game(game_session)
 
-    except (ValueError, IndexError):
-        game_session.status = "FINISHED"
-        game_session.current_question = None
-        game_session.save()
+        if finished:
+            gameplay.state_changed(game_session, events.EVENT_FINISH)
 
-        response = HttpResponse()
-        response["HX-Redirect"] = reverse("game_results", args=[join_code])
-        return response
+        return gameplay.hx_redirect("game_results", join_code)
 
     return HttpResponse(
         '<div class="text-center p-10"><h2 class="text-2x1 font-semibold text-gray-700">Lade nächste Frage...</h2></div>   '
     )
 
 
+# Finished games never change, so the browser may keep their results page
+RESULTS_MAX_AGE = 60 * 60 * 24 * 30
+
+
 @login_required
 def game_results(request, join_code):
     """
     Displays the results of the finished game session.
+    The page is rendered from the stored summary of the game. It never changes,
+    so it is served with a strong ETag and may be cached by the browser.
     """
 
-    game_session = get_object_or_404(
-        GameSession,
-        join_code=join_code,
-        status="FINISHED",
-        participants__user=request.user,
+    # The newest finished game with the code
+    game_session = (
+        GameSession.objects.filter(status="FINISHED", participants__user=request.user)
+        .select_related("summary")
+        .current(join_code)
     )
+    if game_session is None:
+        raise Http404("No finished game session found for this user.")
+
+    try:
+        summary = game_session.summary
+    except GameSummary.DoesNotExist:
+        # Games finished before summaries were stored get their summary now
+        summary = summaries.create_summary(game_session)
+
+    etag = summaries.summary_etag(summary)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = render(
+            request,
+            "quiz/game_results.html",
+            {"summary": summary.data, "course_id": game_session.course_id},
+        )
+
+    response["ETag"] = etag
+    patch_cache_control(response, private=True, max_age=RESULTS_MAX_AGE, immutable=True)
+    return response
+
+
+# LEADERBOARD
+# The leaderboards change with every finished game, so they are loaded into
+# the (cached) results page as a fragment.
+LEADERBOARD_MAX_AGE = 30
 
-    return render(request, "quiz/game_results.html", {"game_session": game_session})
+
+@login_required
+@cache_control(private=True, max_age=LEADERBOARD_MAX_AGE)
+def leaderboard_fragment(request):
+    """
+    Renders the top players of a course (?course=) and of all courses, and
+    the rank of the current user. The number of queries does not depend on
+    the number of players or games (see quiz/leaderboard.py).
+    """
+    boards = []
+    course_id = request.GET.get("course", "")
+    if course_id.isdigit():
+        course = get_object_or_404(Course, pk=course_id)
+        boards.append((course.name, course.pk))
+    boards.append(("Alle Kurse", None))
+
+    context = {"boards": []}
+    for title, board_course_id in boards:
+        top = leaderboard.get_top(board_course_id)
+        context["boards"].append(
+            {
+                "title": title,
+                "top": top,
+                "me": leaderboard.get_rank(request.user, board_course_id, top=top),
+            }
+        )
+    return render(request, "quiz/partials/_leaderboard.html", context)
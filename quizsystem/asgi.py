@@ -3,6 +3,10 @@ ASGI config for quizsystem project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serving the project through ASGI (e.g. ``uvicorn quizsystem.asgi:application``)
+is required for the live game updates (QUIZ_SSE_ENABLED), because every open
+server-sent events stream would otherwise occupy a WSGI worker thread.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
@@ -2,6 +2,8 @@ import os
 
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -47,6 +49,8 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     # HTMX Middleware
     "django_htmx.middleware.HtmxMiddleware",
+    # SQL query count and time per request
+    "quiz.middleware.QueryBudgetMiddleware",
 ]
 
 ROOT_URLCONF = "quizsystem.urls"
@@ -72,13 +76,109 @@ WSGI_APPLICATION = "quizsystem.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# Database profile, selected with the environment variable QUIZ_DB_PROFILE:
+# - "development" (default): Django's defaults for SQLite.
+# - "production": SQLite tuned for concurrent requests
+#   (see "python manage.py benchmark_sqlite_writers"):
+#   - WAL journaling lets readers (the pollers) work while a writer commits.
+#   - synchronous=NORMAL only syncs at checkpoints, which is safe with WAL.
+#   - Memory-mapped I/O and a larger page cache (in KiB if negative) reduce reads.
+#   - Transactions start with BEGIN IMMEDIATE, so a writer waits for the lock
+#     (up to "timeout" seconds) instead of failing with "database is locked"
+#     when it upgrades a read transaction.
+#   - Connections are kept for several requests instead of being opened per
+#     request. This only helps under WSGI: under ASGI (e.g. for QUIZ_SSE_ENABLED),
+#     every request runs its database code in a new thread with a new connection,
+#     so CONN_MAX_AGE has no effect there.
+
+QUIZ_DB_PROFILE = os.environ.get("QUIZ_DB_PROFILE", "development")
+
+SQLITE_OPTIONS = {
+    "init_command": (
+        "PRAGMA journal_mode=WAL;"
+        "PRAGMA synchronous=NORMAL;"
+        "PRAGMA mmap_size=134217728;"
+        "PRAGMA cache_size=-20000;"
+        "PRAGMA temp_store=MEMORY;"
+    ),
+    "transaction_mode": "IMMEDIATE",
+    "timeout": 20,
+}
+
 DATABASES = {
     "default": {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": BASE_DIR / "db.sqlite3",
+        # The tests use a file instead of Django's default in-memory database:
+        # quiz.tests.SubmitAnswerConcurrencyTests runs threads with their own
+        # connections, which an in-memory database only shares with table-level
+        # locks of its shared cache, not with the file locks of a real server.
+        # Django deletes the file after the test run.
+        "TEST": {"NAME": BASE_DIR / "test_db.sqlite3"},
     }
 }
 
+if QUIZ_DB_PROFILE == "production":
+    DATABASES["default"].update(
+        {
+            "OPTIONS": SQLITE_OPTIONS,
+            "CONN_MAX_AGE": 600,
+            "CONN_HEALTH_CHECKS": True,
+        }
+    )
+elif QUIZ_DB_PROFILE != "development":
+    raise ImproperlyConfigured(f"Unknown QUIZ_DB_PROFILE: {QUIZ_DB_PROFILE!r}")
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# The "game_state" cache holds the live state of running games (see quiz/game_state.py).
+# The in-process locmem backend only works with a single worker process; with several
+# processes, point it to a shared backend, e.g.
+# "django.core.cache.backends.redis.RedisCache" with "LOCATION": "redis://127.0.0.1:6379".
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "game_state": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "game-state",
+    },
+}
+
+QUIZ_GAME_STATE_CACHE = "game_state"
+
+
+# Logging
+# https://docs.djangoproject.com/en/5.2/topics/logging/
+# "quiz.queries" receives the SQL query count and time of every request
+# (see quiz/middleware.py), unless they are sent as response headers:
+# requests over QUIZ_QUERY_BUDGET at WARNING level, all others at DEBUG level.
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "handlers": {
+        "console": {
+            "class": "logging.StreamHandler",
+        },
+    },
+    "loggers": {
+        "quiz.queries": {
+            "handlers": ["console"],
+            "level": "INFO",
+            "propagate": False,
+        },
+    },
+}
+
+# Send the SQL query count and time as response headers instead of logging them
+QUIZ_QUERY_HEADERS = DEBUG
+
+# Requests with more queries or more SQL time (in ms) are logged as warnings
+QUIZ_QUERY_BUDGET = (20, 200)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -126,3 +226,13 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 LOGIN_REDIRECT_URL = "home"
 LOGOUT_REDIRECT_URL = "home"
 LOGIN_URL = "login"
+
+# Live game updates via server-sent events (see quiz/events.py).
+# Only enable this when the project is served through ASGI (quizsystem/asgi.py),
+# e.g. with uvicorn or daphne. The HTMX polling stays active as a fallback.
+QUIZ_SSE_ENABLED = False
+
+# Serve the game state pollers and submit_answer as async views
+# (quiz/async_views.py). Only worth it under ASGI (e.g. for QUIZ_SSE_ENABLED):
+# under WSGI they are slower than the sync views, see benchmark_pollers.
+QUIZ_ASYNC_VIEWS = False